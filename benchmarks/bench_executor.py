@@ -0,0 +1,413 @@
+"""
+xxl-job 执行器热点路径基准测试.
+
+用法:
+    # 运行全部用例
+    python benchmarks/bench_executor.py
+    # 只运行名称包含关键字的用例
+    python benchmarks/bench_executor.py -k log
+    # 保存结果, 供之后的提交对比
+    python benchmarks/bench_executor.py --save .benchmarks/base.json
+    # 与保存的结果对比, 单次耗时退化超过阈值时以非0状态码退出
+    python benchmarks/bench_executor.py --compare .benchmarks/base.json
+
+每个用例先预热, 再执行`repeat`轮、每轮`number`次操作(期间关闭gc),
+以各轮单次耗时的中位数作为对比基准.
+"""
+import argparse
+import gc
+import itertools
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import typing as t
+from datetime import datetime
+
+from lesoon_common import LesoonFlask
+
+from lesoon_cron.scheduler.xxl_job import XxlJobHandler
+from lesoon_cron.scheduler.xxl_job.base import XxlJob
+from lesoon_cron.scheduler.xxl_job.code import XxlJobStrategyCode
+from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
+from lesoon_cron.scheduler.xxl_job.dataclass import CallbackParam
+from lesoon_cron.scheduler.xxl_job.dataclass import TriggerParam
+from lesoon_cron.scheduler.xxl_job.globals import XxlJobGlobals
+from lesoon_cron.scheduler.xxl_job.helper import XxlJobHelper
+from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+from lesoon_cron.scheduler.xxl_job.param import TriggerParamDecoder
+from lesoon_cron.scheduler.xxl_job.thread.base import InheritableThread
+from lesoon_cron.scheduler.xxl_job.thread.work import BaseJob
+from lesoon_cron.scheduler.xxl_job.thread.work import CallbackThread
+from lesoon_cron.scheduler.xxl_job.thread.work import JobThread
+
+BENCH_JOB_ID = 10000
+
+
+class Benchmark:
+    """
+    基准测试用例.
+
+    Attributes:
+        name: 用例名称
+        func: 生成器函数, 接收临时目录, yield单次操作函数, 之后执行清理
+        number: 每轮操作次数
+
+    """
+
+    def __init__(self, name: str, func: t.Callable, number: int):
+        self.name = name
+        self.func = func
+        self.number = number
+
+
+BENCHMARKS: t.List[Benchmark] = []
+
+
+def benchmark(name: str, number: int):
+
+    def decorator(func: t.Callable) -> t.Callable:
+        BENCHMARKS.append(Benchmark(name=name, func=func, number=number))
+        return func
+
+    return decorator
+
+
+class BenchHandler(XxlJobHandler):
+
+    def noop(self, *args, **kwargs):
+        pass
+
+
+def _trigger_payload(log_id: int) -> dict:
+    """调度中心`/run`请求体."""
+    return {
+        'jobId': BENCH_JOB_ID,
+        'executorHandler': 'BenchHandler.noop',
+        'executorParams': '{"a": 1, "b": "bench"}',
+        'executorBlockStrategy': 'SERIAL_EXECUTION',
+        'executorTimeout': 0,
+        'logId': log_id,
+        'logDateTime': int(time.time() * 1000),
+        'glueType': 'BEAN',
+        'glueSource': '',
+        'broadcastIndex': 0,
+        'broadcastTotal': 1
+    }
+
+
+def _trigger_params(count: int) -> t.Iterator[TriggerParam]:
+    log_date_time = int(time.time() * 1000)
+    for log_id in range(count):
+        yield TriggerParam(
+            job_id=BENCH_JOB_ID,
+            executor_handler='BenchHandler.noop',
+            executor_params='{"a": 1, "b": "bench"}',
+            executor_block_strategy=XxlJobStrategyCode.SerialExecution,
+            executor_timeout=0,
+            log_id=log_id,
+            log_date_time=log_date_time,
+            glue_type='BEAN',
+            glue_source='',
+            broadcast_index=0,
+            broadcast_total=1)
+
+
+def _clear_callback_queue():
+    CallbackThread.callback_queue.queue.clear()
+
+
+@benchmark('trigger_param_schema_load', number=2000)
+def bench_trigger_param_schema_load(tmp_dir: str):
+    schema = TriggerParam.Schema()
+    payload = _trigger_payload(log_id=1)
+    yield lambda: schema.load(payload)
+
+
+@benchmark('run_request', number=500)
+def bench_run_request(tmp_dir: str):
+
+    class Config:
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+
+    app = LesoonFlask(__name__, config=Config)
+    app.logger.setLevel(logging.CRITICAL)
+    XxlJob().init_resource(app=app)
+    client = app.test_client()
+    log_ids = itertools.count()
+    yield lambda: client.post(f'/{XxlJob.resource_name}/run',
+                              json=_trigger_payload(log_id=next(log_ids)))
+    XxlJobGlobals.remove_job_thread(job_id=BENCH_JOB_ID, reason='基准测试结束')
+    _clear_callback_queue()
+
+
+@benchmark('push_trigger', number=20000)
+def bench_push_trigger(tmp_dir: str):
+    # 不启动job线程, 只测量入队
+    job = JobThread(job_id=BENCH_JOB_ID, handle_func=BenchHandler().noop)
+    trigger_params = _trigger_params(count=sys.maxsize)
+    yield lambda: job.push_trigger(next(trigger_params))
+
+
+@benchmark('extract_func_param_json', number=20000)
+def bench_extract_func_param_json(tmp_dir: str):
+    params = '{"a": 1, "b": "bench", "c": [1, 2, 3]}'
+    yield lambda: BaseJob._extract_func_param(params)
+
+
+@benchmark('extract_func_param_literal', number=20000)
+def bench_extract_func_param_literal(tmp_dir: str):
+    params = "('bench', {'k': (1, 2)}, None)"
+    yield lambda: BaseJob._extract_func_param(params)
+
+
+@benchmark('extract_func_param_uncached', number=5000)
+def bench_extract_func_param_uncached(tmp_dir: str):
+    counter = itertools.count()
+    yield lambda: BaseJob._extract_func_param(
+        f'{{"a": {next(counter)}, "b": "bench"}}')
+    TriggerParamDecoder._cache.clear()
+
+
+def _set_log_context(tmp_dir: str) -> str:
+    log_file_path = os.path.join(tmp_dir, 'helper.log')
+    XxlJobContext.set(
+        XxlJobContext(job_id=BENCH_JOB_ID,
+                      job_args=(),
+                      job_kwargs={},
+                      job_file_path=log_file_path,
+                      broadcast_index=0,
+                      broadcast_total=1))
+    return log_file_path
+
+
+@benchmark('helper_log_sync', number=5000)
+def bench_helper_log_sync(tmp_dir: str):
+    _set_log_context(tmp_dir)
+    yield lambda: XxlJobHelper.log('基准测试日志 benchmark log line')
+    XxlJobContext.set(None)
+
+
+@benchmark('helper_log_async', number=20000)
+def bench_helper_log_async(tmp_dir: str):
+    # 只测量调用方耗时, 落盘在清理阶段完成
+    _set_log_context(tmp_dir)
+    XxlJobLogger.start_writer()
+    yield lambda: XxlJobHelper.log('基准测试日志 benchmark log line')
+    XxlJobLogger.flush(timeout=None)
+    XxlJobLogger.stop_writer()
+    XxlJobContext.set(None)
+
+
+def _write_large_log(tmp_dir: str, lines: int) -> str:
+    log_file_path = os.path.join(tmp_dir, 'large.log')
+    if not os.path.exists(log_file_path):
+        with open(log_file_path, mode='w', encoding='utf-8') as f:
+            for i in range(lines):
+                f.write(f'2022-01-01 00:00:00 基准测试日志 line {i}\n')
+    return log_file_path
+
+
+LARGE_LOG_LINES = 200000
+
+
+@benchmark('log_read_tail', number=200)
+def bench_log_read_tail(tmp_dir: str):
+    log_file_path = _write_large_log(tmp_dir, lines=LARGE_LOG_LINES)
+    yield lambda: XxlJobLogger.read(log_file_path=log_file_path,
+                                    from_line_num=LARGE_LOG_LINES - 10)
+    XxlJobLogger._line_indexes.clear()
+
+
+@benchmark('log_read_tail_cold', number=10)
+def bench_log_read_tail_cold(tmp_dir: str):
+    log_file_path = _write_large_log(tmp_dir, lines=LARGE_LOG_LINES)
+
+    def op():
+        XxlJobLogger._line_indexes.clear()
+        XxlJobLogger.read(log_file_path=log_file_path,
+                          from_line_num=LARGE_LOG_LINES - 10)
+
+    yield op
+    XxlJobLogger._line_indexes.clear()
+
+
+@benchmark('log_read_full', number=5)
+def bench_log_read_full(tmp_dir: str):
+    log_file_path = _write_large_log(tmp_dir, lines=LARGE_LOG_LINES)
+    yield lambda: XxlJobLogger.read(log_file_path=log_file_path,
+                                    from_line_num=1)
+    XxlJobLogger._line_indexes.clear()
+
+
+@benchmark('context_propagation_large_args', number=200)
+def bench_context_propagation_large_args(tmp_dir: str):
+    # 超时任务在子线程中执行, 测量子线程继承大参数上下文的开销
+    XxlJobContext.set(
+        XxlJobContext(
+            job_id=BENCH_JOB_ID,
+            job_args=(list(range(10000)),),
+            job_kwargs={f'key{i}': {
+                'value': i
+            } for i in range(10000)},
+            job_file_path=os.path.join(tmp_dir, 'context.log'),
+            broadcast_index=0,
+            broadcast_total=1))
+
+    def op():
+        child = InheritableThread(target=XxlJobContext.get)
+        child.start()
+        child.join()
+
+    yield op
+    XxlJobContext.set(None)
+
+
+@benchmark('callback_batch_1000', number=20)
+def bench_callback_batch(tmp_dir: str):
+    # 每次操作推送1000个回调参数并全部组装成批次, 不发送请求
+    spool, linger = CallbackThread.spool, CallbackThread.batch_linger
+    CallbackThread.spool, CallbackThread.batch_linger = None, 0
+    callback_thread = CallbackThread()
+    log_date_time = int(time.time() * 1000)
+    params = [
+        CallbackParam(log_id=i, log_date_time=log_date_time, msg='')
+        for i in range(1000)
+    ]
+
+    def op():
+        for param in params:
+            CallbackThread.push_callback(param)
+        while callback_thread.carry or CallbackThread.callback_queue.qsize():
+            callback_thread._collect_batch()
+
+    yield op
+    CallbackThread.spool, CallbackThread.batch_linger = spool, linger
+    _clear_callback_queue()
+
+
+def run_benchmark(bench: Benchmark, tmp_dir: str, repeat: int) -> dict:
+    steps = bench.func(tmp_dir)
+    op = next(steps)
+    try:
+        for _ in range(max(bench.number // 10, 1)):
+            op()
+        timings = []
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in itertools.repeat(None, bench.number):
+                    op()
+                timings.append((time.perf_counter() - start) / bench.number)
+        finally:
+            if gc_enabled:
+                gc.enable()
+    finally:
+        # 执行用例的清理部分
+        for _ in steps:
+            pass
+    median = statistics.median(timings)
+    return {
+        'number': bench.number,
+        'repeat': repeat,
+        'median_us': median * 1e6,
+        'min_us': min(timings) * 1e6,
+        'ops_per_sec': 1 / median if median else 0
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(
+                                           os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL,
+                                       text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """
+    与基准结果对比.
+    Returns:
+        是否存在超过阈值的退化
+
+    """
+    regressed = False
+    print(f"\n对比基准: commit={baseline['meta'].get('commit')}")
+    print(f"{'name':<32}{'base(us)':>12}{'now(us)':>12}{'delta':>10}")
+    for name, result in results.items():
+        if not (base := baseline['results'].get(name)):
+            continue
+        delta = (result['median_us'] - base['median_us']) / base['median_us']
+        flag = ''
+        if delta > threshold:
+            regressed, flag = True, '  <-- 退化'
+        print(f"{name:<32}{base['median_us']:>12.2f}"
+              f"{result['median_us']:>12.2f}{delta:>+10.1%}{flag}")
+    return regressed
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='xxl-job 执行器基准测试')
+    parser.add_argument('-k', dest='keyword', default='', help='只运行名称包含该关键字的用例')
+    parser.add_argument('--repeat', type=int, default=5, help='每个用例执行轮数')
+    parser.add_argument('--save', help='结果保存路径(json)')
+    parser.add_argument('--compare', help='对比的基准结果路径(json)')
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=0.1,
+                        help='判定退化的单次耗时增幅, 默认0.1即10%%')
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    tmp_dir = tempfile.mkdtemp(prefix='xxl-job-bench-')
+    XxlJobLogger.log_dir_path = os.path.join(tmp_dir, 'handler')
+    results: t.Dict[str, dict] = {}
+    try:
+        print(f"{'name':<32}{'median(us)':>12}{'min(us)':>12}{'ops/s':>12}")
+        for bench in BENCHMARKS:
+            if args.keyword not in bench.name:
+                continue
+            result = results[bench.name] = run_benchmark(bench,
+                                                         tmp_dir=tmp_dir,
+                                                         repeat=args.repeat)
+            print(f"{bench.name:<32}{result['median_us']:>12.2f}"
+                  f"{result['min_us']:>12.2f}{result['ops_per_sec']:>12.0f}")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'time': datetime.now().isoformat(timespec='seconds')
+        },
+        'results': results
+    }
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, mode='w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, threshold=args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
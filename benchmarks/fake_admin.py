@@ -0,0 +1,217 @@
+"""
+本地模拟的 XXL-JOB 调度中心.
+
+实现`XxlJobClient`调用的`/api/registry`、`/api/registryRemove`、`/api/callback`,
+记录执行器注册与回调结果, 供压测脚本校验回调是否丢失.
+
+用法:
+    python benchmarks/fake_admin.py --port 10098 --access-token token123
+
+执行器配置`CRON['XXL-JOB']['ADDRESS'] = 'http://127.0.0.1:10098'`即可.
+"""
+import argparse
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+import typing as t
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+logger = logging.getLogger('xxl-job-fake-admin')
+
+
+class CallbackRecord:
+    """
+    单个日志id的回调记录.
+
+    Attributes:
+        received_at: 首次回调时间(time.time())
+        code: 首次回调的处理结果码
+        msg: 首次回调的处理结果
+        count: 回调次数, 大于1说明存在重复回调
+
+    """
+
+    def __init__(self, received_at: float, code: int, msg: str):
+        self.received_at = received_at
+        self.code = code
+        self.msg = msg
+        self.count = 1
+
+
+class FakeAdmin:
+    """
+    模拟调度中心.
+
+    Attributes:
+        access_token: 校验请求头`XXL-JOB-ACCESS-TOKEN`, 为空时不校验
+        callback_failure_rate: 回调接口随机返回失败的比例, 用于验证回调重试
+        registry: 执行器地址 -> 最近一次注册时间
+        callbacks: 日志id -> 回调记录
+
+    """
+
+    def __init__(self,
+                 host: str = '127.0.0.1',
+                 port: int = 0,
+                 access_token: str = '',
+                 callback_failure_rate: float = 0):
+        self.access_token = access_token
+        self.callback_failure_rate = callback_failure_rate
+        self.lock = threading.Condition()
+        self.registry: t.Dict[str, float] = {}
+        self.registry_removed: t.Dict[str, float] = {}
+        self.callbacks: t.Dict[int, CallbackRecord] = {}
+        self.callback_requests = 0
+        self.rejected_requests = 0
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='xxl-job-fake-admin',
+                                       daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeAdmin':
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler_class(self) -> t.Type[BaseHTTPRequestHandler]:
+        admin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                logger.debug(format, *args)
+
+            def _reply(self, code: int, msg: t.Optional[str] = None):
+                body = json.dumps({'code': code, 'msg': msg}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(
+                    int(self.headers.get('Content-Length', 0)))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                if admin.access_token and self.headers.get(
+                        'XXL-JOB-ACCESS-TOKEN') != admin.access_token:
+                    with admin.lock:
+                        admin.rejected_requests += 1
+                    return self._reply(500, 'The access token is wrong.')
+                data = json.loads(body or b'null')
+                if self.path.endswith('/api/registry'):
+                    admin.on_registry(data)
+                elif self.path.endswith('/api/registryRemove'):
+                    admin.on_registry_remove(data)
+                elif self.path.endswith('/api/callback'):
+                    if not admin.on_callback(data):
+                        return self._reply(500, 'callback failure(模拟)')
+                else:
+                    self.send_error(404)
+                    return
+                self._reply(200)
+
+        return Handler
+
+    def on_registry(self, data: dict):
+        with self.lock:
+            self.registry[data['registryValue']] = time.time()
+            self.registry_removed.pop(data['registryValue'], None)
+
+    def on_registry_remove(self, data: dict):
+        with self.lock:
+            self.registry.pop(data['registryValue'], None)
+            self.registry_removed[data['registryValue']] = time.time()
+
+    def on_callback(self, data: t.List[dict]) -> bool:
+        now = time.time()
+        with self.lock:
+            self.callback_requests += 1
+            if random.random() < self.callback_failure_rate:
+                return False
+            for param in data:
+                if record := self.callbacks.get(param['logId']):
+                    record.count += 1
+                else:
+                    self.callbacks[param['logId']] = CallbackRecord(
+                        received_at=now,
+                        code=param['handleCode'],
+                        msg=param['handleMsg'])
+            self.lock.notify_all()
+        return True
+
+    def wait_callbacks(self, log_ids: t.Collection[int],
+                       timeout: float) -> t.Set[int]:
+        """
+        等待指定日志id全部回调.
+        Returns:
+            超时后仍未回调的日志id
+
+        """
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while True:
+                missing = {i for i in log_ids if i not in self.callbacks}
+                remaining = deadline - time.monotonic()
+                if not missing or remaining <= 0:
+                    return missing
+                self.lock.wait(timeout=min(remaining, 1))
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                'registry':
+                    dict(self.registry),
+                'registry_removed':
+                    dict(self.registry_removed),
+                'callback_requests':
+                    self.callback_requests,
+                'callbacks':
+                    len(self.callbacks),
+                'duplicate_callbacks':
+                    sum(r.count - 1 for r in self.callbacks.values()),
+                'rejected_requests':
+                    self.rejected_requests
+            }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='模拟 XXL-JOB 调度中心')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=10098)
+    parser.add_argument('--access-token', default='')
+    parser.add_argument('--callback-failure-rate', type=float, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    admin = FakeAdmin(host=args.host,
+                      port=args.port,
+                      access_token=args.access_token,
+                      callback_failure_rate=args.callback_failure_rate)
+    admin.start()
+    logger.info(f'模拟调度中心已启动:{admin.url}')
+    try:
+        while True:
+            time.sleep(10)
+            logger.info(admin.summary())
+    except KeyboardInterrupt:
+        admin.stop()
+
+
+if __name__ == '__main__':
+    main()
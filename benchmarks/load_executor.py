@@ -0,0 +1,383 @@
+"""
+xxl-job 执行器压测脚本.
+
+以多线程向执行器发送`/run`、`/idleBeat`、`/kill`、`/log`请求,
+混合阻塞策略、超时与分片参数, 由模拟调度中心(`fake_admin.py`)接收回调,
+统计各接口延迟、吞吐, 调度到回调的端到端延迟, 并校验回调是否丢失.
+
+用法:
+    # 启动进程内执行器与模拟调度中心
+    python benchmarks/load_executor.py --requests 5000 --concurrency 16
+    # 压测已启动的执行器, 执行器需将调度中心地址指向模拟调度中心
+    python benchmarks/fake_admin.py --port 10098
+    python benchmarks/load_executor.py --executor http://127.0.0.1:5000/xxlJob \\
+        --admin http://127.0.0.1:10098 --handler SimpleHandler.test
+
+存在丢失回调时以非0状态码退出.
+"""
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import random
+import statistics
+import sys
+import threading
+import time
+import typing as t
+
+import requests
+
+from fake_admin import FakeAdmin
+from lesoon_cron.scheduler.xxl_job import XxlJobHandler
+from lesoon_cron.scheduler.xxl_job import XxlJobHelper
+
+STRATEGIES = {
+    'SERIAL_EXECUTION': 0.7,
+    'DISCARD_LATER': 0.2,
+    'COVER_EARLY': 0.1,
+}
+
+
+class LoadHandler(XxlJobHandler):
+    """进程内执行器使用的压测处理器."""
+
+    def sleep(self, seconds: float = 0, lines: int = 3):
+        for i in range(lines):
+            XxlJobHelper.log(f'压测调度执行中 line {i}')
+        time.sleep(seconds)
+
+    async def sleep_async(self, seconds: float = 0, lines: int = 3):
+        for i in range(lines):
+            XxlJobHelper.log(f'压测协程调度执行中 line {i}')
+        await asyncio.sleep(seconds)
+
+
+class LoadStats:
+    """
+    压测统计.
+
+    Attributes:
+        latencies: 接口 -> 请求延迟(秒)列表
+        errors: 接口 -> 请求异常次数
+        triggers: 执行器接受的调度, 日志id -> 发送时间(time.time())
+        rejected: 执行器拒绝的调度数(丢弃策略、重复调度等)
+
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: t.Dict[str, t.List[float]] = {}
+        self.errors: t.Dict[str, int] = {}
+        self.triggers: t.Dict[int, float] = {}
+        # 最近接受的调度, 供查看日志使用
+        self.recent_triggers: t.Deque[t.Tuple[int, float]] = collections.deque(
+            maxlen=100)
+        self.rejected = 0
+
+    def record(self, api: str, latency: float, error: bool = False):
+        with self.lock:
+            self.latencies.setdefault(api, []).append(latency)
+            if error:
+                self.errors[api] = self.errors.get(api, 0) + 1
+
+
+def percentiles(values: t.List[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def pick(p: float) -> float:
+        return values[min(int(len(values) * p), len(values) - 1)] * 1000
+
+    return {
+        'count': len(values),
+        'avg_ms': statistics.mean(values) * 1000,
+        'p50_ms': pick(0.5),
+        'p95_ms': pick(0.95),
+        'p99_ms': pick(0.99),
+        'max_ms': values[-1] * 1000
+    }
+
+
+class LoadDriver:
+    """
+    压测驱动.
+
+    Attributes:
+        executor_url: 执行器地址, 如`http://127.0.0.1:5000/xxlJob`
+        handler: 调度的处理函数, 格式为`Class.method`, 需接收seconds参数
+        jobs: 调度的任务id数量
+        mix: 接口 -> 请求权重
+
+    """
+    log_ids = itertools.count(int(time.time()))
+
+    def __init__(self, executor_url: str, access_token: str, handler: str,
+                 jobs: int, mix: t.Dict[str, int], max_sleep: float,
+                 timeout_rate: float, broadcast_rate: float):
+        self.executor_url = executor_url.rstrip('/')
+        self.access_token = access_token
+        self.handler = handler
+        self.jobs = jobs
+        self.mix = mix
+        self.max_sleep = max_sleep
+        self.timeout_rate = timeout_rate
+        self.broadcast_rate = broadcast_rate
+        self.stats = LoadStats()
+        self.local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            self.local.session.headers['XXL-JOB-ACCESS-TOKEN'] = (
+                self.access_token)
+        return self.local.session
+
+    def _post(self, api: str, data: dict) -> t.Optional[dict]:
+        start = time.perf_counter()
+        try:
+            res = self.session.post(f'{self.executor_url}/{api}',
+                                    json=data,
+                                    timeout=30)
+            res.raise_for_status()
+            result = res.json()
+        except Exception:
+            self.stats.record(api, time.perf_counter() - start, error=True)
+            return None
+        self.stats.record(api, time.perf_counter() - start)
+        return result
+
+    def _trigger(self, job_id: int, strategy: str, params: dict, timeout: int,
+                 broadcast_index: int, broadcast_total: int):
+        log_id = next(self.log_ids)
+        sent_at = time.time()
+        result = self._post(
+            'run', {
+                'jobId': job_id,
+                'executorHandler': self.handler,
+                'executorParams': json.dumps(params),
+                'executorBlockStrategy': strategy,
+                'executorTimeout': timeout,
+                'logId': log_id,
+                'logDateTime': int(sent_at * 1000),
+                'glueType': 'BEAN',
+                'glueSource': '',
+                'broadcastIndex': broadcast_index,
+                'broadcastTotal': broadcast_total
+            })
+        with self.stats.lock:
+            if result and result.get('code') == 200:
+                self.stats.triggers[log_id] = sent_at
+                self.stats.recent_triggers.append((log_id, sent_at))
+            else:
+                self.stats.rejected += 1
+
+    def run_once(self):
+        job_id = random.randint(1, self.jobs)
+        api = random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if api == 'run':
+            strategy = random.choices(list(STRATEGIES),
+                                      weights=list(STRATEGIES.values()))[0]
+            params: t.Dict[str, t.Any] = {
+                'seconds': random.uniform(0, self.max_sleep)
+            }
+            timeout = 0
+            if random.random() < self.timeout_rate:
+                # 处理时间超过超时时间, 触发超时中断
+                timeout, params['seconds'] = 1, 1.5
+            broadcast_total = 1
+            if random.random() < self.broadcast_rate:
+                broadcast_total = random.randint(2, 4)
+            for broadcast_index in range(broadcast_total):
+                self._trigger(job_id=job_id,
+                              strategy=strategy,
+                              params=params,
+                              timeout=timeout,
+                              broadcast_index=broadcast_index,
+                              broadcast_total=broadcast_total)
+        elif api == 'log':
+            with self.stats.lock:
+                recent = self.stats.recent_triggers
+                log_id, sent_at = random.choice(recent) if recent else (
+                    0, time.time())
+            self._post(
+                'log', {
+                    'logId': log_id,
+                    'logDateTim': int(sent_at * 1000),
+                    'fromLineNum': 1
+                })
+        else:
+            self._post(api, {'jobId': job_id})
+
+    def run(self, total: int, concurrency: int) -> float:
+        """
+        发送请求.
+        Returns:
+            发送耗时(秒)
+
+        """
+        counter = itertools.count()
+
+        def worker():
+            while next(counter) < total:
+                self.run_once()
+
+        threads = [
+            threading.Thread(target=worker, name=f'xxl-job-load-{i}')
+            for i in range(concurrency)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+
+def start_local_executor(admin_url: str,
+                         access_token: str,
+                         port: int,
+                         extra_config: t.Optional[dict] = None) -> str:
+    """启动进程内执行器, 返回执行器地址. `extra_config`覆盖默认的XXL-JOB配置."""
+    from lesoon_common import LesoonFlask
+    from werkzeug.serving import make_server
+
+    from lesoon_cron import LesoonCron
+
+    class Config:
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+        CRON = {
+            'ENABLE': True,
+            'TYPE': 'XXL-JOB',
+            'XXL-JOB': {
+                'ADDRESS': admin_url,
+                'ACCESS_TOKEN': access_token,
+                'BEAT_PERIOD': 5,
+                'CALLBACK_SPOOL_DIR': '',
+                'LOG_DIR_PATH': '/tmp/xxl-job-load/handler',
+                'TRIGGER_DEDUP_DIR': '/tmp/xxl-job-load/trigger',
+                'EXECUTOR': {
+                    'APP_NAME': 'lesoon-cron-load',
+                    'IP': 'http://127.0.0.1',
+                    'PORT': port
+                }
+            }
+        }
+
+    Config.CRON['XXL-JOB'].update(extra_config or {})
+    app = LesoonFlask(__name__,
+                      config=Config,
+                      extra_extensions={'cron': LesoonCron()})
+    app.logger.setLevel(logging.CRITICAL)
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever,
+                     name='xxl-job-load-executor',
+                     daemon=True).start()
+    return f'http://127.0.0.1:{port}/{app.xxl_job.resource_name}'
+
+
+def report(driver: LoadDriver, admin: FakeAdmin, elapsed: float,
+           missing: t.Set[int]) -> dict:
+    stats = driver.stats
+    callback_latencies, codes = [], {}
+    with admin.lock:
+        for log_id, sent_at in stats.triggers.items():
+            if record := admin.callbacks.get(log_id):
+                callback_latencies.append(record.received_at - sent_at)
+                codes[record.code] = codes.get(record.code, 0) + 1
+    requests_total = sum(len(v) for v in stats.latencies.values())
+    return {
+        'elapsed_s': elapsed,
+        'throughput_rps': requests_total / elapsed if elapsed else 0,
+        'apis': {
+            api: {
+                **percentiles(latencies), 'errors': stats.errors.get(api, 0)
+            } for api, latencies in stats.latencies.items()
+        },
+        'triggers_accepted': len(stats.triggers),
+        'triggers_rejected': stats.rejected,
+        'trigger_to_callback': percentiles(callback_latencies),
+        'callback_codes': codes,
+        'lost_callbacks': len(missing),
+        'admin': admin.summary()
+    }
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='xxl-job 执行器压测')
+    parser.add_argument('--executor', help='执行器地址, 为空时启动进程内执行器')
+    parser.add_argument('--executor-port', type=int, default=15000)
+    parser.add_argument('--admin', help='模拟调度中心地址, 为空时启动进程内模拟调度中心')
+    parser.add_argument('--access-token', default='')
+    parser.add_argument('--handler', default='LoadHandler.sleep')
+    parser.add_argument('--requests', type=int, default=5000, help='请求总数')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--jobs', type=int, default=20, help='任务id数量')
+    parser.add_argument('--mix',
+                        default='run=80,idleBeat=10,log=8,kill=2',
+                        help='接口权重')
+    parser.add_argument('--max-sleep',
+                        type=float,
+                        default=0.05,
+                        help='处理函数最长执行时间(秒)')
+    parser.add_argument('--timeout-rate', type=float, default=0.02)
+    parser.add_argument('--broadcast-rate', type=float, default=0.1)
+    parser.add_argument('--callback-failure-rate', type=float, default=0)
+    parser.add_argument('--drain-timeout',
+                        type=float,
+                        default=60,
+                        help='等待回调完成的最长时间(秒)')
+    parser.add_argument('--save', help='结果保存路径(json)')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    admin: t.Optional[FakeAdmin] = None
+    if args.admin:
+        # 外部模拟调度中心, 只能通过其日志核对回调
+        admin_url = args.admin
+    else:
+        admin = FakeAdmin(access_token=args.access_token,
+                          callback_failure_rate=args.callback_failure_rate)
+        admin_url = admin.start().url
+    executor_url = args.executor or start_local_executor(
+        admin_url=admin_url,
+        access_token=args.access_token,
+        port=args.executor_port)
+
+    mix = {}
+    for item in args.mix.split(','):
+        api, _, weight = item.partition('=')
+        mix[api.strip()] = int(weight)
+    driver = LoadDriver(executor_url=executor_url,
+                        access_token=args.access_token,
+                        handler=args.handler,
+                        jobs=args.jobs,
+                        mix=mix,
+                        max_sleep=args.max_sleep,
+                        timeout_rate=args.timeout_rate,
+                        broadcast_rate=args.broadcast_rate)
+    elapsed = driver.run(total=args.requests, concurrency=args.concurrency)
+    if not admin:
+        print(json.dumps({'elapsed_s': elapsed}, indent=2))
+        return 0
+
+    missing = admin.wait_callbacks(list(driver.stats.triggers),
+                                   timeout=args.drain_timeout)
+    result = report(driver, admin=admin, elapsed=elapsed, missing=missing)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    if args.save:
+        with open(args.save, mode='w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if missing:
+        print(f'丢失回调{len(missing)}条: {sorted(missing)[:20]}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+xxl-job 执行器启动耗时测试.
+
+多次启动子进程执行器, 统计从进程启动到`/beat`首次成功响应、
+到模拟调度中心(`fake_admin.py`)首次收到注册的耗时,
+并读取执行器`/metrics`中记录的各启动阶段耗时(自执行器模块导入起).
+
+用法:
+    python benchmarks/startup.py --runs 5
+    # 模拟GUNICORN方式启动
+    python benchmarks/startup.py --runs 5 --gunicorn
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+import typing as t
+
+import requests
+
+from fake_admin import FakeAdmin
+from load_executor import percentiles
+from load_executor import start_local_executor
+
+
+def run_child(admin_url: str, port: int, jitter: float):
+    """子进程: 启动执行器后等待父进程结束本进程."""
+    start_local_executor(admin_url=admin_url,
+                         access_token='',
+                         port=port,
+                         extra_config={
+                             'BEAT_FIRST_JITTER': jitter,
+                             'LOG_DIR_PATH': '/tmp/xxl-job-startup/handler',
+                             'TRIGGER_DEDUP_DIR': '/tmp/xxl-job-startup/trigger'
+                         })
+    while True:
+        time.sleep(1)
+
+
+def measure_once(admin: FakeAdmin, port: int, jitter: float, gunicorn: bool,
+                 timeout: float) -> dict:
+    executor_url = f'http://127.0.0.1:{port}/xxlJob'
+    env = dict(os.environ)
+    if gunicorn:
+        env['gunicorn_flag'] = '1'
+    with admin.lock:
+        admin.registry.clear()
+    command = [
+        sys.executable, __file__, '--child', '--admin', admin.url, '--port',
+        str(port), '--jitter',
+        str(jitter)
+    ]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env)
+    result: t.Dict[str, t.Any] = {}
+    try:
+        deadline = start + timeout
+        while time.perf_counter() < deadline and process.poll() is None:
+            try:
+                requests.post(f'{executor_url}/beat', json={},
+                              timeout=1).raise_for_status()
+            except requests.RequestException:
+                time.sleep(0.01)
+                continue
+            result['first_beat'] = time.perf_counter() - start
+            break
+        while time.perf_counter() < deadline and 'first_beat' in result:
+            with admin.lock:
+                registered = bool(admin.registry)
+            if registered:
+                result['first_registry'] = time.perf_counter() - start
+                break
+            time.sleep(0.01)
+        if 'first_beat' in result:
+            metrics = requests.get(f'{executor_url}/metrics',
+                                   timeout=1).json()['content']
+            result['stages'] = metrics.get('startup', {})
+    finally:
+        process.terminate()
+        process.wait()
+    return result
+
+
+def main(argv: t.Optional[t.List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='xxl-job 执行器启动耗时测试')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=15100)
+    parser.add_argument('--jitter',
+                        type=float,
+                        default=2,
+                        help='首次心跳注册的最大随机延迟(秒)')
+    parser.add_argument('--gunicorn',
+                        action='store_true',
+                        help='设置gunicorn_flag环境变量')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--admin', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        logging.basicConfig(level=logging.WARNING)
+        run_child(admin_url=args.admin, port=args.port, jitter=args.jitter)
+        return 0
+
+    logging.basicConfig(level=logging.WARNING)
+    admin = FakeAdmin().start()
+    runs = [
+        measure_once(admin,
+                     port=args.port,
+                     jitter=args.jitter,
+                     gunicorn=args.gunicorn,
+                     timeout=args.timeout) for _ in range(args.runs)
+    ]
+    stages: t.Dict[str, t.List[float]] = {}
+    for run in runs:
+        for stage, seconds in run.get('stages', {}).items():
+            stages.setdefault(stage, []).append(seconds)
+    result = {
+        'runs':
+            len(runs),
+        'failed':
+            sum('first_beat' not in run for run in runs),
+        'spawn_to_first_beat':
+            percentiles(
+                [run['first_beat'] for run in runs if 'first_beat' in run]),
+        'spawn_to_first_registry':
+            percentiles([
+                run['first_registry'] for run in runs if 'first_registry' in run
+            ]),
+        'stages': {
+            stage: percentiles(values) for stage, values in stages.items()
+        }
+    }
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    admin.stop()
+    return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
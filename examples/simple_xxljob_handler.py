@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import random
 import time
@@ -22,6 +23,21 @@ class SimpleHandler(XxlJobHandler):
         time.sleep(1)
         XxlJobHelper.log('调度完成')
 
+    async def test_async(self, a: str):
+        # 协程处理函数在共享事件循环中执行, 不占用独立线程
+        XxlJobHelper.log(f'进行协程调度,调度参数:{a=}')
+        await asyncio.sleep(random.randint(5, 20))
+        XxlJobHelper.log('协程调度完成')
+
+    def test_broadcast(self, max_id: int = 10000):
+        # 广播调度时每个执行器只处理自己分片内的数据
+        shard = XxlJobHelper.get_shard()
+        start, end = shard.range_bounds(0, max_id)
+        XxlJobHelper.log(f'分片{shard.index}/{shard.total}处理区间:[{start}, {end})')
+        for order_no in shard.filter([f'order-{i}' for i in range(10)],
+                                     method='hash'):
+            XxlJobHelper.log(f'处理订单:{order_no}')
+
 
 if __name__ == '__main__':
     import pprint
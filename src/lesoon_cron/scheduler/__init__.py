@@ -1,3 +1,4 @@
+from .xxl_job import run_in_process
 from .xxl_job import XxlJob
 from .xxl_job import XxlJobHandler
 from .xxl_job import XxlJobHelper
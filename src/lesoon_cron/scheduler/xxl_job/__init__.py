@@ -1,3 +1,4 @@
 from .base import XxlJob
+from .handler import run_in_process
 from .handler import XxlJobHandler
 from .helper import XxlJobHelper
@@ -0,0 +1,55 @@
+import threading
+import typing as t
+
+
+class TriggerAdmission:
+    """
+    调度准入控制.
+    调度进入job队列前检查队列长度、已接收未完成的调度总数以及队列中最早调度的等待时间,
+    超出限制时立即拒绝, 由调度中心按失败重试或故障转移路由到其他执行器,
+    避免调度堆积占用内存并在很久之后才超时.
+
+    Attributes:
+        queue_limit: 单个job队列中等待执行的最大调度数, 为0时不限制
+        max_in_flight: 已接收未完成(排队及执行中)的调度总数上限, 为0时不限制
+        shed_queue_wait: job队列中最早的调度已等待超过该时间(秒)时拒绝新调度, 为0时不启用
+
+    """
+    queue_limit: int = 0
+    max_in_flight: int = 0
+    shed_queue_wait: float = 0
+    _in_flight: int = 0
+    _lock = threading.Lock()
+
+    @classmethod
+    def acquire(cls, queue_size: int,
+                oldest_wait: float) -> t.Optional[t.Tuple[str, str]]:
+        """
+        申请接收一个调度, 准入后计入已接收未完成的调度数.
+        Args:
+            queue_size: job队列中等待执行的调度数
+            oldest_wait: job队列中最早的调度已等待的时间(秒)
+
+        Returns:
+            拒绝原因(指标标签, 提示信息), 准入时返回None
+
+        """
+        if cls.queue_limit and queue_size >= cls.queue_limit:
+            return 'queue_full', f'任务队列已满({cls.queue_limit})'
+        if cls.shed_queue_wait and oldest_wait > cls.shed_queue_wait:
+            return 'queue_wait', f'任务队列等待时间过长({oldest_wait:.1f}s)'
+        with cls._lock:
+            if cls.max_in_flight and cls._in_flight >= cls.max_in_flight:
+                return 'in_flight', f'执行器调度数已达上限({cls.max_in_flight})'
+            cls._in_flight += 1
+        return None
+
+    @classmethod
+    def release(cls):
+        """调度执行完成或被清理时释放."""
+        with cls._lock:
+            cls._in_flight = max(cls._in_flight - 1, 0)
+
+    @classmethod
+    def in_flight(cls) -> int:
+        return cls._in_flight
@@ -1,20 +1,30 @@
+import atexit
+import functools
 import logging
 import os
-import random
+import signal
+import sqlite3
+import threading
 import time
 import typing as t
 
-import filelock
 from lesoon_common import LesoonFlask
 from lesoon_restful.api import Api
 
+from lesoon_cron.scheduler.xxl_job.admission import TriggerAdmission
 from lesoon_cron.scheduler.xxl_job.client import XxlJobClient
+from lesoon_cron.scheduler.xxl_job.globals import XxlJobGlobals
 from lesoon_cron.scheduler.xxl_job.helper import XxlJobHelper
 from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+from lesoon_cron.scheduler.xxl_job.metrics import XxlJobMetrics
+from lesoon_cron.scheduler.xxl_job.parallel import ParallelExecutor
+from lesoon_cron.scheduler.xxl_job.param import TriggerParamDecoder
 from lesoon_cron.scheduler.xxl_job.resource import XxlJobResource
+from lesoon_cron.scheduler.xxl_job.spool import CallbackSpool
+from lesoon_cron.scheduler.xxl_job.thread.work import BaseJob
 from lesoon_cron.scheduler.xxl_job.thread.work import CallbackThread
+from lesoon_cron.scheduler.xxl_job.thread.work import LogMaintenanceThread
 from lesoon_cron.scheduler.xxl_job.thread.work import RegistryThread
-from lesoon_cron.utils import get_local_ip
 
 
 class XxlJob:
@@ -26,19 +36,103 @@ class XxlJob:
         self.stop_registry = False
         self.registry_thread = None
         self.callback_thread = None
+        self.log_maintenance_thread = None
+        # 等待执行中调度完成的最长时间(秒)
+        self.drain_timeout: float = 20
+        self.shutdown_lock = threading.Lock()
+        self.is_shutdown = False
         self.logger = logging.getLogger('XXL-JOB')
 
     @staticmethod
     def _default_config() -> dict:
         return {
+            # 调度中心地址, 多个节点以逗号分隔或使用列表
             'ADDRESS': '',
             'ACCESS_TOKEN': '',
             'BEAT_PERIOD': 30,
+            # 首次心跳注册的最大随机延迟(秒)
+            'BEAT_FIRST_JITTER': 2,
+            # 调度中心连接池大小
+            'HTTP_POOL_SIZE': 10,
+            # 调度中心连接超时(秒)
+            'HTTP_CONNECT_TIMEOUT': 3,
+            # 调度中心读取超时(秒)
+            'HTTP_READ_TIMEOUT': 10,
+            # 调度中心请求失败最大重试次数
+            'HTTP_MAX_RETRIES': 2,
+            # 调度中心节点连续失败该次数后熔断
+            'ADMIN_FAILURE_THRESHOLD': 3,
+            # 调度中心节点熔断时间(秒)
+            'ADMIN_CIRCUIT_OPEN_SECONDS': 10,
+            # 回调请求体超过该字节数时gzip压缩, 为0时不压缩
+            'CALLBACK_GZIP_MIN_BYTES': 0,
             'CALLBACK_RETRY_PERIOD': 30,
+            # 单批次最大回调参数数
+            'CALLBACK_BATCH_SIZE': 100,
+            # 回调批次等待凑满的最长时间(秒)
+            'CALLBACK_BATCH_LINGER': 0.05,
+            # 单批次回调请求体最大字节数
+            'CALLBACK_BATCH_MAX_BYTES': 512 * 1024,
+            # 同时进行中的回调批次数
+            'CALLBACK_MAX_IN_FLIGHT': 1,
+            # 回调参数本地日志目录, 为空时不持久化回调参数
+            'CALLBACK_SPOOL_DIR': '',
             'LOG_DIR_PATH': '/data/logs/xxl-job/handler',
+            # 任务日志异步写入, 开启后日志在刷盘前可能丢失(如进程被强制杀死)
+            'LOG_ASYNC_WRITE': False,
+            # 异步写入时最多缓存的文件句柄数
+            'LOG_MAX_OPEN_FILES': 128,
+            # 异步写入时触发刷盘的缓冲字节数
+            'LOG_FLUSH_SIZE': 64 * 1024,
+            # 异步写入时的刷盘间隔(秒)
+            'LOG_FLUSH_INTERVAL': 1,
+            # 任务日志保留天数, 为0时不删除
+            'LOG_RETENTION_DAYS': 0,
+            # 超过该天数的日志目录打包为zip归档, 为0时不归档
+            'LOG_COMPRESS_AFTER_DAYS': 0,
+            # 任务日志清理周期(秒), 为0或未开启删除、归档时不清理
+            'LOG_MAINTENANCE_PERIOD': 3600,
+            # 调度参数解析缓存数量
+            'PARAM_CACHE_SIZE': 1024,
+            # 超过该长度的调度参数不进入缓存
+            'PARAM_CACHE_MAX_LENGTH': 4096,
+            # 共享工作线程数, 为0时每个任务独占一个线程
+            'WORKER_POOL_SIZE': 0,
+            # 共享工作线程池的调度优先级与权重, 覆盖处理器类的priority、weight属性,
+            # 如{'SimpleHandler': {'PRIORITY': 1}, 'SimpleHandler.test': {'WEIGHT': 2}, 10: {...}}
+            'JOB_SCHEDULING': {},
+            # 闲置超过该时间(秒)的job被清理, 为0时不清理
+            'JOB_IDLE_TIMEOUT': 90,
+            # 单个job队列中等待执行的最大调度数, 超出时拒绝调度, 为0时不限制
+            'JOB_QUEUE_LIMIT': 0,
+            # 已接收未完成(排队及执行中)的调度总数上限, 为0时不限制
+            'MAX_IN_FLIGHT_TRIGGERS': 0,
+            # job队列中最早的调度等待超过该时间(秒)时拒绝新调度, 为0时不启用
+            'SHED_QUEUE_WAIT': 0,
+            # 工作进程数, 为0时run_in_process标记的任务仍在线程中执行
+            'PROCESS_POOL_SIZE': 0,
+            # XxlJobHelper.submit共享执行器的最大并发线程数
+            'PARALLEL_MAX_WORKERS': 4,
+            # 调度日志id幂等存储目录, 按执行器名称分库, 为空时只在任务队列内去重
+            'TRIGGER_DEDUP_DIR': '',
+            # 调度日志id保留时间(秒)
+            'TRIGGER_DEDUP_TTL': 7 * 24 * 3600,
+            # 多进程部署(如gunicorn)时将任务路由到所属工作进程
+            'JOB_ROUTING': False,
+            # 任务路由的Unix socket目录, 为空时使用/tmp/xxl-job-router-{执行器端口}
+            'JOB_ROUTER_DIR': '',
+            # 任务路由转发超时(秒)
+            'JOB_ROUTER_TIMEOUT': 5,
+            # 收到SIGTERM时下线执行器后再退出, 退出最多延迟DRAIN_TIMEOUT+DRAIN_CALLBACK_TIMEOUT
+            'DRAIN_ON_SIGTERM': False,
+            # 下线时等待执行中调度完成的最长时间(秒), 超时后终止
+            'DRAIN_TIMEOUT': 20,
+            # 下线时回调剩余调度结果的最长时间(秒)
+            'DRAIN_CALLBACK_TIMEOUT': 5,
             'EXECUTOR': {
                 'APP_NAME': 'LESOON-CRON',
-                'IP': f'http://{get_local_ip()}',
+                # 执行器地址(含协议), 为空时在注册线程中探测本机IP
+                'IP': '',
                 'PORT': 5000,
             }
         }
@@ -52,15 +146,15 @@ class XxlJob:
 
         """
         RegistryThread.beat_period = config['BEAT_PERIOD']
+        RegistryThread.first_beat_jitter = config['BEAT_FIRST_JITTER']
 
         EXECUTOR_CONFIG = config['EXECUTOR']
         for k, v in self._default_config()['EXECUTOR'].items():
             EXECUTOR_CONFIG.setdefault(k, v)
-        registry_thread = RegistryThread(
-            app_name=EXECUTOR_CONFIG['APP_NAME'],
-            registry_address=
-            f"{EXECUTOR_CONFIG['IP']}:{EXECUTOR_CONFIG['PORT']}/{self.resource_name}"
-        )
+        registry_thread = RegistryThread(app_name=EXECUTOR_CONFIG['APP_NAME'],
+                                         ip=EXECUTOR_CONFIG['IP'],
+                                         port=EXECUTOR_CONFIG['PORT'],
+                                         path=self.resource_name)
         self.registry_thread = registry_thread
         registry_thread.start()
 
@@ -73,10 +167,134 @@ class XxlJob:
 
         """
         CallbackThread.callback_retry_period = config['CALLBACK_RETRY_PERIOD']
+        CallbackThread.batch_size = config['CALLBACK_BATCH_SIZE']
+        CallbackThread.batch_linger = config['CALLBACK_BATCH_LINGER']
+        CallbackThread.batch_max_bytes = config['CALLBACK_BATCH_MAX_BYTES']
+        CallbackThread.max_in_flight = config['CALLBACK_MAX_IN_FLIGHT']
+        CallbackThread.flush_timeout = config['DRAIN_CALLBACK_TIMEOUT']
+        if spool_dir := config['CALLBACK_SPOOL_DIR']:
+            try:
+                CallbackThread.spool = CallbackSpool(spool_dir=spool_dir)
+            except OSError as e:
+                self.logger.warning(f'回调参数本地日志目录{spool_dir}不可用, 不持久化回调参数:{e}')
+            else:
+                CallbackThread.recover()
         callback_thread = CallbackThread()
         self.callback_thread = callback_thread
         callback_thread.start()
 
+    def log_maintenance(self, config: dict):
+        """
+        启动任务日志清理线程
+        Args:
+            config: xxl-job配置
+
+        """
+        LogMaintenanceThread.period = config['LOG_MAINTENANCE_PERIOD']
+        LogMaintenanceThread.retention_days = config['LOG_RETENTION_DAYS']
+        LogMaintenanceThread.compress_after_days = config[
+            'LOG_COMPRESS_AFTER_DAYS']
+        log_maintenance_thread = LogMaintenanceThread()
+        self.log_maintenance_thread = log_maintenance_thread
+        log_maintenance_thread.start()
+
+    def routing(self, app: LesoonFlask, config: dict):
+        """
+        启动任务路由, 使同一任务的调度都由同一工作进程执行
+        Args:
+            app: lesoonFlask.app
+            config: xxl-job配置
+
+        """
+        port = config['EXECUTOR'].get(
+            'PORT',
+            self._default_config()['EXECUTOR']['PORT'])
+        socket_dir = config['JOB_ROUTER_DIR'] or f'/tmp/xxl-job-router-{port}'
+        router = XxlJobGlobals.init_job_router(
+            socket_dir=socket_dir,
+            dispatch=functools.partial(XxlJobResource.dispatch_forwarded,
+                                       app=app),
+            timeout=config['JOB_ROUTER_TIMEOUT'])
+        atexit.register(router.stop)
+        self.logger.info(f'XXL-JOB任务路由已启动:{router.socket_path(router.pid)}')
+
+    def shutdown(self):
+        """
+        下线执行器, 耗时不超过DRAIN_TIMEOUT与DRAIN_CALLBACK_TIMEOUT之和(另加1s终止等待).
+        1. 拒绝新的调度, 并立即移除执行器注册
+        2. 等待执行中及排队的调度完成, 超时后终止并回调失败结果
+        3. 回调全部调度结果后停止其余线程
+
+        """
+        with self.shutdown_lock:
+            if self.is_shutdown:
+                return
+            self.is_shutdown = True
+        start = time.monotonic()
+        self.logger.info('XXL-JOB执行器开始下线...')
+        XxlJobGlobals.start_draining()
+        # 移除注册与等待调度完成同时进行
+        RegistryThread.stop()
+        if not XxlJobGlobals.wait_jobs_idle(timeout=self.drain_timeout):
+            jobs = XxlJobGlobals.remove_all_job_threads(
+                reason='执行器下线, 终止未完成的调度')
+            busy = sum(bool(jt.is_running_or_has_queue) for jt in jobs)
+            self.logger.warning(f'XXL-JOB执行器下线等待超时, 终止{busy}个未完成的任务')
+            # 等待被终止的调度推送回调参数
+            XxlJobGlobals.wait_jobs_idle(timeout=1, jobs=jobs)
+        CallbackThread.stop()
+        deadline = time.monotonic() + CallbackThread.flush_timeout
+        for thread in (self.callback_thread, self.registry_thread):
+            if thread and thread.is_alive():
+                thread.join(timeout=max(deadline - time.monotonic(), 0))
+        flushed = not (self.callback_thread and self.callback_thread.is_alive())
+        if (spool := CallbackThread.spool) and flushed:
+            spool.close()
+        LogMaintenanceThread.stop()
+        XxlJobGlobals.shutdown()
+        XxlJobLogger.stop_writer()
+        self.logger.info(f'XXL-JOB执行器已下线, 耗时{time.monotonic() - start:.2f}s')
+
+    def _handle_sigterm(self, previous: t.Any, signum: int, frame: t.Any):
+        if not self.is_shutdown:
+            # 在后台线程中下线, 期间仍可响应调度中心请求; 完成后重新发送信号
+            def drain():
+                self.shutdown()
+                os.kill(os.getpid(), signum)
+
+            threading.Thread(target=drain, name='xxl-job-drain').start()
+            return
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    def install_signal_handler(self):
+        """收到SIGTERM时先下线执行器, 再交由原有的信号处理函数处理."""
+        if threading.current_thread() is not threading.main_thread():
+            self.logger.warning('非主线程中初始化, 无法注册SIGTERM下线处理')
+            return
+        previous = signal.getsignal(signal.SIGTERM)
+        signal.signal(signal.SIGTERM,
+                      functools.partial(self._handle_sigterm, previous))
+
+    @staticmethod
+    def init_metrics():
+        """注册执行器仪表类指标."""
+        XxlJobMetrics.gauge('callback_queue_depth',
+                            CallbackThread.callback_queue.qsize)
+        XxlJobMetrics.gauge('job_queue_depth',
+                            XxlJobGlobals.get_job_queue_depths)
+        XxlJobMetrics.gauge('triggers_in_flight', TriggerAdmission.in_flight)
+        if client := XxlJobHelper.client:
+            XxlJobMetrics.gauge('admin_nodes', client.node_status)
+        if pool := XxlJobGlobals._job_worker_pool:
+            XxlJobMetrics.gauge('worker_pool_ready_depth',
+                                pool.ready_queue.qsize)
+            XxlJobMetrics.gauge('worker_pool_lane_depth',
+                                pool.ready_queue.lane_depths)
+
     def initialize(self, app: LesoonFlask):
         """
         初始化xxl-job调度所需的一切工作
@@ -89,28 +307,71 @@ class XxlJob:
         config = app.config['CRON'].get('XXL-JOB', {})
         for k, v in self._default_config().items():
             config.setdefault(k, v)
+        # 已注册的处理函数注入应用上下文, 工作进程fork时继承
+        XxlJobGlobals.bind_app(app)
+        if process_pool_size := config['PROCESS_POOL_SIZE']:
+            # 工作进程需在其他线程启动前fork
+            XxlJobGlobals.init_process_worker_pool(size=process_pool_size)
+            self.logger.info(f'XXL-JOB已启动{process_pool_size}个工作进程.')
         # 注册xxl-job执行器
-        XxlJobHelper.client = XxlJobClient(base_url=config['ADDRESS'],
-                                           access_token=config['ACCESS_TOKEN'])
+        XxlJobHelper.client = XxlJobClient(
+            base_url=config['ADDRESS'],
+            access_token=config['ACCESS_TOKEN'],
+            pool_size=config['HTTP_POOL_SIZE'],
+            connect_timeout=config['HTTP_CONNECT_TIMEOUT'],
+            read_timeout=config['HTTP_READ_TIMEOUT'],
+            max_retries=config['HTTP_MAX_RETRIES'],
+            gzip_min_bytes=config['CALLBACK_GZIP_MIN_BYTES'],
+            failure_threshold=config['ADMIN_FAILURE_THRESHOLD'],
+            circuit_open_seconds=config['ADMIN_CIRCUIT_OPEN_SECONDS'])
         XxlJobLogger.log_dir_path = config['LOG_DIR_PATH']
+        TriggerParamDecoder.cache_size = config['PARAM_CACHE_SIZE']
+        TriggerParamDecoder.max_cached_length = config['PARAM_CACHE_MAX_LENGTH']
+        ParallelExecutor.default_max_workers = config['PARALLEL_MAX_WORKERS']
+        BaseJob.idle_timeout = config['JOB_IDLE_TIMEOUT']
+        TriggerAdmission.queue_limit = config['JOB_QUEUE_LIMIT']
+        TriggerAdmission.max_in_flight = config['MAX_IN_FLIGHT_TRIGGERS']
+        TriggerAdmission.shed_queue_wait = config['SHED_QUEUE_WAIT']
+        if config['LOG_ASYNC_WRITE']:
+            XxlJobLogger.start_writer(
+                max_open_files=config['LOG_MAX_OPEN_FILES'],
+                flush_size=config['LOG_FLUSH_SIZE'],
+                flush_interval=config['LOG_FLUSH_INTERVAL'])
+        if config['LOG_MAINTENANCE_PERIOD'] and (
+                config['LOG_RETENTION_DAYS'] or
+                config['LOG_COMPRESS_AFTER_DAYS']):
+            self.log_maintenance(config=config)
+        if dedup_dir := config['TRIGGER_DEDUP_DIR']:
+            app_name = config['EXECUTOR'].get(
+                'APP_NAME',
+                self._default_config()['EXECUTOR']['APP_NAME'])
+            dedup_path = os.path.join(dedup_dir, f'{app_name}.db')
+            try:
+                XxlJobGlobals.init_log_id_store(path=dedup_path,
+                                                ttl=config['TRIGGER_DEDUP_TTL'])
+            except (OSError, sqlite3.Error) as e:
+                self.logger.warning(f'调度日志id幂等存储{dedup_path}不可用, 只在任务队列内去重:{e}')
+        if pool_size := config['WORKER_POOL_SIZE']:
+            XxlJobGlobals.init_job_worker_pool(
+                size=pool_size, scheduling=config['JOB_SCHEDULING'])
+            self.logger.info(f'XXL-JOB以{pool_size}个共享工作线程执行任务.')
+        if config['JOB_ROUTING']:
+            self.routing(app=app, config=config)
+        self.init_metrics()
         self.init_resource(app=app)
         self.callback(app=app, config=config)
         self.logger.info('XXL-JOB任务状态检测线程启动完成.')
 
-        try:
-            with filelock.FileLock('xxl-job-register.lock', timeout=0):
-                # 启动工作线程
-                self.logger.info(f'XXL-JOB 当前以{self.beat_period}s进行心跳注册,'
-                                 f' 以{self.check_task_period}s进行任务状态检测.')
-
-                self.registry(app=app, config=config)
-                self.logger.info('XXL-JOB心跳注册线程启动完成.')
-
-                if os.environ.get('gunicorn_flag', None):
-                    self.logger.info('以GUNICORN方式启动，进入短暂休眠防止重复注册.')
-                    time.sleep(random.randint(20, 30))
-        except filelock.Timeout:
-            app.logger.info('XXL-JOB注册进程已存在....')
+        # 注册在后台线程中进行, 多进程部署时由注册线程通过文件锁选出注册进程
+        self.logger.info(f'XXL-JOB 当前以{self.beat_period}s进行心跳注册,'
+                         f' 以{self.check_task_period}s进行任务状态检测.')
+        self.registry(app=app, config=config)
+        self.logger.info('XXL-JOB心跳注册线程启动完成.')
+        self.drain_timeout = config['DRAIN_TIMEOUT']
+        # 只在收到信号时下线, 正常退出不等待调度完成
+        if config['DRAIN_ON_SIGTERM']:
+            self.install_signal_handler()
+        XxlJobMetrics.mark('initialized')
 
     def init_resource(self, app: LesoonFlask):
         # 注册xxl-job路由
@@ -1,16 +1,265 @@
+import gzip
+import json
+import time
 import typing as t
 
 import requests
 from lesoon_client import BaseClient
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
 
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
 from lesoon_cron.scheduler.xxl_job.dataclass import CallbackParam
+from lesoon_cron.scheduler.xxl_job.metrics import XxlJobMetrics
+
+
+class AdminNode:
+    """
+    调度中心节点.
+    根据请求结果被动检测节点健康状况: 连续失败达到`failure_threshold`次时熔断,
+    熔断期间不再选择该节点, 熔断结束后放行请求探测, 成功即恢复.
+
+    Attributes:
+        url: 节点地址
+        latency: 请求耗时的指数加权移动平均(秒)
+        failures: 连续失败次数
+        open_until: 熔断结束时间(time.monotonic)
+
+    """
+    # 耗时平滑系数
+    alpha: float = 0.2
+
+    def __init__(self,
+                 url: str,
+                 failure_threshold: int = 3,
+                 open_seconds: float = 10):
+        self.url = url.rstrip('/')
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        # 未请求过的节点耗时记为0, 优先被选中
+        self.latency = 0.0
+        self.failures = 0
+        self.open_until = 0.0
+
+    def __repr__(self):
+        return f'AdminNode({self.url})'
+
+    def available(self, now: float) -> bool:
+        return now >= self.open_until
+
+    def on_success(self, latency: float):
+        self.latency = latency if not self.latency else (
+            self.alpha * latency + (1 - self.alpha) * self.latency)
+        self.failures = 0
+        self.open_until = 0.0
+
+    def on_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.open_seconds
+            XxlJobMetrics.counter('admin_circuit_open', node=self.url).inc()
+
+    def status(self) -> dict:
+        return {
+            'latency': self.latency,
+            'failures': self.failures,
+            'available': self.available(time.monotonic())
+        }
 
 
 class XxlJobClient(BaseClient):
+    """
+    XXL-JOB调度中心客户端.
+    使用连接池保持长连接, 连接失败时按接口幂等性决定是否重试.
+    支持多个调度中心节点: 注册请求发送到所有可用节点, 其余请求发送到耗时最短的健康节点,
+    节点失败时立即切换到下一个节点.
+
+    Attributes:
+        nodes: 调度中心节点
+        timeout: (连接超时, 读取超时)秒
+        max_retries: 所有节点均请求失败时的最大重试轮数
+        gzip_min_bytes: 回调请求体超过该字节数时gzip压缩, 为0时不压缩
+
+    """
 
-    def __init__(self, *args, access_token: str = '', **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self,
+                 base_url: t.Union[str, t.Sequence[str]],
+                 *args,
+                 access_token: str = '',
+                 pool_size: int = 10,
+                 connect_timeout: float = 3,
+                 read_timeout: float = 10,
+                 max_retries: int = 2,
+                 gzip_min_bytes: int = 0,
+                 failure_threshold: int = 3,
+                 circuit_open_seconds: float = 10,
+                 **kwargs):
+        urls = base_url.split(',') if isinstance(base_url, str) else base_url
+        self.nodes = [
+            AdminNode(url=url.strip(),
+                      failure_threshold=failure_threshold,
+                      open_seconds=circuit_open_seconds)
+            for url in urls
+            if url.strip()
+        ]
+        # 未配置调度中心地址时不发送请求, 直接返回失败响应
+        base_url = self.nodes[0].url if self.nodes else ''
+        super().__init__(*args, base_url=base_url, **kwargs)
+        self.base_url = base_url
         self.headers = {'XXL-JOB-ACCESS-TOKEN': access_token}
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.gzip_min_bytes = gzip_min_bytes
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(len(self.nodes), 1),
+                              pool_maxsize=pool_size,
+                              pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @staticmethod
+    def _record(path: str, latency: float, success: bool):
+        XxlJobMetrics.histogram('admin_request_seconds',
+                                path=path).observe(latency)
+        if not success:
+            XxlJobMetrics.counter('admin_request_errors', path=path).inc()
+
+    @staticmethod
+    def _not_sent(e: requests.ConnectionError) -> bool:
+        """连接未建立(连接超时、拒绝连接)时请求必然未送达."""
+        if isinstance(e, requests.ConnectTimeout):
+            return True
+        reason = getattr(e.args[0], 'reason', None) if e.args else None
+        return isinstance(reason, NewConnectionError)
+
+    def node_status(self) -> t.Dict[str, dict]:
+        """各调度中心节点的健康状况."""
+        return {node.url: node.status() for node in self.nodes}
+
+    @staticmethod
+    def _no_node(path: str) -> requests.Response:
+        """未配置调度中心地址时的失败响应."""
+        res = requests.Response()
+        res.status_code = 503
+        res.url = path
+        res._content = json.dumps({
+            'code': ResponseCode.Failure.value,
+            'msg': '未配置XXL-JOB调度中心地址'
+        }).encode('utf-8')
+        return res
+
+    def _select_node(self, exclude: t.Collection[AdminNode]) -> AdminNode:
+        """选择耗时最短的健康节点, 全部熔断时选择最早结束熔断的节点."""
+        now = time.monotonic()
+        candidates = [node for node in self.nodes if node not in exclude]
+        if healthy := [node for node in candidates if node.available(now)]:
+            return min(healthy, key=lambda node: node.latency)
+        return min(candidates, key=lambda node: node.open_until)
+
+    def _encode(self, data: t.Any,
+                compress: bool) -> t.Tuple[bytes, t.Dict[str, str]]:
+        body = json.dumps(data).encode('utf-8')
+        headers = {**self.headers, 'Content-Type': 'application/json'}
+        if compress and 0 < self.gzip_min_bytes <= len(body):
+            body = gzip.compress(body)
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
+
+    def _send(self, node: AdminNode, path: str, body: bytes,
+              headers: t.Dict[str, str]) -> requests.Response:
+        """向指定节点发送请求, 并根据结果更新节点健康状况."""
+        start = time.perf_counter()
+        try:
+            res = self.session.post(f'{node.url}{path}',
+                                    data=body,
+                                    headers=headers,
+                                    timeout=self.timeout)
+        except requests.RequestException:
+            self._record(path, time.perf_counter() - start, False)
+            node.on_failure()
+            raise
+        latency = time.perf_counter() - start
+        self._record(path, latency, res.ok)
+        if res.status_code >= 500:
+            node.on_failure()
+        else:
+            node.on_success(latency)
+        return res
+
+    def _post(self,
+              path: str,
+              data: t.Any,
+              idempotent: bool,
+              compress: bool = False) -> requests.Response:
+        """
+        发送POST请求, 节点失败时切换到下一个节点.
+        Args:
+            path: 接口路径
+            data: 请求数据
+            idempotent: 接口是否幂等, 幂等接口在连接中断时也会重试
+            compress: 是否允许gzip压缩请求体
+
+        """
+        if not self.nodes:
+            return self._no_node(path)
+        body, headers = self._encode(data, compress=compress)
+        attempt = 0
+        tried: t.Set[AdminNode] = set()
+        while True:
+            node = self._select_node(exclude=tried)
+            tried.add(node)
+            try:
+                res = self._send(node, path, body, headers)
+            except requests.ConnectionError as e:
+                # 连接未建立时请求必然未送达, 任何接口都可以重试
+                retryable = idempotent or self._not_sent(e)
+                if not retryable:
+                    raise
+                if len(tried) < len(self.nodes):
+                    continue
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                tried.clear()
+                time.sleep(0.1 * 2**attempt)
+                continue
+            if res.status_code >= 500 and len(tried) < len(self.nodes):
+                continue
+            return self._handle_result(res,
+                                       method='POST',
+                                       request_url=f'{node.url}{path}')
+
+    def _post_all(self, path: str, data: t.Any) -> requests.Response:
+        """
+        向所有可用节点发送幂等请求, 全部熔断时向所有节点发送.
+        Returns:
+            首个成功的响应, 全部失败时返回最后的响应或抛出最后的异常
+
+        """
+        if len(self.nodes) <= 1:
+            return self._post(path, data=data, idempotent=True)
+        body, headers = self._encode(data, compress=False)
+        now = time.monotonic()
+        nodes = [node for node in self.nodes if node.available(now)
+                ] or self.nodes
+        result: t.Optional[requests.Response] = None
+        error: t.Optional[Exception] = None
+        for node in nodes:
+            try:
+                res = self._send(node, path, body, headers)
+            except requests.RequestException as e:
+                self.log.error(f'XXL-JOB调度中心{node.url}请求失败:{e}')
+                error = e
+                continue
+            self._handle_result(res,
+                                method='POST',
+                                request_url=f'{node.url}{path}')
+            if not result or (self.is_success(res) and
+                              not self.is_success(result)):
+                result = res
+        if result is None:
+            raise error  # type:ignore
+        return result
 
     def _handle_result(
         self,
@@ -38,6 +287,14 @@ class XxlJobClient(BaseClient):
 
         return res
 
+    @staticmethod
+    def is_success(res: requests.Response) -> bool:
+        """判断调度中心是否处理成功."""
+        try:
+            return res.json().get('code') == ResponseCode.Success.value
+        except Exception:
+            return False
+
     def registry(self,
                  register_key: str,
                  register_value: str,
@@ -55,7 +312,7 @@ class XxlJobClient(BaseClient):
             'registryKey': register_key,
             'registryValue': register_value
         }
-        return self.POST('/api/registry', json=data, headers=self.headers)
+        return self._post_all('/api/registry', data=data)
 
     def remove_registry(self,
                         register_key: str,
@@ -74,7 +331,7 @@ class XxlJobClient(BaseClient):
             'registryKey': register_key,
             'registryValue': register_value
         }
-        return self.POST('/api/registryRemove', json=data, headers=self.headers)
+        return self._post_all('/api/registryRemove', data=data)
 
     def callback(self, params: t.List[CallbackParam]):
         """
@@ -90,4 +347,8 @@ class XxlJobClient(BaseClient):
             'handleCode': param.code.value,
             'handleMsg': param.msg
         } for param in params]
-        return self.POST('/api/callback', json=data, headers=self.headers)
+        # 调度中心对重复回调返回失败, 由回调线程决定是否重试
+        return self._post('/api/callback',
+                          data=data,
+                          idempotent=False,
+                          compress=True)
@@ -3,6 +3,8 @@ import typing as t
 from lesoon_cron.scheduler.xxl_job.code import ResponseCode
 from lesoon_cron.scheduler.xxl_job.thread.base import InheritableLocal
 
+# 变量保存在contextvars中, 共享事件循环线程的协程任务之间互相隔离;
+# InheritableThread创建的子线程继承父线程的上下文快照
 local = InheritableLocal()
 
 
@@ -21,15 +23,12 @@ class XxlJobContext:
     """
 
     @staticmethod
-    def set(context: 'XxlJobContext'):
-        local.xxl_job_context = context
+    def set(context: t.Optional['XxlJobContext']):
+        local.context = context
 
     @staticmethod
     def get() -> t.Optional['XxlJobContext']:
-        if hasattr(local, 'xxl_job_context'):
-            return local.xxl_job_context
-        else:
-            return None
+        return getattr(local, 'context', None)
 
     def __init__(self, job_id: int, job_args: t.Sequence, job_kwargs: dict,
                  job_file_path: str, broadcast_index: int,
@@ -1,9 +1,21 @@
+import inspect
+import threading
+import time
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 
 from lesoon_common import LesoonFlask
+
+from lesoon_cron.utils import context_inject
 if t.TYPE_CHECKING:
     from lesoon_cron.scheduler.xxl_job.handler import XxlJobHandlerMeta
-    from lesoon_cron.scheduler.xxl_job.thread.work import JobThread
+    from lesoon_cron.scheduler.xxl_job.idempotency import LogIdStore
+    from lesoon_cron.scheduler.xxl_job.router import JobRouter
+    from lesoon_cron.scheduler.xxl_job.thread.coroutine import EventLoopThread
+    from lesoon_cron.scheduler.xxl_job.thread.pool import JobWorkerPool
+    from lesoon_cron.scheduler.xxl_job.thread.process import ProcessWorkerPool
+    from lesoon_cron.scheduler.xxl_job.thread.timer import TimerThread
+    from lesoon_cron.scheduler.xxl_job.thread.work import BaseJob
 
 
 class XxlJobGlobals:
@@ -15,40 +27,352 @@ class XxlJobGlobals:
     # 执行器字典
     _register_handlers: t.Dict[str, 'XxlJobHandlerMeta'] = {}
 
+    # 处理函数字典, 'Class.method' -> 绑定处理器单例的方法
+    _handler_methods: t.Dict[str, t.Callable] = {}
+
+    # 处理器单例
+    _handler_instances: t.Dict['XxlJobHandlerMeta', t.Any] = {}
+
+    # 分发表, 'Class.method' -> 绑定单例并注入应用上下文的处理函数
+    _dispatch_table: t.Dict[str, t.Callable] = {}
+    # 处理函数注入上下文的应用
+    _app: t.Optional[LesoonFlask] = None
+    # 只保护处理器相关字典, 持有期间不调用处理器代码
+    _dispatch_lock = threading.Lock()
+    # 保护共享线程的创建
+    _thread_lock = threading.Lock()
+
     # 任务线程字典
-    _register_job_threads: t.Dict[int, 'JobThread'] = {}
+    _register_job_threads: t.Dict[int, 'BaseJob'] = {}
+
+    # 共享工作线程池,为空时每个任务独占一个线程
+    _job_worker_pool: t.Optional['JobWorkerPool'] = None
+
+    # 共享工作线程池的调度优先级与权重配置,
+    # 任务id或处理函数名('Class.method'或'Class') -> {'PRIORITY': 优先级, 'WEIGHT': 权重}
+    _job_scheduling: t.Dict[t.Union[int, str], dict] = {}
+
+    # 工作进程池,为空时标记在进程中执行的任务仍在线程中执行
+    _process_worker_pool: t.Optional['ProcessWorkerPool'] = None
+
+    # 协程任务共享事件循环线程
+    _event_loop_thread: t.Optional['EventLoopThread'] = None
+
+    # 执行超时、闲置清理等定时任务共享的定时线程
+    _timer_thread: t.Optional['TimerThread'] = None
+
+    # 处理定时线程到期事件的线程池, 定时线程只负责触发, 不执行耗时操作
+    _timer_executor: t.Optional[ThreadPoolExecutor] = None
+    timer_executor_size: int = 4
+
+    # 多进程部署时的任务路由, 为空时在当前进程处理所有任务
+    _job_router: t.Optional['JobRouter'] = None
+
+    # 调度日志id幂等存储, 为空时只在任务队列内去重
+    _log_id_store: t.Optional['LogIdStore'] = None
+
+    # 执行器下线中, 不再接收新的调度
+    _draining: bool = False
+
+    @classmethod
+    def start_draining(cls):
+        cls._draining = True
+
+    @classmethod
+    def is_draining(cls) -> bool:
+        return cls._draining
+
+    @classmethod
+    def get_event_loop_thread(cls) -> 'EventLoopThread':
+        from lesoon_cron.scheduler.xxl_job.thread.coroutine import EventLoopThread
+        if not cls._event_loop_thread:
+            with cls._thread_lock:
+                if not cls._event_loop_thread:
+                    loop_thread = EventLoopThread()
+                    loop_thread.start()
+                    cls._event_loop_thread = loop_thread
+        return cls._event_loop_thread
+
+    @classmethod
+    def get_timer_thread(cls) -> 'TimerThread':
+        from lesoon_cron.scheduler.xxl_job.thread.timer import TimerThread
+        if not cls._timer_thread:
+            with cls._thread_lock:
+                if not cls._timer_thread:
+                    timer_thread = TimerThread()
+                    timer_thread.start()
+                    cls._timer_thread = timer_thread
+        return cls._timer_thread
+
+    @classmethod
+    def get_timer_executor(cls) -> ThreadPoolExecutor:
+        if not cls._timer_executor:
+            with cls._thread_lock:
+                if not cls._timer_executor:
+                    cls._timer_executor = ThreadPoolExecutor(
+                        max_workers=cls.timer_executor_size,
+                        thread_name_prefix='xxl-job-timer-worker')
+        return cls._timer_executor
+
+    @classmethod
+    def init_job_worker_pool(
+        cls,
+        size: int,
+        scheduling: t.Optional[t.Dict[t.Union[int, str], dict]] = None
+    ) -> 'JobWorkerPool':
+        from lesoon_cron.scheduler.xxl_job.thread.pool import JobWorkerPool
+        cls._job_scheduling = scheduling or {}
+        if not cls._job_worker_pool:
+            cls._job_worker_pool = JobWorkerPool(size=size)
+            cls._job_worker_pool.start()
+        return cls._job_worker_pool
+
+    @classmethod
+    def init_process_worker_pool(cls, size: int) -> 'ProcessWorkerPool':
+        from lesoon_cron.scheduler.xxl_job.thread.process import ProcessWorkerPool
+        if not cls._process_worker_pool:
+            cls._process_worker_pool = ProcessWorkerPool(size=size)
+        return cls._process_worker_pool
+
+    @classmethod
+    def init_job_router(cls, socket_dir: str, dispatch: t.Callable[[str, dict],
+                                                                   dict],
+                        timeout: float) -> 'JobRouter':
+        from lesoon_cron.scheduler.xxl_job.router import JobRouter
+        if not cls._job_router:
+            cls._job_router = JobRouter(socket_dir=socket_dir,
+                                        dispatch=dispatch,
+                                        timeout=timeout)
+            cls._job_router.start()
+        return cls._job_router
+
+    @classmethod
+    def get_job_router(cls) -> t.Optional['JobRouter']:
+        return cls._job_router
+
+    @classmethod
+    def init_log_id_store(cls, path: str, ttl: float) -> 'LogIdStore':
+        from lesoon_cron.scheduler.xxl_job.idempotency import LogIdStore
+        if not cls._log_id_store:
+            cls._log_id_store = LogIdStore(path=path, ttl=ttl)
+        return cls._log_id_store
+
+    @classmethod
+    def claim_log_id(cls, log_id: int, job_id: int) -> bool:
+        """记录调度日志id, 已接收过该日志id时返回False."""
+        if store := cls._log_id_store:
+            return store.add(log_id=log_id, job_id=job_id)
+        return True
+
+    @classmethod
+    def release_log_id(cls, log_id: int):
+        """释放被拒绝调度的日志id."""
+        if store := cls._log_id_store:
+            store.remove(log_id=log_id)
 
     @classmethod
     def remove_job_thread(cls, job_id: int,
-                          reason: str) -> t.Optional['JobThread']:
+                          reason: str) -> t.Optional['BaseJob']:
         if jt := cls._register_job_threads.get(job_id):
             jt.stop(reason=reason)
-            for child in jt.children:
-                child.terminate()
             jt.terminate()
             del cls._register_job_threads[job_id]
             return jt
         return None
 
     @classmethod
-    def get_job_thread(cls, job_id: int) -> t.Optional['JobThread']:
+    def replace_job_thread(cls, old: 'BaseJob', new: 'BaseJob') -> bool:
+        """以新job替换仍在注册中的旧job并启动, 旧job不被终止."""
+        if cls._register_job_threads.get(old.job_id) is not old:
+            return False
+        cls._register_job_threads[old.job_id] = new
+        new.start()
+        return True
+
+    @classmethod
+    def get_job_thread(cls, job_id: int) -> t.Optional['BaseJob']:
         return cls._register_job_threads.get(job_id)
 
+    @classmethod
+    def get_job_queue_depths(cls) -> t.Dict[int, int]:
+        """获取各任务调度队列中等待执行的调度数."""
+        return {
+            job_id: jt.trigger_queue.qsize()
+            for job_id, jt in list(cls._register_job_threads.items())
+        }
+
+    @classmethod
+    def wait_jobs_idle(cls,
+                       timeout: float,
+                       jobs: t.Optional[t.List['BaseJob']] = None) -> bool:
+        """
+        等待job执行完成且调度队列为空.
+        Args:
+            timeout: 最长等待时间(秒)
+            jobs: 等待的job, 默认为所有已注册的job
+
+        Returns:
+            超时前全部完成时返回True
+
+        """
+        if jobs is None:
+            jobs = list(cls._register_job_threads.values())
+        deadline = time.monotonic() + timeout
+        while jobs := [jt for jt in jobs if jt.is_running_or_has_queue]:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    @classmethod
+    def remove_all_job_threads(cls, reason: str) -> t.List['BaseJob']:
+        """终止所有job, 返回被终止的job."""
+        return [
+            jt for job_id in list(cls._register_job_threads)
+            if (jt := cls.remove_job_thread(job_id=job_id, reason=reason))
+        ]
+
+    @classmethod
+    def shutdown(cls):
+        """停止共享的工作线程、工作进程与定时线程."""
+        if pool := cls._job_worker_pool:
+            pool.stop()
+        if process_pool := cls._process_worker_pool:
+            process_pool.stop()
+        if loop_thread := cls._event_loop_thread:
+            loop_thread.stop()
+        if timer_thread := cls._timer_thread:
+            timer_thread.stop()
+        if timer_executor := cls._timer_executor:
+            timer_executor.shutdown(wait=False)
+        if router := cls._job_router:
+            router.stop()
+        if store := cls._log_id_store:
+            store.close()
+
     @classmethod
     def get_handler(cls, name: str):
         return cls._register_handlers.get(name)
 
+    @classmethod
+    def _wrap(cls, method: t.Callable) -> t.Callable:
+        if app := cls._app:
+            return context_inject(app.app_context())(method)
+        return method
+
+    @classmethod
+    def bind_app(cls, app: LesoonFlask):
+        """绑定应用, 为已注册的处理函数注入应用上下文."""
+        with cls._dispatch_lock:
+            cls._app = app
+            cls._dispatch_table = {
+                name: cls._wrap(method)
+                for name, method in cls._handler_methods.items()
+            }
+
     @classmethod
     def register_handler(cls, name: str, handler: 'XxlJobHandlerMeta'):
-        cls._register_handlers[name] = handler
+        """
+        注册处理器, 创建处理器单例并生成分发表.
+        只注册处理器类自身定义的公开函数, 不包括继承的方法与嵌套类.
+        """
+        # 处理器构造函数在锁外执行, 可以使用定时线程等共享资源
+        instance = handler()
+        methods = {
+            f'{name}.{attr}': getattr(instance, attr)
+            for attr, value in vars(handler).items()
+            if not attr.startswith('_') and inspect.isfunction(value)
+        }
+        with cls._dispatch_lock:
+            cls._register_handlers[name] = handler
+            cls._handler_instances[handler] = instance
+            # 处理器重复定义时以新定义为准
+            for table in (cls._handler_methods, cls._dispatch_table):
+                for key in [k for k in table if k.startswith(f'{name}.')]:
+                    del table[key]
+            for key, method in methods.items():
+                cls._handler_methods[key] = method
+                cls._dispatch_table[key] = cls._wrap(method)
+
+    @classmethod
+    def get_handle_func(cls, executor_handler: str) -> t.Optional[t.Callable]:
+        """
+        获取处理函数.
+        Args:
+            executor_handler: 处理函数名, 格式为`Class.method`
+
+        Returns:
+            处理函数, 未注册时返回None
+
+        """
+        return cls._dispatch_table.get(executor_handler)
+
+    @classmethod
+    def get_job_scheduling(cls, job_id: int,
+                           executor_handler: str) -> t.Tuple[int, float]:
+        """
+        获取任务的调度优先级与权重.
+        依次以处理器类属性、处理器配置、处理函数配置、任务id配置覆盖.
+        Args:
+            job_id: 任务id
+            executor_handler: 处理函数名, 格式为`Class.method`
+
+        Returns:
+            (优先级, 权重)
+
+        """
+        cls_name = executor_handler.rpartition('.')[0]
+        priority, weight = 0, 1.0
+        if handler := cls._register_handlers.get(cls_name):
+            priority = getattr(handler, 'priority', priority)
+            weight = getattr(handler, 'weight', weight)
+        for key in (cls_name, executor_handler, str(job_id), job_id):
+            if options := cls._job_scheduling.get(key):
+                priority = options.get('PRIORITY', priority)
+                weight = options.get('WEIGHT', weight)
+        return priority, weight
 
     @classmethod
     def register_job_thread(cls,
                             job_id: int,
                             handle_func: t.Callable,
-                            reason: str = '清除旧任务线程') -> 'JobThread':
+                            reason: str = '清除旧任务线程',
+                            executor_handler: str = '') -> 'BaseJob':
+        from lesoon_cron.scheduler.xxl_job.thread.coroutine import AsyncJob
         from lesoon_cron.scheduler.xxl_job.thread.work import JobThread
-        new_jt = JobThread(job_id=job_id, handle_func=handle_func)
+        from lesoon_cron.scheduler.xxl_job.thread.process import PooledProcessJob
+        from lesoon_cron.scheduler.xxl_job.thread.process import ProcessJobThread
+        new_jt: 'BaseJob'
+        process_pool = cls._process_worker_pool
+        if inspect.iscoroutinefunction(handle_func):
+            new_jt = AsyncJob(job_id=job_id,
+                              handle_func=handle_func,
+                              loop_thread=cls.get_event_loop_thread())
+        elif process_pool and getattr(handle_func, 'run_in_process', False):
+            if cls._job_worker_pool:
+                priority, weight = cls.get_job_scheduling(
+                    job_id, executor_handler)
+                new_jt = PooledProcessJob(job_id=job_id,
+                                          handle_func=handle_func,
+                                          pool=cls._job_worker_pool,
+                                          process_pool=process_pool,
+                                          priority=priority,
+                                          weight=weight)
+            else:
+                new_jt = ProcessJobThread(job_id=job_id,
+                                          handle_func=handle_func,
+                                          process_pool=process_pool)
+        elif cls._job_worker_pool:
+            priority, weight = cls.get_job_scheduling(job_id, executor_handler)
+            new_jt = cls._job_worker_pool.create_job(job_id=job_id,
+                                                     handle_func=handle_func,
+                                                     priority=priority,
+                                                     weight=weight)
+        else:
+            new_jt = JobThread(job_id=job_id, handle_func=handle_func)
+        # 在调用线程中预先创建定时线程, 避免job线程创建时被终止:
+        # 新线程启动前沿用创建者的线程号, 异步异常可能抛给新线程导致其无法启动
+        cls.get_timer_thread()
         cls.remove_job_thread(job_id=job_id, reason=reason)
         cls._register_job_threads[job_id] = new_jt
         new_jt.start()
@@ -12,4 +12,26 @@ class XxlJobHandlerMeta(type):
 
 
 class XxlJobHandler(metaclass=XxlJobHandlerMeta):
-    pass
+    """
+    xxl-job 处理器基类.
+    共享工作线程池模式下, 处理器各处理函数的调度按优先级与权重分配工作线程,
+    可在`CRON['XXL-JOB']['JOB_SCHEDULING']`中按处理器、处理函数或任务id覆盖.
+
+    Attributes:
+        priority: 调度优先级, 高优先级有待执行调度时低优先级调度等待
+        weight: 同一优先级内的调度权重, 工作线程按权重比例分配
+
+    """
+    priority: int = 0
+    weight: float = 1
+
+
+def run_in_process(fn: t.Callable) -> t.Callable:
+    """
+    标记处理函数在工作进程中执行.
+    适用于CPU密集型任务, 超时或终止时直接杀死工作进程.
+    需配置`CRON['XXL-JOB']['PROCESS_POOL_SIZE']`, 否则仍在线程中执行.
+
+    """
+    fn.run_in_process = True  # type:ignore
+    return fn
@@ -1,5 +1,6 @@
-import io
+import concurrent.futures
 import logging
+import time
 import typing as t
 from datetime import datetime
 
@@ -7,12 +8,24 @@ from lesoon_cron.scheduler.xxl_job.client import XxlJobClient
 from lesoon_cron.scheduler.xxl_job.code import ResponseCode
 from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
 from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+from lesoon_cron.scheduler.xxl_job.parallel import ParallelExecutor
+from lesoon_cron.scheduler.xxl_job.shard import ShardPartition
 
 logger: logging.Logger = logging.getLogger('xxl-job-helper')
 
 
 class XxlJobHelper:
     client: t.Optional[XxlJobClient] = None
+    # 日志时间缓存(秒级时间戳, 格式化时间)
+    _log_time: t.Tuple[int, str] = (0, '')
+
+    @classmethod
+    def _log_time_str(cls) -> str:
+        now = int(time.time())
+        if now != cls._log_time[0]:
+            cls._log_time = (
+                now, datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'))
+        return cls._log_time[1]
 
     @staticmethod
     def log(msg: str):
@@ -21,14 +34,75 @@ class XxlJobHelper:
         if not xxl_job_contex:
             return False
         if file_path := xxl_job_contex.job_file_path:
-            with io.StringIO() as s:
-                s.write(datetime.now().strftime('%Y-%m-%d %H:%M:%S') + ' ')
-                s.write(msg)
-                XxlJobLogger.write(log_file_path=file_path, msg=s.getvalue())
+            XxlJobLogger.write(log_file_path=file_path,
+                               msg=f'{XxlJobHelper._log_time_str()} {msg}')
             return True
         else:
             return False
 
+    @staticmethod
+    def get_shard() -> ShardPartition:
+        """
+        获取当前调度的分片.
+        非广播调度或不在调度上下文中时, 返回只有一个分片的划分.
+
+        """
+        if context := XxlJobContext.get():
+            return ShardPartition(index=context.broadcast_index or 0,
+                                  total=context.broadcast_total or 1)
+        return ShardPartition()
+
+    @staticmethod
+    def submit(fn: t.Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """
+        提交子任务到当前调度共享的并行执行器.
+        子任务继承xxl-job上下文与应用上下文, 调度结束时未完成的子任务被取消,
+        存在失败的子任务时调度结果置为失败.
+        不在调度上下文中时提交到进程级共享的执行器.
+
+        """
+        return ParallelExecutor.shared().submit(fn, *args, **kwargs)
+
+    @staticmethod
+    def parallel_map(fn: t.Callable,
+                     items: t.Iterable,
+                     max_workers: t.Optional[int] = None,
+                     chunk_size: int = 1,
+                     timeout: t.Optional[float] = None,
+                     fail_fast: bool = False) -> t.List[t.Any]:
+        """
+        并行执行`fn(item)`.
+        Args:
+            fn: 处理函数
+            items: 待处理元素
+            max_workers: 最大并发线程数
+            chunk_size: 每个子任务处理的元素数
+            timeout: 超时时间(秒), 超时后取消未完成的子任务并抛出TimeoutError
+            fail_fast: 出现失败时是否取消余下的子任务
+
+        Returns:
+            按输入顺序排列的结果, 失败的元素以异常对象占位.
+            存在失败时调度结果置为失败.
+
+        """
+        items = list(items)
+        executor = ParallelExecutor(max_workers=max_workers)
+        try:
+            results = executor.map(fn,
+                                   items,
+                                   chunk_size=chunk_size,
+                                   timeout=timeout,
+                                   fail_fast=fail_fast)
+        except BaseException:
+            # 调度超时或被终止时一并取消子任务
+            executor.shutdown(wait=False, cancel=True)
+            raise
+        executor.shutdown(wait=False)
+        if executor.failures:
+            XxlJobHelper.handle_failure(
+                executor.failure_summary(total=len(items)))
+        return results
+
     @staticmethod
     def handle_result(code: ResponseCode, msg: str = '') -> bool:
         if context := XxlJobContext.get():
@@ -0,0 +1,97 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import typing as t
+
+
+class LogIdStore:
+    """
+    调度日志id幂等存储.
+    已接收的日志id保存在本地SQLite数据库(WAL模式)中, 同一执行器的各工作进程共享,
+    进程重启后仍然有效, 保证调度中心重复下发的调度不会被再次执行.
+    超过`ttl`秒的记录视为过期, 每隔`purge_interval`秒清理一次.
+
+    Attributes:
+        path: 数据库文件路径
+        ttl: 记录保留时间(秒)
+        purge_interval: 清理过期记录的间隔(秒)
+
+    """
+    logger: logging.Logger = logging.getLogger('xxl-job-trigger')
+
+    def __init__(self,
+                 path: str,
+                 ttl: float = 7 * 24 * 3600,
+                 purge_interval: float = 600):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self.lock = threading.Lock()
+        self.last_purge = 0.0
+        self.pid = 0
+        self.conn: t.Optional[sqlite3.Connection] = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 连接不能跨进程使用, fork后重新连接
+        if self.conn and self.pid == os.getpid():
+            return self.conn
+        conn = sqlite3.connect(self.path,
+                               timeout=5,
+                               isolation_level=None,
+                               check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS trigger_log ('
+                     'log_id INTEGER PRIMARY KEY, '
+                     'job_id INTEGER NOT NULL, '
+                     'created_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS trigger_log_created_at '
+                     'ON trigger_log (created_at)')
+        self.conn, self.pid = conn, os.getpid()
+        return conn
+
+    def add(self, log_id: int, job_id: int) -> bool:
+        """
+        记录日志id.
+        Returns:
+            是否首次记录, 日志id已存在且未过期时返回False
+
+        """
+        now = time.time()
+        try:
+            with self.lock:
+                conn = self._connect()
+                cursor = conn.execute(
+                    'INSERT INTO trigger_log (log_id, job_id, created_at) '
+                    'VALUES (?, ?, ?) ON CONFLICT (log_id) DO UPDATE SET '
+                    'job_id = excluded.job_id, created_at = excluded.created_at '
+                    'WHERE trigger_log.created_at < ?',
+                    (log_id, job_id, now, now - self.ttl))
+                if now - self.last_purge >= self.purge_interval:
+                    self.last_purge = now
+                    conn.execute('DELETE FROM trigger_log WHERE created_at < ?',
+                                 (now - self.ttl,))
+                return cursor.rowcount == 1
+        except sqlite3.Error as e:
+            # 存储不可用时不阻塞调度, 仍由任务队列内去重
+            self.logger.exception(e)
+            return True
+
+    def remove(self, log_id: int):
+        """删除日志id记录, 未被接收的调度由调度中心重试时不再视为重复."""
+        try:
+            with self.lock:
+                self._connect().execute(
+                    'DELETE FROM trigger_log WHERE log_id = ?', (log_id,))
+        except sqlite3.Error as e:
+            self.logger.exception(e)
+
+    def close(self):
+        with self.lock:
+            if self.conn and self.pid == os.getpid():
+                self.conn.close()
+            self.conn = None
@@ -1,49 +1,439 @@
+import atexit
+import collections
 import io
 import logging
 import os
+import queue
+import shutil
+import threading
+import time
+import typing as t
+import zipfile
+from datetime import date
 from datetime import datetime
 
 from lesoon_cron.scheduler.xxl_job.dataclass import LogResult
 
 
+class LogLineIndex:
+    """
+    日志文件稀疏行索引.
+    每隔`step`行记录一次行首字节偏移, 读取时直接定位到最近的索引点,
+    只需扫描索引点之后的内容.
+
+    Attributes:
+        step: 索引间隔行数
+        offsets: offsets[i]为第 i*step+1 行的起始字节偏移
+        line_count: 已索引的完整行数
+        end_offset: 已索引内容的结束字节偏移
+        inode: 建立索引时的文件inode, 用于判断文件是否被替换
+
+    """
+
+    def __init__(self, step: int, inode: int):
+        self.step = step
+        self.offsets: t.List[int] = [0]
+        self.line_count = 0
+        self.end_offset = 0
+        self.inode = inode
+        self.lock = threading.Lock()
+
+    def is_valid(self, stat: os.stat_result) -> bool:
+        return stat.st_ino == self.inode and stat.st_size >= self.end_offset
+
+    def locate(self, line_num: int) -> t.Tuple[int, int]:
+        """
+        获取不晚于指定行的最近索引点.
+        Args:
+            line_num: 行号(从1开始)
+
+        Returns:
+            (索引点行号, 索引点字节偏移)
+
+        """
+        if line_num > self.line_count:
+            return self.line_count + 1, self.end_offset
+        index = (line_num - 1) // self.step
+        return index * self.step + 1, self.offsets[index]
+
+    def add(self, line_num: int, end_offset: int):
+        """记录一个完整行的结束偏移, 只接受紧接已索引内容的下一行."""
+        with self.lock:
+            if line_num != self.line_count + 1:
+                return
+            self.line_count = line_num
+            self.end_offset = end_offset
+            if line_num % self.step == 0:
+                self.offsets.append(end_offset)
+
+
+class _CloseFiles:
+    """关闭指定目录下文件句柄的写入线程指令."""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.event = threading.Event()
+
+
+class XxlJobLogWriter(threading.Thread):
+    """
+    日志异步写入线程.
+    从队列中批量获取日志写入, 按日志文件路径缓存打开的文件句柄(LRU),
+    缓冲内容达到`flush_size`字节或距上次刷盘超过`flush_interval`秒时刷盘.
+
+    Attributes:
+        max_open_files: 最多缓存的文件句柄数
+        flush_size: 触发刷盘的缓冲字节数
+        flush_interval: 刷盘间隔(秒)
+
+    """
+    logger = logging.getLogger('xxl-job-file-log')
+    _stop_signal = object()
+
+    def __init__(self,
+                 max_open_files: int = 128,
+                 flush_size: int = 64 * 1024,
+                 flush_interval: float = 1):
+        super().__init__(name='xxl-job-log-writer', daemon=True)
+        self.max_open_files = max_open_files
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.queue: queue.Queue = queue.Queue()
+        self.files: 't.OrderedDict[str, t.TextIO]' = collections.OrderedDict()
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+
+    def put(self, log_file_path: str, msg: str):
+        self.queue.put((log_file_path, msg))
+
+    def flush(self, timeout: t.Optional[float] = None) -> bool:
+        """等待此前入队的日志全部写入磁盘."""
+        if not self.is_alive():
+            return False
+        event = threading.Event()
+        self.queue.put(event)
+        return event.wait(timeout)
+
+    def close_files(self,
+                    prefix: str,
+                    timeout: t.Optional[float] = None) -> bool:
+        """刷盘并关闭路径以`prefix`开头的文件句柄, 归档或删除日志目录前调用."""
+        if not self.is_alive():
+            return False
+        command = _CloseFiles(prefix)
+        self.queue.put(command)
+        return command.event.wait(timeout)
+
+    def stop(self):
+        self.queue.put(self._stop_signal)
+
+    def _get_file(self, log_file_path: str) -> t.TextIO:
+        if f := self.files.get(log_file_path):
+            self.files.move_to_end(log_file_path)
+            return f
+        f = open(log_file_path, mode='a', encoding='utf-8')
+        self.files[log_file_path] = f
+        while len(self.files) > self.max_open_files:
+            _, expired = self.files.popitem(last=False)
+            expired.close()
+        return f
+
+    def _write(self, log_file_path: str, msg: str):
+        try:
+            self._get_file(log_file_path).write(msg + '\n')
+            self.pending_size += len(msg) + 1
+        except Exception as e:
+            self.logger.exception(e)
+
+    def _flush_files(self):
+        for f in self.files.values():
+            try:
+                f.flush()
+            except Exception as e:
+                self.logger.exception(e)
+        self.pending_size = 0
+        self.last_flush = time.monotonic()
+
+    def _close_files(self, prefix: str = ''):
+        self._flush_files()
+        for log_file_path in [p for p in self.files if p.startswith(prefix)]:
+            try:
+                self.files.pop(log_file_path).close()
+            except Exception as e:
+                self.logger.exception(e)
+
+    def run(self) -> None:
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = None
+            # 批量获取队列中已有日志
+            while item is not None:
+                if item is self._stop_signal:
+                    self._close_files()
+                    return
+                elif isinstance(item, threading.Event):
+                    self._flush_files()
+                    item.set()
+                elif isinstance(item, _CloseFiles):
+                    self._close_files(prefix=item.prefix)
+                    item.event.set()
+                else:
+                    self._write(*item)
+                    if self.pending_size >= self.flush_size:
+                        self._flush_files()
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if self.pending_size and (time.monotonic() - self.last_flush >=
+                                      self.flush_interval):
+                self._flush_files()
+
+
 class XxlJobLogger:
+    """
+    任务日志.
+    日志按调度日期分目录保存: `{log_dir_path}@{YYYY-MM-DD}/{log_id}.log`,
+    过期的日期目录打包为同名zip归档`{log_dir_path}@{YYYY-MM-DD}.zip`, 读取时透明回退到归档.
+    """
     logger = logging.getLogger('xxl-job-file-log')
     log_dir_path = '/data/logs/xxl-job/handler'
+    archive_suffix = '.zip'
+    # 日志异步写入线程, 为空时同步写入
+    writer: t.Optional[XxlJobLogWriter] = None
+    # 已创建的日志目录
+    _log_file_dirs: t.Set[str] = set()
+    # 行索引间隔行数
+    line_index_step: int = 1000
+    # 内存中最多缓存的日志文件行索引数量
+    line_index_capacity: int = 1024
+    _line_indexes: 't.OrderedDict[str, LogLineIndex]' = collections.OrderedDict(
+    )
+    _line_index_lock = threading.Lock()
 
     @classmethod
-    def get_log_file_path(cls, log_time: int, log_id):
+    def get_log_file_path(cls, log_time: int, log_id, make_dir: bool = True):
         if len(str(log_time)) > 10:
             # 时间戳包含毫秒
             log_time //= 1000
         log_date = datetime.fromtimestamp(log_time).strftime('%Y-%m-%d')
         log_file_dir = f'{cls.log_dir_path}@{log_date}'
-        if not os.path.exists(log_file_dir):
+        if make_dir and log_file_dir not in cls._log_file_dirs:
             os.makedirs(log_file_dir, exist_ok=True)
+            cls._log_file_dirs.add(log_file_dir)
         return os.path.join(log_file_dir, f'{log_id}.log')
 
+    @classmethod
+    def start_writer(cls, **kwargs) -> XxlJobLogWriter:
+        """启动日志异步写入线程, 参数详见`XxlJobLogWriter`."""
+        if not cls.writer:
+            cls.writer = XxlJobLogWriter(**kwargs)
+            cls.writer.start()
+            # 进程退出前写入剩余日志
+            atexit.register(cls.stop_writer)
+        return cls.writer
+
+    @classmethod
+    def stop_writer(cls):
+        if writer := cls.writer:
+            cls.writer = None
+            writer.stop()
+            writer.join()
+
+    @classmethod
+    def flush(cls, timeout: t.Optional[float] = 5) -> bool:
+        """等待异步写入的日志落盘."""
+        if writer := cls.writer:
+            return writer.flush(timeout=timeout)
+        return True
+
     @classmethod
     def write(cls, log_file_path: str, msg: str):
+        if writer := cls.writer:
+            writer.put(log_file_path, msg)
+            return
         try:
             with open(log_file_path, mode='a+', encoding='utf-8') as f:
                 f.write(msg + '\n')
         except Exception as e:
             cls.logger.exception(e)
 
+    @classmethod
+    def _get_line_index(cls, log_file_path: str,
+                        stat: os.stat_result) -> LogLineIndex:
+        with cls._line_index_lock:
+            index = cls._line_indexes.get(log_file_path)
+            if index and index.is_valid(stat):
+                cls._line_indexes.move_to_end(log_file_path)
+            else:
+                index = LogLineIndex(step=cls.line_index_step,
+                                     inode=stat.st_ino)
+                cls._line_indexes[log_file_path] = index
+                while len(cls._line_indexes) > cls.line_index_capacity:
+                    cls._line_indexes.popitem(last=False)
+            return index
+
+    @classmethod
+    def _iter_day_paths(cls) -> t.Iterator[t.Tuple[date, str]]:
+        """遍历日期目录及归档, 返回(日期, 路径)."""
+        parent, name = os.path.split(cls.log_dir_path)
+        prefix = f'{name}@'
+        try:
+            entries = os.listdir(parent or '.')
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if not entry.startswith(prefix):
+                continue
+            log_date = entry[len(prefix):]
+            if log_date.endswith(cls.archive_suffix):
+                log_date = log_date[:-len(cls.archive_suffix)]
+            try:
+                day = datetime.strptime(log_date, '%Y-%m-%d').date()
+            except ValueError:
+                continue
+            yield day, os.path.join(parent, entry)
+
+    @classmethod
+    def _forget_dir(cls, log_file_dir: str):
+        """关闭目录下的文件句柄并清除目录缓存与行索引."""
+        prefix = log_file_dir + os.sep
+        if writer := cls.writer:
+            writer.close_files(prefix=prefix, timeout=5)
+        cls._log_file_dirs.discard(log_file_dir)
+        with cls._line_index_lock:
+            for log_file_path in [
+                    p for p in cls._line_indexes if p.startswith(prefix)
+            ]:
+                del cls._line_indexes[log_file_path]
+
+    @classmethod
+    def archive(cls, log_file_dir: str) -> str:
+        """
+        将日期目录下的日志打包为zip归档并删除原文件.
+        归档已存在时(归档后仍有日志写入)合并原有内容.
+        Returns:
+            归档路径
+        """
+        cls._forget_dir(log_file_dir)
+        archive_path = log_file_dir + cls.archive_suffix
+        tmp_path = archive_path + '.tmp'
+        log_files = sorted(entry.name
+                           for entry in os.scandir(log_file_dir)
+                           if entry.is_file() and entry.name.endswith('.log'))
+        with zipfile.ZipFile(tmp_path,
+                             mode='w',
+                             compression=zipfile.ZIP_DEFLATED) as zf:
+            archived = set()
+            if os.path.exists(archive_path):
+                with zipfile.ZipFile(archive_path) as old:
+                    for name in old.namelist():
+                        with old.open(name) as src, zf.open(name,
+                                                            mode='w') as dst:
+                            shutil.copyfileobj(src, dst)
+                            if name in log_files:
+                                with open(os.path.join(log_file_dir, name),
+                                          mode='rb') as f:
+                                    shutil.copyfileobj(f, dst)
+                        archived.add(name)
+            for name in log_files:
+                if name not in archived:
+                    zf.write(os.path.join(log_file_dir, name), arcname=name)
+        os.replace(tmp_path, archive_path)
+        # 只删除已归档的文件, 归档期间新建的日志留待下次归档
+        for name in log_files:
+            os.remove(os.path.join(log_file_dir, name))
+        try:
+            os.rmdir(log_file_dir)
+        except OSError:
+            pass
+        return archive_path
+
+    @classmethod
+    def remove(cls, path: str):
+        """删除日期目录或归档."""
+        if os.path.isdir(path):
+            cls._forget_dir(path)
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+    @classmethod
+    def maintain(cls,
+                 retention_days: int,
+                 compress_after_days: int,
+                 today: t.Optional[date] = None):
+        """
+        清理过期日志.
+        Args:
+            retention_days: 日志保留天数, 超过的日期目录与归档被删除, 为0时不删除
+            compress_after_days: 超过该天数的日期目录被打包为zip归档, 为0时不归档
+            today: 当前日期
+
+        """
+        today = today or date.today()
+        for day, path in sorted(cls._iter_day_paths()):
+            age = (today - day).days
+            try:
+                if retention_days and age > retention_days:
+                    cls.remove(path)
+                    cls.logger.info(f'已删除过期任务日志:{path}')
+                elif (compress_after_days and age > compress_after_days and
+                      os.path.isdir(path)):
+                    cls.archive(path)
+                    cls.logger.info(f'已归档任务日志:{path}')
+            except Exception as e:
+                cls.logger.exception(e)
+
+    @classmethod
+    def _read_archive(cls, log_file_path: str,
+                      from_line_num: int) -> t.Optional[LogResult]:
+        log_file_dir, name = os.path.split(log_file_path)
+        archive_path = log_file_dir + cls.archive_suffix
+        if not os.path.exists(archive_path):
+            return None
+        try:
+            with zipfile.ZipFile(archive_path) as zf, zf.open(name) as f, \
+                    io.StringIO() as content:
+                to_line_num = 0
+                for line_no, line in enumerate(f, start=1):
+                    to_line_num = line_no
+                    if line_no >= from_line_num:
+                        content.write(line.decode('utf-8', errors='replace'))
+                return LogResult(from_line_num=from_line_num,
+                                 to_line_num=to_line_num,
+                                 log_content=content.getvalue(),
+                                 is_end=True)
+        except (KeyError, OSError, zipfile.BadZipFile):
+            return None
+
     @classmethod
     def read(cls, log_file_path: str, from_line_num: int) -> LogResult:
         to_line_num = 0
         if not os.path.exists(log_file_path):
+            if archived := cls._read_archive(log_file_path, from_line_num):
+                return archived
             return LogResult(from_line_num=from_line_num,
                              to_line_num=to_line_num,
                              log_content='日志文件不存在，读取日志失败！',
                              is_end=True)
         else:
-            with open(log_file_path,
-                      encoding='utf-8') as f, io.StringIO() as content:
-                for line_no, line in enumerate(f, start=1):
+            with open(log_file_path, mode='rb') as f, io.StringIO() as content:
+                index = cls._get_line_index(log_file_path, os.fstat(f.fileno()))
+                line_no, offset = index.locate(max(from_line_num, 1))
+                to_line_num = line_no - 1
+                f.seek(offset)
+                for line in f:
                     to_line_num = line_no
+                    offset += len(line)
+                    if line.endswith(b'\n'):
+                        # 只索引完整行, 正在写入的末行下次读取时重新扫描
+                        index.add(line_no, offset)
                     if to_line_num >= from_line_num:
-                        content.write(line)
+                        content.write(line.decode('utf-8', errors='replace'))
+                    line_no += 1
                 return LogResult(from_line_num=from_line_num,
                                  to_line_num=to_line_num,
                                  log_content=content.getvalue(),
@@ -0,0 +1,141 @@
+import bisect
+import threading
+import time
+import typing as t
+
+# 耗时类指标默认分桶(秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+                   60, 300)
+# 数量类指标默认分桶
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Counter:
+    """计数器."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        with self.lock:
+            self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+class Histogram:
+    """
+    直方图.
+    记录观测值的数量、总和、最大值以及各分桶(小于等于上界)的数量.
+
+    Attributes:
+        buckets: 分桶上界(升序)
+
+    """
+
+    def __init__(self, buckets: t.Sequence[float] = LATENCY_BUCKETS):
+        self.lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        # 最后一个分桶记录超出所有上界的观测值
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            counts = list(self.bucket_counts)
+            count, total, maximum = self.count, self.sum, self.max
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {
+            'count': count,
+            'sum': total,
+            'avg': total / count if count else 0,
+            'max': maximum,
+            'buckets': buckets
+        }
+
+
+class XxlJobMetrics:
+    """
+    xxl-job 执行器指标.
+    指标按名称与标签区分, 首次使用时创建; 仪表类指标在获取快照时计算.
+    启动阶段以自执行器模块导入起的耗时记录, 如初始化完成、首次心跳请求、首次注册成功.
+
+    """
+    _counters: t.Dict[str, Counter] = {}
+    _histograms: t.Dict[str, Histogram] = {}
+    _gauges: t.Dict[str, t.Callable[[], t.Any]] = {}
+    _startup: t.Dict[str, float] = {}
+    _imported_at: float = time.monotonic()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: t.Dict[str, t.Any]) -> str:
+        if not labels:
+            return name
+        label_str = ','.join(f'{k}={v}' for k, v in sorted(labels.items()))
+        return f'{name}{{{label_str}}}'
+
+    @classmethod
+    def counter(cls, name: str, **labels) -> Counter:
+        key = cls._key(name, labels)
+        if (counter := cls._counters.get(key)) is None:
+            with cls._lock:
+                counter = cls._counters.setdefault(key, Counter())
+        return counter
+
+    @classmethod
+    def histogram(cls,
+                  name: str,
+                  buckets: t.Sequence[float] = LATENCY_BUCKETS,
+                  **labels) -> Histogram:
+        key = cls._key(name, labels)
+        if (histogram := cls._histograms.get(key)) is None:
+            with cls._lock:
+                histogram = cls._histograms.setdefault(key, Histogram(buckets))
+        return histogram
+
+    @classmethod
+    def gauge(cls, name: str, func: t.Callable[[], t.Any]):
+        """注册仪表类指标, 获取快照时调用`func`取值."""
+        cls._gauges[name] = func
+
+    @classmethod
+    def mark(cls, stage: str):
+        """记录启动阶段耗时(秒), 同一阶段只记录首次."""
+        if stage not in cls._startup:
+            cls._startup.setdefault(stage, time.monotonic() - cls._imported_at)
+
+    @classmethod
+    def snapshot(cls) -> dict:
+        gauges = {}
+        for name, func in list(cls._gauges.items()):
+            try:
+                gauges[name] = func()
+            except Exception as e:
+                gauges[name] = str(e)
+        return {
+            'counters': {
+                k: v.snapshot() for k, v in list(cls._counters.items())
+            },
+            'histograms': {
+                k: v.snapshot() for k, v in list(cls._histograms.items())
+            },
+            'gauges': gauges,
+            'startup': dict(cls._startup)
+        }
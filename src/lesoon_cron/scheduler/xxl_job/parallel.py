@@ -0,0 +1,245 @@
+import concurrent.futures
+import contextvars
+import logging
+import queue
+import threading
+import time
+import traceback
+import typing as t
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
+from lesoon_cron.scheduler.xxl_job.thread.base import StoppableThread
+
+
+class _ParallelWorker(StoppableThread):
+
+    def __init__(self, executor: 'ParallelExecutor'):
+        super().__init__(name='xxl-job-parallel', daemon=True)
+        self.executor = executor
+        # 是否正在执行子任务, 由执行器的锁保护
+        self.busy = False
+
+    def run(self) -> None:
+        while True:
+            task = self.executor.task_queue.get()
+            if task is None:
+                break
+            future, ctx, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self.executor.lock:
+                self.busy = True
+            try:
+                ctx.run(self.executor._run, future, fn, args, kwargs)
+            finally:
+                with self.executor.lock:
+                    self.busy = False
+
+    def interrupt(self):
+        """
+        终止执行中的子任务, 调用方需持有执行器的锁.
+        只中断执行中的线程, 避免异常抛给已退出线程的线程号被新线程复用后的线程.
+        """
+        if self.busy:
+            self.busy = False
+            self.terminate()
+
+
+class ParallelExecutor:
+    """
+    任务内并行执行器.
+    子任务在独立线程中以提交时的上下文(xxl-job上下文、应用上下文)执行, 日志写入同一任务日志.
+    执行器按任务日志登记, 调度结束(完成、超时或被终止)时取消未完成的子任务.
+
+    Attributes:
+        max_workers: 最大并发线程数
+        failures: 执行失败的子任务异常
+
+    """
+    # 共享执行器默认最大并发线程数
+    default_max_workers: int = 4
+    # 任务日志 -> 执行器
+    _executors: t.Dict[str, t.List['ParallelExecutor']] = {}
+    # 任务日志 -> XxlJobHelper.submit使用的共享执行器,
+    # 不在调度上下文中时使用以空字符串登记的进程级执行器, 该执行器不随调度结束释放
+    _shared: t.Dict[str, 'ParallelExecutor'] = {}
+    # 可重入: 共享执行器在锁内创建并登记
+    _registry_lock = threading.RLock()
+    logger: logging.Logger = logging.getLogger('xxl-job-parallel')
+
+    def __init__(self, max_workers: t.Optional[int] = None):
+        self.max_workers = max(max_workers or self.default_max_workers, 1)
+        self.task_queue: 'queue.Queue[t.Optional[tuple]]' = queue.Queue()
+        self.workers: t.List[_ParallelWorker] = []
+        self.failures: t.List[BaseException] = []
+        self.submitted = 0
+        self.lock = threading.Lock()
+        self.shutdown_flag = False
+        self.context = XxlJobContext.get()
+        self.log_file_path = self.context.job_file_path if self.context else ''
+        if self.log_file_path:
+            with self._registry_lock:
+                self._executors.setdefault(self.log_file_path, []).append(self)
+
+    @classmethod
+    def shared(cls) -> 'ParallelExecutor':
+        """获取当前调度共享的执行器, 不在调度上下文中时获取进程级共享的执行器."""
+        context = XxlJobContext.get()
+        log_file_path = context.job_file_path if context else ''
+        with cls._registry_lock:
+            executor = cls._shared.get(log_file_path)
+            if not executor or executor.shutdown_flag:
+                executor = cls._shared[log_file_path] = cls()
+        return executor
+
+    @classmethod
+    def release(cls, context: XxlJobContext):
+        """
+        调度结束时取消该调度下未完成的子任务,
+        共享执行器中存在失败的子任务时将调度结果置为失败.
+        """
+        with cls._registry_lock:
+            executors = cls._executors.pop(context.job_file_path, [])
+            shared = cls._shared.pop(context.job_file_path, None)
+        for executor in executors:
+            executor.shutdown(wait=False, cancel=True)
+        if shared and shared.failures and (context.response_code
+                                           == ResponseCode.Success):
+            context.response_code = ResponseCode.Failure
+            context.response_msg = shared.failure_summary(
+                total=shared.submitted)
+
+    def _log(self, msg: str):
+        if self.log_file_path:
+            from lesoon_cron.scheduler.xxl_job.helper import XxlJobHelper
+            XxlJobHelper.log(msg)
+
+    def record_failure(self, e: BaseException):
+        with self.lock:
+            self.failures.append(e)
+        self.logger.exception(e)
+        self._log(f'<br>----------- 并行子任务异常: {traceback.format_exc()}')
+
+    def failure_summary(self, total: int) -> str:
+        return f'并行子任务失败{len(self.failures)}/{total}:{self.failures[0]!r}'
+
+    def _run(self, future: concurrent.futures.Future, fn: t.Callable,
+             args: tuple, kwargs: dict):
+        # 在提交时的上下文副本中执行
+        XxlJobContext.set(self.context)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            if not self.shutdown_flag:
+                self.record_failure(e)
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def submit(self, fn: t.Callable, *args,
+               **kwargs) -> concurrent.futures.Future:
+        if self.shutdown_flag:
+            raise RuntimeError('并行执行器已关闭')
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self.task_queue.put(
+            (future, contextvars.copy_context(), fn, args, kwargs))
+        with self.lock:
+            self.submitted += 1
+            if len(self.workers) < min(self.max_workers, self.submitted):
+                worker = _ParallelWorker(self)
+                self.workers.append(worker)
+                worker.start()
+        return future
+
+    def shutdown(self, wait: bool = True, cancel: bool = False):
+        """
+        关闭执行器.
+        Args:
+            wait: 是否等待子任务执行完成
+            cancel: 是否取消排队中的子任务并终止执行中的子任务
+
+        """
+        self.shutdown_flag = True
+        if cancel:
+            while True:
+                try:
+                    task = self.task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task:
+                    task[0].cancel()
+            with self.lock:
+                for worker in self.workers:
+                    worker.interrupt()
+        for _ in self.workers:
+            self.task_queue.put(None)
+        if wait:
+            for worker in self.workers:
+                # 轮询等待, 使调用线程仍可被超时或终止中断
+                while worker.is_alive():
+                    worker.join(timeout=0.1)
+
+    def map(self,
+            fn: t.Callable,
+            items: t.Iterable,
+            chunk_size: int = 1,
+            timeout: t.Optional[float] = None,
+            fail_fast: bool = False) -> t.List[t.Any]:
+        """
+        并行执行`fn(item)`, 按输入顺序返回结果, 失败的元素以异常对象占位.
+        Args:
+            fn: 处理函数
+            items: 待处理元素
+            chunk_size: 每个子任务处理的元素数
+            timeout: 超时时间(秒), 超时后取消未完成的子任务并抛出TimeoutError
+            fail_fast: 出现失败时是否取消余下的子任务
+
+        """
+        items = list(items)
+        chunk_size = max(chunk_size, 1)
+        chunks = [
+            items[i:i + chunk_size] for i in range(0, len(items), chunk_size)
+        ]
+        futures = [
+            self.submit(self._run_chunk, fn, chunk, fail_fast)
+            for chunk in chunks
+        ]
+        deadline = time.monotonic() + timeout if timeout else None
+        pending = set(futures)
+        while pending:
+            wait_timeout = 0.1
+            if deadline:
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    self.shutdown(wait=False, cancel=True)
+                    raise TimeoutError(f'并行子任务执行超时:{timeout}s')
+                wait_timeout = min(wait_timeout, remaining)
+            # 轮询等待, 使调用线程仍可被超时或终止中断
+            _, pending = concurrent.futures.wait(pending, timeout=wait_timeout)
+            if fail_fast and self.failures:
+                for future in pending:
+                    future.cancel()
+        results: t.List[t.Any] = []
+        for future, chunk in zip(futures, chunks):
+            if future.cancelled():
+                results.extend(
+                    concurrent.futures.CancelledError() for _ in chunk)
+            elif exc := future.exception():
+                results.extend(exc for _ in chunk)
+            else:
+                results.extend(future.result())
+        return results
+
+    def _run_chunk(self, fn: t.Callable, chunk: list,
+                   fail_fast: bool) -> t.List[t.Any]:
+        results: t.List[t.Any] = []
+        for item in chunk:
+            if fail_fast and self.failures:
+                results.append(concurrent.futures.CancelledError())
+                continue
+            try:
+                results.append(fn(item))
+            except Exception as e:
+                self.record_failure(e)
+                results.append(e)
+        return results
@@ -0,0 +1,98 @@
+import ast
+import collections
+import copy
+import json
+import threading
+import typing as t
+
+_JSON_LEADING_CHARS = frozenset('[{"-0123456789tfn')
+_IMMUTABLE_TYPES = (str, bytes, int, float, complex, bool, type(None))
+
+
+class TriggerParamDecoder:
+    """
+    调度参数解析.
+    优先按json解析(额外接受json的true、false、null), 失败时回退到`ast.literal_eval`;
+    解析结果按原始字符串缓存(LRU), 每次返回副本, 防止处理函数修改缓存内容.
+
+    Attributes:
+        cache_size: 最多缓存的参数数量
+        max_cached_length: 超过该长度的参数不进入缓存
+
+    """
+    cache_size: int = 1024
+    max_cached_length: int = 4096
+    # 原始参数 -> (位置参数, 命名参数, 是否需要深拷贝)
+    _cache: 't.OrderedDict[str, tuple]' = collections.OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _is_immutable(value: t.Any) -> bool:
+        if isinstance(value, _IMMUTABLE_TYPES):
+            return True
+        if isinstance(value, (tuple, frozenset)):
+            return all(TriggerParamDecoder._is_immutable(v) for v in value)
+        return False
+
+    @staticmethod
+    def _reject_constant(name: str) -> t.Any:
+        raise ValueError(f'不支持的调度参数:{name}')
+
+    @staticmethod
+    def _literal(params: str) -> t.Any:
+        """
+        解析参数字面量.
+        json解析额外接受`true`、`false`、`null`(分别解析为True、False、None),
+        不接受json扩展的`NaN`、`Infinity`、`-Infinity`, 与`ast.literal_eval`保持一致.
+        """
+        if params[0] in _JSON_LEADING_CHARS:
+            try:
+                return json.loads(
+                    params, parse_constant=TriggerParamDecoder._reject_constant)
+            except ValueError:
+                pass
+        return ast.literal_eval(params)
+
+    @classmethod
+    def _parse(cls, params: str) -> t.Tuple[tuple, dict, bool]:
+        func_args: tuple = ()
+        func_kwargs: dict = {}
+        value = cls._literal(params)
+        if isinstance(value, dict):
+            func_kwargs = value
+        elif isinstance(value, t.Sequence):
+            func_args = tuple(value)
+        else:
+            func_args = (value,)
+        immutable = all(cls._is_immutable(v) for v in func_args) and all(
+            cls._is_immutable(v) for v in func_kwargs.values())
+        return func_args, func_kwargs, not immutable
+
+    @classmethod
+    def decode(cls, params: t.Optional[str]) -> t.Tuple[tuple, dict]:
+        """
+        解析调度参数.
+        Args:
+            params: 调度参数字符串
+
+        Returns:
+            处理函数的位置参数与命名参数
+
+        """
+        if not params:
+            return (), {}
+        with cls._lock:
+            cached = cls._cache.get(params)
+            if cached:
+                cls._cache.move_to_end(params)
+        if not cached:
+            cached = cls._parse(params)
+            if len(params) <= cls.max_cached_length:
+                with cls._lock:
+                    cls._cache[params] = cached
+                    while len(cls._cache) > cls.cache_size:
+                        cls._cache.popitem(last=False)
+        func_args, func_kwargs, deep = cached
+        if deep:
+            return copy.deepcopy(func_args), copy.deepcopy(func_kwargs)
+        return func_args, dict(func_kwargs)
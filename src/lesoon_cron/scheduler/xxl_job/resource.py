@@ -1,6 +1,7 @@
 import typing as t
 
-from lesoon_common import current_app
+from flask import request
+from lesoon_common import LesoonFlask
 from lesoon_common.model import fields
 from lesoon_common.schema import CamelSchema
 from lesoon_restful import use_args
@@ -13,7 +14,7 @@ from lesoon_cron.scheduler.xxl_job.dataclass import Response
 from lesoon_cron.scheduler.xxl_job.dataclass import TriggerParam
 from lesoon_cron.scheduler.xxl_job.globals import XxlJobGlobals
 from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
-from lesoon_cron.utils import context_inject
+from lesoon_cron.scheduler.xxl_job.metrics import XxlJobMetrics
 
 
 class JobSchema(CamelSchema):
@@ -31,27 +32,73 @@ class XxlJobResource(Resource):
 
     @Route.POST('/beat', rel='心跳检测')
     def beat_check(self):
+        XxlJobMetrics.mark('first_beat')
+        if XxlJobGlobals.is_draining():
+            # 故障转移路由策略以心跳检测选择执行器, 下线中的执行器不再被选中
+            return Response(code=ResponseCode.Failure, msg='执行器下线中').json()
         return Response().json()
 
-    @Route.POST('/idleBeat', rel='忙碌检测')
-    @use_args(job_args, as_kwargs=True)
-    def idle_beat_check(self, job_id: int):
+    @Route.GET('/metrics', rel='执行器指标')
+    def metrics(self):
+        response = Response().json()
+        response['content'] = XxlJobMetrics.snapshot()
+        return response
+
+    @staticmethod
+    def _forward(job_id: int,
+                 path: str,
+                 claim: bool = False) -> t.Optional[dict]:
+        """多进程部署时将请求转发给任务所属工作进程, 应由当前进程处理时返回None."""
+        if router := XxlJobGlobals.get_job_router():
+            return router.forward(job_id=job_id,
+                                  path=path,
+                                  payload=request.get_json(silent=True) or {},
+                                  claim=claim)
+        return None
+
+    @classmethod
+    def dispatch_forwarded(cls, path: str, payload: dict,
+                           app: LesoonFlask) -> dict:
+        """执行其他工作进程转发的请求."""
+        with app.app_context():
+            if path == 'run':
+                return cls.run_trigger(TriggerParam.Schema().load(payload))
+            elif path == 'idleBeat':
+                return cls.idle_beat(job_id=int(payload['jobId']))
+            elif path == 'kill':
+                return cls.kill_job(job_id=int(payload['jobId']))
+        return Response(code=ResponseCode.Error, msg=f'不支持转发的请求:{path}').json()
+
+    @staticmethod
+    def idle_beat(job_id: int) -> dict:
         code, msg = ResponseCode.Success, ''
-        if jt := XxlJobGlobals.get_job_thread(job_id):
+        if XxlJobGlobals.is_draining():
+            code, msg = ResponseCode.Failure, '执行器下线中'
+        elif jt := XxlJobGlobals.get_job_thread(job_id):
             if not jt.is_running_or_has_queue:
                 code, msg = ResponseCode.Failure, 'job调度线程运行中...'
         return Response(code=code, msg=msg).json()
 
-    @Route.POST('/run', rel='运行任务')
-    @use_args(TriggerParam.Schema)
-    def run(self, trigger_param: TriggerParam):
-        tp = trigger_param
+    @staticmethod
+    def run_trigger(tp: TriggerParam) -> dict:
+        if XxlJobGlobals.is_draining():
+            # 调度中心按失败重试次数重新路由到其他执行器
+            XxlJobMetrics.counter('trigger_rejected', reason='draining').inc()
+            return Response(code=ResponseCode.Failure,
+                            msg='执行器下线中, 拒绝新的调度').json()
+        # 先于阻塞策略去重, 防止重复调度覆盖执行中的调度, 调度被拒绝时释放日志id以便调度中心重试
+        if not XxlJobGlobals.claim_log_id(log_id=tp.log_id, job_id=tp.job_id):
+            XxlJobMetrics.counter('trigger_duplicates').inc()
+            return Response(
+                code=ResponseCode.Failure,
+                msg=f'jobId[{tp.job_id}]:logId[{tp.log_id}]重复调度').json()
         jt = XxlJobGlobals.get_job_thread(job_id=tp.job_id)
         remove_reason = ''
 
         if jt:
             if tp.executor_block_strategy == XxlJobStrategyCode.DiscardLater:
                 if jt.is_running_or_has_queue:
+                    XxlJobGlobals.release_log_id(log_id=tp.log_id)
                     return Response(
                         code=ResponseCode.Failure,
                         msg=f'任务已存在调度进行中,当前策略:{tp.executor_block_strategy}'
@@ -61,35 +108,59 @@ class XxlJobResource(Resource):
                 jt = None
 
         if not jt:
-            # 获取处理器类以及处理方法
-            cls_name, handle_func_name = tp.executor_handler.rsplit('.', 1)
-            handler_cls = XxlJobGlobals.get_handler(cls_name)
-            if not handler_cls:
-                return Response(code=ResponseCode.Error,
-                                msg=f'无法找到对应的处理器类:{cls_name}').json()
-            handler = handler_cls()
-            if not hasattr(handler, handle_func_name):
+            # 从分发表获取处理函数
+            handle_func = XxlJobGlobals.get_handle_func(tp.executor_handler)
+            if not handle_func:
+                XxlJobGlobals.release_log_id(log_id=tp.log_id)
+                cls_name, _, handle_func_name = tp.executor_handler.rpartition(
+                    '.')
+                if not XxlJobGlobals.get_handler(cls_name):
+                    return Response(code=ResponseCode.Error,
+                                    msg=f'无法找到对应的处理器类:{cls_name}').json()
                 return Response(
                     code=ResponseCode.Error,
                     msg=f'{cls_name}处理器类没有该处理函数{handle_func_name}').json()
-            handle_func = getattr(handler, handle_func_name)
-            handle_func = context_inject(current_app.app_context())(handle_func)
-            jt = XxlJobGlobals.register_job_thread(job_id=tp.job_id,
-                                                   handle_func=handle_func,
-                                                   reason=remove_reason)
+            jt = XxlJobGlobals.register_job_thread(
+                job_id=tp.job_id,
+                handle_func=handle_func,
+                reason=remove_reason,
+                executor_handler=tp.executor_handler)
         return jt.push_trigger(trigger_param=tp).json()
 
+    @staticmethod
+    def kill_job(job_id: int) -> dict:
+        XxlJobGlobals.remove_job_thread(job_id=job_id, reason='调度中心触发终止任务')
+        return Response().json()
+
+    @Route.POST('/idleBeat', rel='忙碌检测')
+    @use_args(job_args, as_kwargs=True)
+    def idle_beat_check(self, job_id: int):
+        if (forwarded := self._forward(job_id, path='idleBeat')) is not None:
+            return forwarded
+        return self.idle_beat(job_id=job_id)
+
+    @Route.POST('/run', rel='运行任务')
+    @use_args(TriggerParam.Schema)
+    def run(self, trigger_param: TriggerParam):
+        if (forwarded := self._forward(trigger_param.job_id,
+                                       path='run',
+                                       claim=True)) is not None:
+            return forwarded
+        return self.run_trigger(trigger_param)
+
     @Route.POST('/kill', rel='终止任务')
     @use_args(job_args, as_kwargs=True)
     def kill(self, job_id: int):
-        XxlJobGlobals.remove_job_thread(job_id=job_id, reason='调度中心触发终止任务')
-        return Response().json()
+        if (forwarded := self._forward(job_id, path='kill')) is not None:
+            return forwarded
+        return self.kill_job(job_id=job_id)
 
     @Route.POST('/log', rel='查看执行日志')
     @use_args(XxlJobLogSchema, as_kwargs=True)
     def log(self, log_id: int, log_date_time: int, from_line_num: int):
         log_file_path = XxlJobLogger.get_log_file_path(log_time=log_date_time,
-                                                       log_id=log_id)
+                                                       log_id=log_id,
+                                                       make_dir=False)
         log_result = XxlJobLogger.read(log_file_path=log_file_path,
                                        from_line_num=from_line_num).json()
         response = Response().json()
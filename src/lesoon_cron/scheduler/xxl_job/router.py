@@ -0,0 +1,243 @@
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+import typing as t
+
+import filelock
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.dataclass import Response
+from lesoon_cron.scheduler.xxl_job.metrics import XxlJobMetrics
+
+_HEADER = struct.Struct('>I')
+
+_Stream = t.Union[t.BinaryIO, io.BufferedIOBase]
+
+
+def _write_message(f: _Stream, obj: t.Any):
+    data = json.dumps(obj).encode('utf-8')
+    f.write(_HEADER.pack(len(data)) + data)
+    f.flush()
+
+
+def _read_message(f: _Stream) -> t.Any:
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ConnectionResetError('连接已关闭')
+    size, = _HEADER.unpack(header)
+    data = f.read(size)
+    if len(data) < size:
+        raise ConnectionResetError('连接已关闭')
+    return json.loads(data)
+
+
+class _RouterRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        router: 'JobRouter' = self.server.router  # type: ignore
+        request = _read_message(self.rfile)
+        try:
+            response = router.dispatch(request['path'], request['payload'])
+        except Exception as e:
+            router.logger.exception(e)
+            response = Response(code=ResponseCode.Error,
+                                msg=f'处理转发请求异常:{e}').json()
+        _write_message(self.wfile, response)
+
+
+class _RouterServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, socket_path: str, router: 'JobRouter'):
+        self.router = router
+        super().__init__(socket_path, _RouterRequestHandler)
+
+
+class JobRouter:
+    """
+    多进程部署(gunicorn)时的任务路由.
+    每个任务由首个收到其调度请求的工作进程认领, 认领关系以属主文件`job-{job_id}.owner`
+    记录在共享目录中; 其他工作进程收到该任务的run、idleBeat、kill请求时,
+    经属主进程的Unix socket转发执行, 使任务的串行执行、调度去重与终止都在同一进程中处理.
+    属主进程退出后由下一个收到调度请求的工作进程接管.
+    Unix socket按进程监听: 以`gunicorn --preload`在主进程中初始化时, fork出的工作进程
+    不沿用主进程的监听, 而是在首次转发或认领前在本进程中重新监听.
+
+    Attributes:
+        socket_dir: Unix socket及属主文件目录, 同一执行器的工作进程共享
+        dispatch: 执行转发请求的函数, 参数为(请求路径, 请求体), 返回响应体
+        timeout: 转发超时(秒)
+
+    """
+    logger: logging.Logger = logging.getLogger('xxl-job-router')
+
+    def __init__(self,
+                 socket_dir: str,
+                 dispatch: t.Callable[[str, dict], dict],
+                 timeout: float = 5):
+        self.socket_dir = socket_dir
+        self.dispatch = dispatch
+        self.timeout = timeout
+        self.pid = os.getpid()
+        # job_id -> 属主进程号, 属主进程存活期间认领关系不变
+        self.owners: t.Dict[int, int] = {}
+        self.server: t.Optional[_RouterServer] = None
+        self.lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def socket_path(self, pid: int) -> str:
+        return os.path.join(self.socket_dir, f'worker-{pid}.sock')
+
+    def _owner_path(self, job_id: int) -> str:
+        return os.path.join(self.socket_dir, f'job-{job_id}.owner')
+
+    def _after_fork(self):
+        # 子进程不沿用父进程的监听与认领关系
+        if server := self.server:
+            self.server = None
+            server.socket.close()
+        self.owners.clear()
+        self.lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self.server is None or self.pid != os.getpid():
+            with self.lock:
+                if self.server is None or self.pid != os.getpid():
+                    self.start()
+
+    def start(self):
+        self.pid = os.getpid()
+        os.makedirs(self.socket_dir, exist_ok=True)
+        socket_path = self.socket_path(self.pid)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.server = _RouterServer(socket_path, router=self)
+        threading.Thread(target=self.server.serve_forever,
+                         name='xxl-job-router',
+                         daemon=True).start()
+
+    def stop(self):
+        """释放认领的任务并关闭socket."""
+        for job_id, pid in list(self.owners.items()):
+            if pid == self.pid and self._read_owner(
+                    self._owner_path(job_id)) == self.pid:
+                try:
+                    os.remove(self._owner_path(job_id))
+                except OSError:
+                    pass
+        self.owners.clear()
+        if server := self.server:
+            self.server = None
+            server.shutdown()
+            server.server_close()
+            try:
+                os.remove(self.socket_path(self.pid))
+            except OSError:
+                pass
+
+    def _is_alive(self, pid: int) -> bool:
+        if not os.path.exists(self.socket_path(pid)):
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def _read_owner(owner_path: str) -> t.Optional[int]:
+        try:
+            with open(owner_path) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _is_stale(self, pid: t.Optional[int]) -> bool:
+        return pid is None or (pid != self.pid and not self._is_alive(pid))
+
+    def get_owner(self, job_id: int, claim: bool = False) -> t.Optional[int]:
+        """
+        获取任务属主进程号.
+        Args:
+            job_id: 任务id
+            claim: 任务无属主或属主已退出时是否由当前进程认领
+
+        Returns:
+            属主进程号, 无属主且不认领时返回None
+
+        """
+        self._ensure_started()
+        if (pid := self.owners.get(job_id)) is not None:
+            return pid
+        owner_path = self._owner_path(job_id)
+        pid = self._read_owner(owner_path)
+        if self._is_stale(pid):
+            if not claim:
+                return None
+            with filelock.FileLock(f'{owner_path}.lock'):
+                pid = self._read_owner(owner_path)
+                if self._is_stale(pid):
+                    tmp_path = f'{owner_path}.{self.pid}.tmp'
+                    with open(tmp_path, mode='w') as f:
+                        f.write(str(self.pid))
+                    os.replace(tmp_path, owner_path)
+                    pid = self.pid
+        self.owners[job_id] = pid
+        return pid
+
+    def _request(self, pid: int, path: str, payload: dict) -> dict:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path(pid))
+            with sock.makefile(mode='rwb') as f:
+                _write_message(f, {'path': path, 'payload': payload})
+                return _read_message(f)
+
+    def forward(self,
+                job_id: int,
+                path: str,
+                payload: dict,
+                claim: bool = False) -> t.Optional[dict]:
+        """
+        将请求转发给任务属主进程.
+        Args:
+            job_id: 任务id
+            path: 请求路径, 如run
+            payload: 请求体
+            claim: 任务无属主时是否由当前进程认领
+
+        Returns:
+            属主进程的响应体, 应由当前进程处理时返回None
+
+        """
+        for _ in range(2):
+            pid = self.get_owner(job_id, claim=claim)
+            if pid is None or pid == self.pid:
+                return None
+            start = time.perf_counter()
+            try:
+                response = self._request(pid, path, payload)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # 属主进程已退出, 重新获取属主
+                self.owners.pop(job_id, None)
+                continue
+            except OSError as e:
+                self.logger.error(f'转发任务{job_id}请求至工作进程{pid}失败:{e}')
+                XxlJobMetrics.counter('job_forward_errors', path=path).inc()
+                return Response(code=ResponseCode.Error,
+                                msg=f'转发请求至工作进程{pid}失败:{e}').json()
+            XxlJobMetrics.histogram('job_forward_seconds',
+                                    path=path).observe(time.perf_counter() -
+                                                       start)
+            return response
+        return Response(code=ResponseCode.Error,
+                        msg=f'任务{job_id}所属工作进程不可用').json()
@@ -0,0 +1,140 @@
+import hashlib
+import typing as t
+
+_HASH_METHODS = ('modulo', 'hash')
+
+
+def _stable_hash(key: t.Union[str, bytes, int]) -> int:
+    """跨进程稳定的64位哈希, 内置hash()对字符串加盐, 不同执行器结果不一致."""
+    if isinstance(key, int):
+        key = str(key)
+    if isinstance(key, str):
+        key = key.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+
+
+def _jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump Consistent Hash.
+    分片数由n变为n+1时, 只有约1/(n+1)的key改变所属分片.
+    """
+    b, j = -1, 0
+    while j < buckets:
+        b = j
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        j = int((b + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return b
+
+
+class ShardPartition:
+    """
+    广播任务分片.
+    将分片索引号与分片总数转换为数据划分条件, 使每个分片只读取自己的数据.
+
+    划分方式:
+        modulo: 整数key按`key % total`划分
+        range: 整数区间[lower, upper)按分片数等分为连续区间, 便于下推为索引范围查询
+        hash: 任意key按一致性哈希划分, 分片数变化时迁移的数据最少
+
+    Attributes:
+        index: 分片索引号
+        total: 分片总数
+
+    """
+
+    def __init__(self, index: int = 0, total: int = 1):
+        self.total = max(total or 1, 1)
+        if not 0 <= index < self.total:
+            raise ValueError(f'分片索引号{index}超出分片总数{self.total}')
+        self.index = index
+
+    def __repr__(self):
+        return f'ShardPartition(index={self.index}, total={self.total})'
+
+    @property
+    def is_sharded(self) -> bool:
+        return self.total > 1
+
+    def owns_modulo(self, key: int) -> bool:
+        return key % self.total == self.index
+
+    def hash_shard(self, key: t.Union[str, bytes, int]) -> int:
+        """一致性哈希计算key所属分片."""
+        return _jump_hash(_stable_hash(key), self.total)
+
+    def owns_hash(self, key: t.Union[str, bytes, int]) -> bool:
+        return self.hash_shard(key) == self.index
+
+    def range_bounds(self, lower: int, upper: int) -> t.Tuple[int, int]:
+        """
+        当前分片在[lower, upper)中的连续区间.
+        Returns:
+            (start, end), 区间左闭右开, 各分片区间首尾相接
+        """
+        size = upper - lower
+        return (lower + size * self.index // self.total,
+                lower + size * (self.index + 1) // self.total)
+
+    def owns_range(self, key: int, lower: int, upper: int) -> bool:
+        start, end = self.range_bounds(lower, upper)
+        return start <= key < end
+
+    def iter_range(self, lower: int, upper: int) -> range:
+        return range(*self.range_bounds(lower, upper))
+
+    def filter(self,
+               items: t.Iterable,
+               key: t.Optional[t.Callable[[t.Any], t.Any]] = None,
+               method: str = 'modulo') -> t.Iterator:
+        """
+        过滤出属于当前分片的元素.
+        Args:
+            items: 待过滤元素
+            key: 获取元素分片key的函数, 为空时以元素本身为key
+            method: modulo 或 hash
+
+        Raises:
+            ValueError: 不支持的分片方式, 调用时即检查而非迭代时
+
+        """
+        if method not in _HASH_METHODS:
+            raise ValueError(f'不支持的分片方式:{method}')
+        if not self.is_sharded:
+            return iter(items)
+        owns = self.owns_modulo if method == 'modulo' else self.owns_hash
+        return (item for item in items if owns(key(item) if key else item))
+
+    def sql_modulo(self, column: str) -> t.Tuple[str, dict]:
+        """
+        取模划分的sql条件.
+        Returns:
+            (sql片段, 绑定参数), 如("MOD(id, :shard_total) = :shard_index", {...})
+
+        """
+        return (f'MOD({column}, :shard_total) = :shard_index', {
+            'shard_total': self.total,
+            'shard_index': self.index
+        })
+
+    def sql_range(self, column: str, lower: int,
+                  upper: int) -> t.Tuple[str, dict]:
+        """
+        区间划分的sql条件, 可使用`column`上的索引.
+        Returns:
+            (sql片段, 绑定参数), 如("id >= :shard_start AND id < :shard_end", {...})
+
+        """
+        start, end = self.range_bounds(lower, upper)
+        return (f'{column} >= :shard_start AND {column} < :shard_end', {
+            'shard_start': start,
+            'shard_end': end
+        })
+
+    def modulo_criterion(self, column):
+        """取模划分的SQLAlchemy查询条件, 如`query.filter(shard.modulo_criterion(Model.id))`."""
+        return column % self.total == self.index
+
+    def range_criterion(self, column, lower: int, upper: int):
+        """区间划分的SQLAlchemy查询条件."""
+        start, end = self.range_bounds(lower, upper)
+        return column.between(start, end - 1)
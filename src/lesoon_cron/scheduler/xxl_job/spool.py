@@ -0,0 +1,182 @@
+import glob
+import json
+import logging
+import os
+import threading
+import typing as t
+import uuid
+
+import filelock
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.dataclass import CallbackParam
+
+
+class CallbackSpool:
+    """
+    回调参数本地日志.
+    回调参数追加写入本进程独占的日志文件, 回调成功后追加确认记录,
+    日志文件名包含进程号与启动标识, 容器重启复用进程号时不会与旧日志文件冲突.
+    已确认记录达到`compact_threshold`条时重写日志文件只保留未确认记录.
+    进程启动时接管目录下无进程持有的日志文件, 重新回调其中未确认的记录.
+
+    日志每行一条json记录:
+        {"op": "add", "id": 1, "param": {...}}
+        {"op": "ack", "ids": [1, 2]}
+
+    Attributes:
+        spool_dir: 日志目录
+        compact_threshold: 触发压缩的已确认记录数
+
+    """
+    logger: logging.Logger = logging.getLogger('xxl-job-callback')
+
+    def __init__(self, spool_dir: str, compact_threshold: int = 1000):
+        self.spool_dir = spool_dir
+        self.compact_threshold = compact_threshold
+        os.makedirs(spool_dir, exist_ok=True)
+        self.path = os.path.join(
+            spool_dir,
+            f'callback-{os.getpid()}-{uuid.uuid4().hex[:12]}.journal')
+        # 进程存活期间持有文件锁, 防止被其他进程接管
+        self.file_lock = filelock.FileLock(f'{self.path}.lock')
+        self.file_lock.acquire()
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.pending: t.Dict[int, CallbackParam] = {}
+        self.acked = 0
+        self.dirty = False
+        self.file = open(self.path, mode='a', encoding='utf-8')
+
+    @staticmethod
+    def _dump_param(param: CallbackParam) -> dict:
+        return {
+            'log_id': param.log_id,
+            'log_date_time': param.log_date_time,
+            'code': param.code.value,
+            'msg': param.msg
+        }
+
+    @staticmethod
+    def _load_param(data: dict) -> CallbackParam:
+        return CallbackParam(log_id=data['log_id'],
+                             log_date_time=data['log_date_time'],
+                             code=ResponseCode(data['code']),
+                             msg=data['msg'])
+
+    @classmethod
+    def _load_journal(cls, path: str) -> t.List[CallbackParam]:
+        """读取日志文件中未确认的回调参数."""
+        pending: t.Dict[int, CallbackParam] = {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程异常退出时末行可能不完整
+                    continue
+                if record['op'] == 'add':
+                    pending[record['id']] = cls._load_param(record['param'])
+                elif record['op'] == 'ack':
+                    for spool_id in record['ids']:
+                        pending.pop(spool_id, None)
+        return list(pending.values())
+
+    def _append_record(self, record: dict):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.dirty = True
+
+    def append(self, param: CallbackParam) -> int:
+        """写入回调参数, 返回记录id."""
+        with self.lock:
+            self.seq += 1
+            self.pending[self.seq] = param
+            self._append_record({
+                'op': 'add',
+                'id': self.seq,
+                'param': self._dump_param(param)
+            })
+            return self.seq
+
+    def sync(self):
+        """将已写入的记录刷入磁盘."""
+        with self.lock:
+            if self.dirty:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.dirty = False
+
+    def ack(self, spool_ids: t.Sequence[int]):
+        """确认回调成功的记录."""
+        spool_ids = [i for i in spool_ids if i]
+        if not spool_ids:
+            return
+        with self.lock:
+            for spool_id in spool_ids:
+                self.pending.pop(spool_id, None)
+            self._append_record({'op': 'ack', 'ids': spool_ids})
+            self.acked += len(spool_ids)
+            if self.acked >= self.compact_threshold:
+                self._compact()
+
+    def _compact(self):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, mode='w', encoding='utf-8') as f:
+            for spool_id, param in self.pending.items():
+                f.write(
+                    json.dumps(
+                        {
+                            'op': 'add',
+                            'id': spool_id,
+                            'param': self._dump_param(param)
+                        },
+                        ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(tmp_path, self.path)
+        self.file = open(self.path, mode='a', encoding='utf-8')
+        self.acked = 0
+        self.dirty = False
+
+    def recover(self) -> t.List[t.Tuple[int, CallbackParam]]:
+        """
+        接管无进程持有的日志文件.
+        Returns:
+            重新写入本进程日志后的(记录id, 回调参数)列表
+
+        """
+        recovered: t.List[t.Tuple[int, CallbackParam]] = []
+        pattern = os.path.join(self.spool_dir, 'callback-*.journal')
+        for path in glob.glob(pattern):
+            if path == self.path:
+                continue
+            orphan_lock = filelock.FileLock(f'{path}.lock')
+            try:
+                orphan_lock.acquire(timeout=0)
+            except filelock.Timeout:
+                # 其他存活进程正在使用
+                continue
+            try:
+                params = self._load_journal(path)
+                for param in params:
+                    recovered.append((self.append(param), param))
+                self.sync()
+                os.remove(path)
+                self.logger.info(f'已接管回调日志{path},待回调:{len(params)}条')
+            except Exception as e:
+                self.logger.exception(e)
+            finally:
+                orphan_lock.release()
+                try:
+                    os.remove(f'{path}.lock')
+                except OSError:
+                    pass
+        return recovered
+
+    def close(self):
+        with self.lock:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+        self.file_lock.release()
@@ -1,8 +1,11 @@
-import copy
+import contextvars
 import ctypes
 import inspect
 import threading
-from _threading_local import local
+import types
+import typing as t
+
+_EMPTY: types.MappingProxyType = types.MappingProxyType({})
 
 
 class StoppableThread(threading.Thread):
@@ -56,6 +59,8 @@ class StoppableThread(threading.Thread):
 class InheritableThread(StoppableThread):
     """
     用于创建可继承父线程变量的线程.
+    创建时对父线程的contextvars上下文做快照, 子线程在快照中运行,
+    快照只复制引用, 不拷贝变量的值.
     """
 
     def __init__(self,
@@ -73,6 +78,7 @@ class InheritableThread(StoppableThread):
                          kwargs=kwargs,
                          daemon=daemon)
         self.parent = threading.current_thread()
+        self.context = contextvars.copy_context()
         self.exc = None
         self.ret = None
 
@@ -81,7 +87,7 @@ class InheritableThread(StoppableThread):
         为捕获线程运行中异常重写.
         """
         try:
-            super().run()
+            self.context.run(super().run)
         except Exception as e:
             self.exc = e
 
@@ -92,44 +98,36 @@ class InheritableThread(StoppableThread):
         return self.ret
 
 
-class InheritableLocal(local):
+class InheritableLocal:
     """
-    如果需要父线程的变量，请使用InheritableThread创建线程.
+    可继承的线程变量.
+    变量保存在contextvars中, 各线程互相隔离; 由InheritableThread创建的子线程继承父线程的变量.
+    赋值时复制变量字典(写时复制), 子线程的修改不影响父线程.
     """
 
-    def copy_parent_attribute(self):
-        parent = threading.current_thread().parent  # noqa
-        parent_local = self._local__impl.dicts.get(id(parent))
-        if parent_local is not None:
-            parent_dicts = parent_local[1]
-            for key, value in parent_dicts.items():
-                self.__setattr__(key, copy.deepcopy(value))
+    def __init__(self):
+        object.__setattr__(
+            self, '_var',
+            contextvars.ContextVar(f'inheritable_local_{id(self)}'))
 
-    def __new__(cls, *args, **kwargs):
-        self = local.__new__(cls, *args, **kwargs)  # noqa
-        try:
-            self.copy_parent_attribute()
-        except AttributeError:
-            # 不是由InheritableThread创建的线程不需要拷贝属性
-            pass
-        return self
+    def _get_dict(self) -> t.Mapping:
+        return object.__getattribute__(self, '_var').get(_EMPTY)
 
-    def __getattribute__(self, item):
+    def __getattr__(self, item):
         try:
-            return local.__getattribute__(self, item)
-        except AttributeError as e:
-            try:
-                self.copy_parent_attribute()
-                return local.__getattribute__(self, item)
-            except AttributeError:
-                raise e
+            return self._get_dict()[item]
+        except KeyError:
+            raise AttributeError(item) from None
+
+    def __setattr__(self, key, value):
+        attrs = dict(self._get_dict())
+        attrs[key] = value
+        object.__getattribute__(self, '_var').set(attrs)
 
     def __delattr__(self, item):
+        attrs = dict(self._get_dict())
         try:
-            return local.__delattr__(self, item)
-        except AttributeError as e:
-            try:
-                self.copy_parent_attribute()
-                return local.__delattr__(self, item)
-            except AttributeError:
-                raise e
+            del attrs[item]
+        except KeyError:
+            raise AttributeError(item) from None
+        object.__getattribute__(self, '_var').set(attrs)
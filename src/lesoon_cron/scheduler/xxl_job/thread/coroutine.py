@@ -0,0 +1,129 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import queue
+import threading
+import typing as t
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
+from lesoon_cron.scheduler.xxl_job.dataclass import Response
+from lesoon_cron.scheduler.xxl_job.dataclass import TriggerParam
+from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+from lesoon_cron.scheduler.xxl_job.thread.work import BaseJob
+
+
+class EventLoopThread(threading.Thread):
+    """
+    协程任务共享的事件循环线程.
+    """
+    logger: logging.Logger = logging.getLogger('xxl-job-event-loop')
+
+    def __init__(self):
+        super().__init__(name='xxl-job-event-loop', daemon=True)
+        self.loop = asyncio.new_event_loop()
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+        self.logger.info('xxl-job 事件循环线程停止工作')
+
+    def submit(self, coro: t.Coroutine) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class AsyncJob(BaseJob):
+    """
+    协程处理函数对应的job.
+    调度在共享事件循环中执行, 同一job的调度依次执行, 不同job之间并发.
+
+    """
+
+    def __init__(self, job_id: int, handle_func: t.Callable,
+                 loop_thread: EventLoopThread):
+        super().__init__(job_id=job_id, handle_func=handle_func)
+        self.loop_thread = loop_thread
+        # 当前正在消费调度队列的协程任务
+        self.task: t.Optional[concurrent.futures.Future] = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """与JobThread保持一致的接口, 协程模式下无需启动."""
+
+    def is_alive(self) -> bool:
+        return not self.stop_flag
+
+    def push_trigger(self, trigger_param: TriggerParam) -> Response:
+        response = super().push_trigger(trigger_param=trigger_param)
+        if response.code == ResponseCode.Success:
+            self._schedule()
+        return response
+
+    def terminate(self):
+        """取消正在执行的协程任务, 并清理余下调度队列."""
+        with self.lock:
+            task = self.task
+        if task:
+            task.cancel()
+        self.clear_queue()
+
+    def _schedule(self):
+        with self.lock:
+            if self.task or self.stop_flag:
+                return
+            self.task = self.loop_thread.submit(self._consume())
+
+    async def _consume(self):
+        try:
+            while not self.stop_flag:
+                try:
+                    tp = self.trigger_queue.get_nowait()
+                except queue.Empty:
+                    break
+                await self.execute_async(tp)
+        finally:
+            with self.lock:
+                self.task = None
+        if not self.stop_flag and self.trigger_queue.qsize():
+            self._schedule()
+
+    async def execute_async(self, tp: TriggerParam):
+        """
+        执行单次协程调度, 超时由`asyncio.wait_for`控制.
+        Args:
+            tp: 调度参数
+
+        """
+        XxlJobContext.set(None)
+        try:
+            args, kwargs = self.prepare(tp)
+            coro = self.handle_func(*args, **kwargs)
+            if tp.executor_timeout:
+                try:
+                    await asyncio.wait_for(coro, timeout=tp.executor_timeout)
+                except asyncio.TimeoutError:
+                    self.on_timeout(tp)
+            else:
+                await coro
+            self.on_finish()
+        except asyncio.CancelledError:
+            self.on_interrupt(tp)
+        except Exception as e:
+            self.on_error(e)
+        finally:
+            # 日志刷盘与回调参数持久化可能阻塞, 在线程池中执行, 避免阻塞事件循环中的其他协程任务
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            await loop.run_in_executor(None, context.run, self._complete, tp)
+
+    def _complete(self, tp: TriggerParam):
+        """日志落盘后推送调度结果."""
+        XxlJobLogger.flush()
+        self.push_result(tp)
@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import logging
+import queue
+import threading
+import time
+import typing as t
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.dataclass import Response
+from lesoon_cron.scheduler.xxl_job.dataclass import TriggerParam
+from lesoon_cron.scheduler.xxl_job.metrics import XxlJobMetrics
+from lesoon_cron.scheduler.xxl_job.thread.base import StoppableThread
+from lesoon_cron.scheduler.xxl_job.thread.work import _deliver_pending
+from lesoon_cron.scheduler.xxl_job.thread.work import BaseJob
+from lesoon_cron.scheduler.xxl_job.thread.work import JobInterrupted
+
+
+class PooledJob(BaseJob):
+    """
+    共享线程池执行的job.
+    自身不持有线程, 有待执行调度时进入线程池就绪队列,
+    同一时刻最多被一个工作线程执行, 以此保证单个job串行.
+
+    Attributes:
+        priority: 调度优先级, 详见`ReadyQueue`
+        weight: 同一优先级内的调度权重
+
+    """
+
+    def __init__(self,
+                 job_id: int,
+                 handle_func: t.Callable,
+                 pool: 'JobWorkerPool',
+                 priority: int = 0,
+                 weight: float = 1):
+        if weight <= 0:
+            raise ValueError(f'job[{job_id}]调度权重必须大于0:{weight}')
+        super().__init__(job_id=job_id, handle_func=handle_func)
+        self.pool = pool
+        self.priority = priority
+        self.weight = weight
+        # 就绪队列中的虚拟完成时间与进入就绪队列的时间
+        self.virtual_finish = 0.0
+        self.ready_at = 0.0
+        # 是否已进入就绪队列或正在被执行
+        self.scheduled = False
+        # 正在执行该job的工作线程, 处理函数超时未返回时被释放
+        self.owner: t.Optional['PoolWorkerThread'] = None
+        # 正在执行该job处理函数的工作线程id, 只在此期间允许终止
+        self.worker_id: t.Optional[int] = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """与JobThread保持一致的接口, 线程池模式下无需启动."""
+
+    def is_alive(self) -> bool:
+        return not self.stop_flag
+
+    def push_trigger(self, trigger_param: TriggerParam) -> Response:
+        response = super().push_trigger(trigger_param=trigger_param)
+        if response.code == ResponseCode.Success:
+            self.pool.schedule(self)
+        return response
+
+    def terminate(self):
+        """中断正在执行该job处理函数的工作线程, 并清理余下调度队列."""
+        with self.lock:
+            if worker_id := self.worker_id:
+                StoppableThread._async_raise(worker_id, JobInterrupted)
+        self.clear_queue()
+
+    def call_handler(self, tp: TriggerParam, args: tuple, kwargs: dict):
+        with self.lock:
+            self.worker_id = threading.get_ident()
+        try:
+            super().call_handler(tp, args, kwargs)
+        finally:
+            self._leave_handler()
+
+    def _leave_handler(self):
+        """
+        退出可终止区间.
+        终止异常可能在处理函数返回后才送达, 在此吸收, 避免落在回调或调度状态维护中.
+        """
+        while True:
+            try:
+                with self.lock:
+                    if self.worker_id == threading.get_ident():
+                        self.worker_id = None
+                _deliver_pending()
+                return
+            except JobInterrupted:
+                continue
+
+    def release_slot(self):
+        """由其他工作线程执行余下调度, 阻塞在超时处理函数中的工作线程由新线程替换."""
+        with self.lock:
+            owner, self.owner = self.owner, None
+            self.worker_id = None
+            self.scheduled = False
+        if owner:
+            self.pool.replace_worker(owner)
+        if not self.stop_flag and self.trigger_queue.qsize():
+            self.pool.schedule(self)
+
+
+class PoolWorkerThread(StoppableThread):
+    logger: logging.Logger = logging.getLogger('xxl-job-worker')
+
+    def __init__(self, pool: 'JobWorkerPool', index: int):
+        self.pool = pool
+        self.index = index
+        # 已被替换, 当前调度结束后退出
+        self.retired = False
+        super().__init__(name=f'xxl-job-worker-{index}', daemon=True)
+
+    def _run_job(self, job: PooledJob):
+        with job.lock:
+            job.owner = self
+        try:
+            tp = job.trigger_queue.get_nowait()
+        except queue.Empty:
+            tp = None
+        owned = False
+        try:
+            if tp and job.stop_flag:
+                job.discard(tp)
+            elif tp:
+                job.execute(tp)
+        finally:
+            with job.lock:
+                # 处理函数超时后job已交由其他工作线程执行, 不再维护其调度状态
+                if owned := job.owner is self:
+                    job.owner = None
+                    job.scheduled = False
+        if owned and not job.stop_flag and job.trigger_queue.qsize():
+            self.pool.schedule(job)
+
+    def run(self) -> None:
+        while not self.retired:
+            try:
+                job = self.pool.ready_queue.get()
+                if job is None:
+                    break
+                self._run_job(job)
+            except JobInterrupted:
+                # 终止信号落在调度执行之外, 忽略即可
+                continue
+            except Exception as e:
+                self.logger.exception(e)
+        self.logger.info(f'xxl-job 工作线程[{self.name}]停止工作')
+
+
+class ReadyQueue:
+    """
+    线程池就绪job队列.
+    按job优先级划分通道, 取出时只从优先级最高的非空通道获取(严格优先级);
+    同一通道内按开始时间公平排队(SFQ): job每执行一次调度, 虚拟时间前进`1/weight`,
+    每次取出虚拟开始时间最小的job, 使各job获得的执行次数与权重成正比,
+    持续大量调度的job不会饿死同一通道内的其他job.
+    停止信号(None)优先于job取出.
+
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        # 优先级 -> [(虚拟开始时间, 序号, job)]
+        self.lanes: t.Dict[int, t.List[t.Tuple[float, int, PooledJob]]] = {}
+        # 优先级 -> 通道虚拟时间, 即最近取出job的虚拟开始时间
+        self.lane_times: t.Dict[int, float] = {}
+        self.counter = itertools.count()
+        self.size = 0
+        self.stopping = 0
+
+    def put(self, job: t.Optional[PooledJob]):
+        with self.cond:
+            if job is None:
+                self.stopping += 1
+            else:
+                lane = job.priority
+                # 闲置的job不累积额度, 从通道当前虚拟时间开始
+                start = max(self.lane_times.get(lane, 0.0), job.virtual_finish)
+                job.virtual_finish = start + 1 / job.weight
+                job.ready_at = time.monotonic()
+                heapq.heappush(self.lanes.setdefault(lane, []),
+                               (start, next(self.counter), job))
+                self.size += 1
+            self.cond.notify()
+
+    def get(self) -> t.Optional[PooledJob]:
+        with self.cond:
+            while not self.size and not self.stopping:
+                self.cond.wait()
+            if self.stopping:
+                self.stopping -= 1
+                return None
+            lane = max(
+                priority for priority, jobs in self.lanes.items() if jobs)
+            start, _, job = heapq.heappop(self.lanes[lane])
+            self.lane_times[lane] = start
+            self.size -= 1
+        XxlJobMetrics.histogram('worker_pool_wait_seconds',
+                                lane=lane).observe(time.monotonic() -
+                                                   job.ready_at)
+        return job
+
+    def qsize(self) -> int:
+        return self.size
+
+    def lane_depths(self) -> t.Dict[int, int]:
+        """各优先级通道中的就绪job数."""
+        with self.cond:
+            return {
+                priority: len(jobs) for priority, jobs in self.lanes.items()
+            }
+
+
+class JobWorkerPool:
+    """
+    xxl-job 共享工作线程池.
+    固定数量的工作线程从就绪队列中获取job执行, 线程数不随job数量增长.
+    不同job之间按优先级与权重分配工作线程, 详见`ReadyQueue`.
+
+    Attributes:
+        size: 工作线程数
+        ready_queue: 待执行job队列
+
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.ready_queue = ReadyQueue()
+        self.workers: t.List[PoolWorkerThread] = []
+
+    def start(self):
+        for index in range(self.size):
+            worker = PoolWorkerThread(pool=self, index=index)
+            self.workers.append(worker)
+            worker.start()
+
+    def stop(self):
+        for _ in self.workers:
+            self.ready_queue.put(None)
+
+    def replace_worker(self, worker: PoolWorkerThread):
+        """替换阻塞在超时处理函数中的工作线程, 保持工作线程数不变."""
+        worker.retired = True
+        new_worker = PoolWorkerThread(pool=self, index=worker.index)
+        self.workers = [new_worker if w is worker else w for w in self.workers]
+        new_worker.start()
+
+    def schedule(self, job: PooledJob):
+        """将有待执行调度的job放入就绪队列."""
+        with job.lock:
+            if job.scheduled or job.stop_flag:
+                return
+            job.scheduled = True
+        self.ready_queue.put(job)
+
+    def create_job(self,
+                   job_id: int,
+                   handle_func: t.Callable,
+                   priority: int = 0,
+                   weight: float = 1) -> PooledJob:
+        return PooledJob(job_id=job_id,
+                         handle_func=handle_func,
+                         pool=self,
+                         priority=priority,
+                         weight=weight)
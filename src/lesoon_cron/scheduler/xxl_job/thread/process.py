@@ -0,0 +1,363 @@
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+import typing as t
+from multiprocessing.connection import Client
+from multiprocessing.connection import Connection
+from multiprocessing.connection import Listener
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
+from lesoon_cron.scheduler.xxl_job.dataclass import TriggerParam
+from lesoon_cron.scheduler.xxl_job.globals import XxlJobGlobals
+from lesoon_cron.scheduler.xxl_job.helper import XxlJobHelper
+from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+from lesoon_cron.scheduler.xxl_job.thread.pool import PooledJob
+from lesoon_cron.scheduler.xxl_job.thread.timer import Timer
+from lesoon_cron.scheduler.xxl_job.thread.work import BaseJob
+from lesoon_cron.scheduler.xxl_job.thread.work import JobThread
+
+
+class _PipeLogWriter:
+    """
+    子进程日志写入器, 将日志通过管道交由父进程写入任务日志.
+    处理函数中的子线程与调度结果共用管道, 发送时加锁避免消息交错.
+    """
+
+    def __init__(self, conn: Connection):
+        self.conn = conn
+        self.lock = threading.Lock()
+
+    def send(self, message: tuple):
+        with self.lock:
+            self.conn.send(message)
+
+    def put(self, log_file_path: str, msg: str):
+        self.send(('log', log_file_path, msg))
+
+    def flush(self, timeout: t.Optional[float] = None) -> bool:
+        return True
+
+
+def _process_main(conn: Connection):
+    """
+    工作进程入口.
+    循环接收调度请求, 按`Class.method`查找处理函数执行, 返回执行结果.
+    处理器在工作进程创建后才定义时, 导入处理器所在模块完成注册.
+    """
+    writer = _PipeLogWriter(conn)
+    XxlJobLogger.writer = writer  # type:ignore
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        executor_handler, handler_module, args, kwargs, context_fields = request
+        context = XxlJobContext(**context_fields)
+        XxlJobContext.set(context)
+        try:
+            cls_name = executor_handler.rpartition('.')[0]
+            if not XxlJobGlobals.get_handler(cls_name) and handler_module:
+                importlib.import_module(handler_module)
+            handle_func = XxlJobGlobals.get_handle_func(executor_handler)
+            handle_func(*args, **kwargs)
+            writer.send(
+                ('result', context.response_code.value, context.response_msg))
+        except Exception:
+            writer.send(('error', traceback.format_exc()))
+
+
+def _template_main(conn: Connection, parent_conn: Connection, address: str,
+                   authkey: bytes):
+    """
+    模板进程入口.
+    模板进程在其他线程启动前fork且自身只有一个线程, 所有工作进程都由模板进程fork,
+    避免从多线程的主进程fork时继承被其他线程持有的锁(logging、requests等)导致死锁.
+    工作进程创建后主动连接主进程的`address`.
+    """
+    # 关闭fork时继承的主进程端管道, 主进程退出时模板进程才能收到EOF
+    parent_conn.close()
+    # 工作进程退出后自动回收
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        if os.fork() == 0:
+            try:
+                conn.close()
+                worker_conn = Client(address, authkey=authkey)
+                worker_conn.send(os.getpid())
+                _process_main(worker_conn)
+            finally:
+                os._exit(0)
+
+
+class ProcessWorker:
+    """
+    预先创建的工作进程.
+
+    Attributes:
+        pid: 工作进程id
+        conn: 与工作进程通信的管道
+
+    """
+
+    def __init__(self, pid: int, conn: Connection):
+        self.pid = pid
+        self.conn = conn
+        self.lock = threading.Lock()
+        self.killed = False
+        # 是否因执行超时被杀死
+        self.expired = False
+
+    def _exists(self) -> bool:
+        try:
+            os.kill(self.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def is_alive(self) -> bool:
+        # 进程被杀死后可能尚未回收, 以标记为准避免归还到进程池
+        return not self.killed and self._exists()
+
+    def kill(self):
+        # 终止调度与调度线程归还进程可能同时杀死进程, 管道只关闭一次, 避免关闭已复用的文件描述符
+        with self.lock:
+            if self.killed:
+                return
+            self.killed = True
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.conn.close()
+
+    def expire(self):
+        """执行超时时由定时线程调用, 杀死工作进程唤醒等待结果的调度线程."""
+        self.expired = True
+        self.kill()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        deadline = time.monotonic() + 1
+        while self._exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.kill()
+
+
+class ProcessWorkerPool:
+    """
+    xxl-job 工作进程池.
+    初始化时(其他线程启动前)fork单线程的模板进程, 工作进程均由模板进程fork并常驻,
+    执行超时或被终止的进程直接杀死后由模板进程补充新进程.
+
+    Attributes:
+        size: 工作进程数
+
+    """
+    logger: logging.Logger = logging.getLogger('xxl-job-process-pool')
+
+    def __init__(self, size: int):
+        self.size = size
+        self.mp_context = multiprocessing.get_context('fork')
+        authkey = os.urandom(16)
+        self.listener = Listener(family='AF_UNIX', authkey=authkey)
+        self.template_conn, child_conn = self.mp_context.Pipe()
+        self.template = self.mp_context.Process(
+            target=_template_main,
+            args=(child_conn, self.template_conn, self.listener.address,
+                  authkey),
+            name='xxl-job-process-template',
+            daemon=True)
+        self.template.start()
+        child_conn.close()
+        self.fork_lock = threading.Lock()
+        self.idle_workers: 'queue.Queue[ProcessWorker]' = queue.Queue()
+        for _ in range(size):
+            self.idle_workers.put(self._new_worker())
+
+    def _new_worker(self) -> ProcessWorker:
+        with self.fork_lock:
+            self.template_conn.send('fork')
+            conn = self.listener.accept()
+        return ProcessWorker(pid=conn.recv(), conn=conn)
+
+    def acquire(self) -> ProcessWorker:
+        return self.idle_workers.get()
+
+    def release(self, worker: ProcessWorker):
+        if worker.is_alive():
+            self.idle_workers.put(worker)
+        else:
+            self.discard(worker)
+
+    def discard(self, worker: ProcessWorker):
+        """杀死工作进程并补充新进程."""
+        worker.kill()
+        self.idle_workers.put(self._new_worker())
+
+    def stop(self):
+        while True:
+            try:
+                self.idle_workers.get_nowait().stop()
+            except queue.Empty:
+                break
+        try:
+            self.template_conn.send(None)
+        except OSError:
+            pass
+        self.template.join(timeout=1)
+        self.listener.close()
+
+
+class ProcessJobMixin(BaseJob):
+    """
+    工作进程执行的job.
+    调度在工作进程中运行, 超时或终止时直接杀死工作进程.
+
+    """
+    process_pool: ProcessWorkerPool
+
+    def _init_process(self, process_pool: ProcessWorkerPool):
+        self.process_pool = process_pool
+        # 当前正在执行调度的工作进程
+        self.process_worker: t.Optional[ProcessWorker] = None
+
+    def kill_process(self):
+        if worker := self.process_worker:
+            worker.kill()
+
+    @staticmethod
+    def _wait_result(worker: ProcessWorker) -> tuple:
+        """
+        等待工作进程返回执行结果, 期间将子进程日志写入任务日志.
+        Raises:
+            TimeoutError: 执行超时, 工作进程已被定时线程杀死
+            InterruptedError: 调度被终止, 工作进程已被杀死
+
+        """
+        while True:
+            try:
+                message = worker.conn.recv()
+            except (EOFError, OSError):
+                # 工作进程被杀死
+                if worker.expired:
+                    raise TimeoutError(f'工作进程[{worker.pid}]执行超时')
+                raise InterruptedError
+            if message[0] == 'log':
+                XxlJobLogger.write(log_file_path=message[1], msg=message[2])
+            else:
+                return message
+
+    def execute(self, tp: TriggerParam):
+        XxlJobContext.set(None)
+        worker: t.Optional[ProcessWorker] = None
+        timer: t.Optional[Timer] = None
+        try:
+            args, kwargs = self.prepare(tp)
+            context = XxlJobContext.get()
+            worker = self.process_worker = self.process_pool.acquire()
+            if self.stop_flag:
+                raise InterruptedError
+            cls_name = tp.executor_handler.rpartition('.')[0]
+            handler_module = getattr(XxlJobGlobals.get_handler(cls_name),
+                                     '__module__', '')
+            try:
+                worker.conn.send(
+                    (tp.executor_handler, handler_module, args, kwargs, {
+                        'job_id': context.job_id,
+                        'job_args': context.job_args,
+                        'job_kwargs': context.job_kwargs,
+                        'job_file_path': context.job_file_path,
+                        'broadcast_index': context.broadcast_index,
+                        'broadcast_total': context.broadcast_total
+                    }))
+            except OSError:
+                # 获取工作进程后调度被终止, 工作进程已被杀死
+                raise InterruptedError
+            if tp.executor_timeout:
+                # 与线程执行的job共用定时线程计时, 超时时杀死工作进程
+                timer = XxlJobGlobals.get_timer_thread().schedule(
+                    tp.executor_timeout, worker.expire)
+            try:
+                message = self._wait_result(worker)
+            except TimeoutError as e:
+                self.logger.info(e)
+                self.on_timeout(tp)
+            else:
+                if message[0] == 'result':
+                    XxlJobHelper.handle_result(code=ResponseCode(message[1]),
+                                               msg=message[2])
+                else:
+                    XxlJobHelper.handle_failure('任务执行异常')
+                    XxlJobHelper.log(
+                        f'<br>----------- JobThread Exception: + {message[1]} + '
+                        f'<br>----------- xxl-job job execute end(error) -----------'
+                    )
+                    return
+            self.on_finish()
+        except InterruptedError:
+            self.on_interrupt(tp)
+        except Exception as e:
+            self.on_error(e)
+        finally:
+            if timer:
+                timer.cancel()
+            self.process_worker = None
+            if worker:
+                self.process_pool.release(worker)
+            XxlJobLogger.flush()
+            self.push_result(tp)
+
+
+class ProcessJobThread(ProcessJobMixin, JobThread):
+    """独占线程调度, 在工作进程中执行的job."""
+
+    def __init__(self, job_id: int, handle_func: t.Callable,
+                 process_pool: ProcessWorkerPool):
+        super().__init__(job_id=job_id, handle_func=handle_func)
+        self._init_process(process_pool)
+
+    def terminate(self):
+        # 杀死工作进程即可唤醒等待中的调度线程, 线程随后因stop_flag退出
+        self.kill_process()
+
+
+class PooledProcessJob(ProcessJobMixin, PooledJob):
+    """共享线程池调度, 在工作进程中执行的job."""
+
+    def __init__(self,
+                 job_id: int,
+                 handle_func: t.Callable,
+                 pool,
+                 process_pool: ProcessWorkerPool,
+                 priority: int = 0,
+                 weight: float = 1):
+        super().__init__(job_id=job_id,
+                         handle_func=handle_func,
+                         pool=pool,
+                         priority=priority,
+                         weight=weight)
+        self._init_process(process_pool)
+
+    def terminate(self):
+        self.kill_process()
+        self.clear_queue()
@@ -0,0 +1,164 @@
+import logging
+import math
+import threading
+import time
+import typing as t
+
+
+class Timer:
+    """
+    定时器句柄.
+
+    Attributes:
+        expires: 到期刻度
+        callback: 到期回调
+        args: 回调参数
+        cancelled: 是否已取消
+
+    """
+    __slots__ = ('expires', 'callback', 'args', 'cancelled')
+
+    def __init__(self, expires: int, callback: t.Callable, args: tuple):
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    分层时间轮.
+    第0层每个槽对应一个刻度, 第n层每个槽对应第n-1层的一圈;
+    低层时间轮转完一圈时, 将高层对应槽中的定时器重新放入低层.
+    添加、取消定时器均为O(1), 推进时只处理到期的槽.
+
+    Attributes:
+        slots: 每层槽数
+        levels: 层数, 超出最大跨度的定时器先放入最高层, 降层时重新计算
+
+    """
+
+    def __init__(self, slots: int = 64, levels: int = 4, current: int = 0):
+        self.slots = slots
+        self.levels = levels
+        self.current = current
+        self.wheels: t.List[t.List[t.List[Timer]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self.count = 0
+
+    def _place(self, timer: Timer) -> bool:
+        delta = timer.expires - self.current
+        if delta <= 0:
+            return False
+        span = 1
+        for level in range(self.levels):
+            if delta < span * self.slots or level == self.levels - 1:
+                expires = min(timer.expires,
+                              self.current + span * self.slots - 1)
+                self.wheels[level][(expires // span) % self.slots].append(timer)
+                return True
+            span *= self.slots
+        return False
+
+    def add(self, timer: Timer) -> bool:
+        """添加定时器, 已到期时返回False."""
+        if placed := self._place(timer):
+            self.count += 1
+        return placed
+
+    def advance(self, tick: int) -> t.List[Timer]:
+        """推进到指定刻度, 返回到期且未取消的定时器."""
+        expired: t.List[Timer] = []
+        while self.current < tick:
+            self.current += 1
+            slot = self.current % self.slots
+            if slot == 0:
+                # 低层转完一圈, 高层对应槽的定时器降层
+                span = self.slots
+                for level in range(1, self.levels):
+                    index = (self.current // span) % self.slots
+                    timers, self.wheels[level][index] = self.wheels[level][
+                        index], []
+                    for timer in timers:
+                        if not timer.cancelled and not self._place(timer):
+                            expired.append(timer)
+                            self.count -= 1
+                        elif timer.cancelled:
+                            self.count -= 1
+                    if index:
+                        break
+                    span *= self.slots
+            timers, self.wheels[0][slot] = self.wheels[0][slot], []
+            for timer in timers:
+                if timer.cancelled:
+                    self.count -= 1
+                elif timer.expires <= self.current:
+                    expired.append(timer)
+                    self.count -= 1
+                else:
+                    self._place(timer)
+        return expired
+
+
+class TimerThread(threading.Thread):
+    """
+    执行器定时线程.
+    统一管理调度执行超时、闲置job清理等定时任务, 到期回调在本线程中执行, 回调应尽快返回.
+
+    Attributes:
+        tick: 时间轮刻度(秒), 即定时精度
+
+    """
+    logger: logging.Logger = logging.getLogger('xxl-job-timer')
+
+    def __init__(self, tick: float = 0.1):
+        super().__init__(name='xxl-job-timer', daemon=True)
+        self.tick = tick
+        self.wheel = TimerWheel(current=self._now_tick())
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+    def _now_tick(self) -> int:
+        return int(time.monotonic() / self.tick)
+
+    def schedule(self, delay: float, callback: t.Callable, *args) -> Timer:
+        """
+        添加定时任务.
+        Args:
+            delay: 延迟时间(秒)
+            callback: 到期回调
+            args: 回调参数
+
+        Returns:
+            定时器句柄, 可用于取消
+
+        """
+        expires = math.ceil((time.monotonic() + delay) / self.tick)
+        timer = Timer(expires=expires, callback=callback, args=args)
+        with self.lock:
+            placed = self.wheel.add(timer)
+        if not placed:
+            self._fire(timer)
+        return timer
+
+    def _fire(self, timer: Timer):
+        if timer.cancelled:
+            return
+        try:
+            timer.callback(*timer.args)
+        except Exception as e:
+            self.logger.exception(e)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self) -> None:
+        while not self.stop_event.wait(self.tick):
+            with self.lock:
+                expired = self.wheel.advance(self._now_tick())
+            for timer in expired:
+                self._fire(timer)
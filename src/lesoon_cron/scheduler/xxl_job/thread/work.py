@@ -1,13 +1,20 @@
-import ast
+import abc
+import contextvars
 import logging
+import os
 import queue
+import random
 import threading
 import time
 import traceback
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 
+import filelock
 from lesoon_common import LesoonFlask
 
+from lesoon_cron.scheduler.xxl_job.admission import TriggerAdmission
+from lesoon_cron.scheduler.xxl_job.client import XxlJobClient
 from lesoon_cron.scheduler.xxl_job.code import ResponseCode
 from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
 from lesoon_cron.scheduler.xxl_job.dataclass import CallbackParam
@@ -16,93 +23,383 @@ from lesoon_cron.scheduler.xxl_job.dataclass import TriggerParam
 from lesoon_cron.scheduler.xxl_job.globals import XxlJobGlobals
 from lesoon_cron.scheduler.xxl_job.helper import XxlJobHelper
 from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
-from lesoon_cron.scheduler.xxl_job.thread.base import InheritableThread
+from lesoon_cron.scheduler.xxl_job.metrics import SIZE_BUCKETS
+from lesoon_cron.scheduler.xxl_job.metrics import XxlJobMetrics
+from lesoon_cron.scheduler.xxl_job.parallel import ParallelExecutor
+from lesoon_cron.scheduler.xxl_job.param import TriggerParamDecoder
+from lesoon_cron.scheduler.xxl_job.spool import CallbackSpool
 from lesoon_cron.scheduler.xxl_job.thread.base import StoppableThread
+from lesoon_cron.scheduler.xxl_job.thread.timer import Timer
+from lesoon_cron.utils import get_local_ip
 
 
 class RegistryThread(threading.Thread):
+    """
+    执行器注册线程.
+    多进程部署(gunicorn)时各工作进程都启动注册线程, 通过文件锁选出一个进程进行心跳注册,
+    其余进程每个心跳周期尝试获取文件锁, 注册进程退出后由获取到锁的进程接替.
+    首次心跳在`first_beat_jitter`秒内随机延迟, 避免批量启动时同时注册, 且不阻塞启动流程.
+
+    Attributes:
+        app_name: 执行器名称
+        ip: 执行器地址(含协议), 为空时在注册线程中探测本机IP
+        port: 执行器端口
+        path: 执行器路由前缀
+
+    """
     beat_period: int = 30
+    # 首次心跳的最大随机延迟(秒)
+    first_beat_jitter: float = 2
+    lock_path: str = 'xxl-job-register.lock'
     logger: logging.Logger = logging.getLogger('xxl-job-register')
-    stop_flag: bool = False
+    stop_event: threading.Event = threading.Event()
 
-    def __init__(self, app_name: str, registry_address: str):
+    def __init__(self, app_name: str, ip: str, port: int, path: str):
         self.app_name = app_name
-        self.registry_address = registry_address
-        super().__init__(name='xxl-job-register')
+        self.ip = ip
+        self.port = port
+        self.path = path
+        self.registry_address = ''
+        self.lock = filelock.FileLock(self.lock_path, timeout=0)
+        super().__init__(name='xxl-job-register', daemon=True)
 
     @classmethod
     def stop(cls):
-        cls.stop_flag = True
+        cls.stop_event.set()
+
+    def _acquire(self) -> bool:
+        if self.lock.is_locked:
+            return True
+        try:
+            self.lock.acquire()
+        except filelock.Timeout:
+            self.logger.debug('XXL-JOB注册进程已存在....')
+            return False
+        self.logger.info('当前进程获取XXL-JOB执行器注册锁.')
+        return True
+
+    def beat(self):
+        self.logger.info('正在进行XXL-JOB执行器注册...')
+        res = XxlJobHelper.client.registry(register_key=self.app_name,
+                                           register_value=self.registry_address)
+        if not XxlJobHelper.client.is_success(res):
+            self.logger.error(f'注册XXL-JOB执行器失败:{res.text}')
+            return
+        XxlJobMetrics.mark('first_registry')
+        self.logger.info('进行XXL-JOB执行器注册成功...')
 
     def run(self) -> None:
-        while not self.stop_flag:
+        if self.stop_event.wait(random.uniform(0, self.first_beat_jitter)):
+            return
+        ip = self.ip or f'http://{get_local_ip()}'
+        self.registry_address = f'{ip}:{self.port}/{self.path}'
+        while not self.stop_event.is_set():
             try:
-                self.logger.info('正在进行XXL-JOB执行器注册...')
-                XxlJobHelper.client.registry(
-                    register_key=self.app_name,
-                    register_value=self.registry_address)
-                self.logger.info('进行XXL-JOB执行器注册成功...')
+                if self._acquire():
+                    self.beat()
             except Exception as e:
                 self.logger.error(f'注册XXL-JOB执行器发生异常:{e}')
-            finally:
-                time.sleep(self.beat_period)
+            self.stop_event.wait(self.beat_period)
+
+        if not self.lock.is_locked:
+            return
+        try:
+            self.logger.info('正在移除XXL-JOB已注册执行器...')
+            XxlJobHelper.client.remove_registry(
+                register_key=self.app_name,
+                register_value=self.registry_address)
+            self.logger.info('XXL-JOB已注册执行器移除成功...')
+        finally:
+            self.lock.release()
 
-        self.logger.info('正在移除XXL-JOB已注册执行器...')
-        XxlJobHelper.client.remove_registry(
-            register_key=self.app_name, register_value=self.registry_address)
-        self.logger.info('XXL-JOB已注册执行器移除成功...')
+
+class LogMaintenanceThread(threading.Thread):
+    """
+    任务日志清理线程.
+    定期删除超过保留天数的日志, 并将较早的日期目录打包归档.
+    多进程部署时通过文件锁保证同一时间只有一个进程在清理.
+    """
+    period: int = 3600
+    retention_days: int = 0
+    compress_after_days: int = 0
+    stop_event: threading.Event = threading.Event()
+    logger: logging.Logger = logging.getLogger('xxl-job-log-maintenance')
+
+    def __init__(self):
+        super().__init__(name='xxl-job-log-maintenance', daemon=True)
+
+    @classmethod
+    def stop(cls):
+        cls.stop_event.set()
+
+    def maintain(self):
+        lock_path = f'{XxlJobLogger.log_dir_path}.maintain.lock'
+        os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+        try:
+            with filelock.FileLock(lock_path, timeout=0):
+                XxlJobLogger.maintain(
+                    retention_days=self.retention_days,
+                    compress_after_days=self.compress_after_days)
+        except filelock.Timeout:
+            self.logger.debug('任务日志清理进程已存在....')
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                self.maintain()
+            except Exception as e:
+                self.logger.exception(e)
+            # 等待期间停止时立即退出
+            self.stop_event.wait(self.period)
 
 
 class CallbackThread(threading.Thread):
-    callback_queue: queue.Queue = queue.Queue()
+    callback_queue: 'queue.Queue[t.Tuple[int, CallbackParam]]' = queue.Queue()
     callback_retry_period: int = 30
-    stop_flag: bool = False
+    # 单批次最大回调参数数
+    batch_size: int = 100
+    # 批次等待凑满的最长时间(秒)
+    batch_linger: float = 0.05
+    # 单批次请求体最大字节数
+    batch_max_bytes: int = 512 * 1024
+    # 同时进行中的回调批次数
+    max_in_flight: int = 1
+    # 回调参数本地日志, 为空时回调参数只保存在内存中
+    spool: t.Optional[CallbackSpool] = None
+    # 等待回调参数的间隔(秒), 期间检查线程是否停止
+    poll_interval: float = 0.5
+    # 停止后回调剩余参数的最长时间(秒), 未完成的回调参数保留在本地日志中
+    flush_timeout: float = 10
+    stop_event: threading.Event = threading.Event()
     logger: logging.Logger = logging.getLogger('xxl-job-callback')
 
     def __init__(self):
-        super().__init__(name='xxl-job-callback')
+        super().__init__(name='xxl-job-callback', daemon=True)
+        # 超出上一批次容量, 留给下一批次的回调参数
+        self.carry: t.Optional[t.Tuple[int, CallbackParam]] = None
+        self.executor: t.Optional[ThreadPoolExecutor] = None
+        self.in_flight: t.Optional[threading.Semaphore] = None
+        if self.max_in_flight > 1:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_in_flight,
+                thread_name_prefix='xxl-job-callback-sender')
+            self.in_flight = threading.Semaphore(self.max_in_flight)
 
     @classmethod
     def stop(cls):
-        cls.stop_flag = True
+        cls.stop_event.set()
 
     @classmethod
     def push_callback(cls, param: CallbackParam):
-        cls.callback_queue.put(param)
+        spool_id = cls.spool.append(param) if cls.spool else 0
+        cls.callback_queue.put((spool_id, param))
         cls.logger.info(f'回调参数{param}已入队，等待回调.')
 
-    def _trigger_callback(self):
+    @classmethod
+    def recover(cls):
+        """重新回调本地日志中未确认的回调参数."""
+        if cls.spool:
+            for item in cls.spool.recover():
+                cls.callback_queue.put(item)
+
+    @staticmethod
+    def _param_size(param: CallbackParam) -> int:
+        """估算回调参数序列化后的字节数."""
+        return len(param.msg.encode('utf-8')) + 96
+
+    def _collect_batch(
+        self,
+        timeout: t.Optional[float] = None
+    ) -> t.List[t.Tuple[int, CallbackParam]]:
+        """
+        获取一个回调批次.
+        最多等待`timeout`秒获取首个回调参数, 之后在`batch_linger`时间内继续获取,
+        直到达到`batch_size`或`batch_max_bytes`.
+
+        Returns:
+            回调批次, 等待超时时返回空列表
+
+        """
+        if self.carry:
+            item, self.carry = self.carry, None
+        else:
+            try:
+                item = self.callback_queue.get(timeout=timeout)
+            except queue.Empty:
+                return []
+        batch, batch_bytes = [item], self._param_size(item[1])
+        deadline = time.monotonic() + self.batch_linger
+        while len(batch) < self.batch_size:
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    item = self.callback_queue.get(timeout=remaining)
+                else:
+                    item = self.callback_queue.get_nowait()
+            except queue.Empty:
+                break
+            item_bytes = self._param_size(item[1])
+            if batch_bytes + item_bytes > self.batch_max_bytes:
+                self.carry = item
+                break
+            batch.append(item)
+            batch_bytes += item_bytes
+        return batch
+
+    def _send(self, batch: t.List[t.Tuple[int, CallbackParam]]) -> bool:
+        params = [param for _, param in batch]
+        start = time.perf_counter()
+        success = False
         try:
-            callback_param = self.callback_queue.get()
-            if callback_param:
-                params = [callback_param]
-                while self.callback_queue.qsize():
-                    params.append(self.callback_queue.get_nowait())
-                XxlJobHelper.client.callback(params=params)
-                self.logger.info(f'{params}调度任务结果回调完成')
+            if self.spool:
+                self.spool.sync()
+            res = XxlJobHelper.client.callback(params=params)
+            success = XxlJobClient.is_success(res)
         except Exception as e:
             self.logger.error(e)
+        finally:
+            XxlJobMetrics.histogram('callback_seconds').observe(
+                time.perf_counter() - start)
+            XxlJobMetrics.histogram('callback_batch_size',
+                                    buckets=SIZE_BUCKETS).observe(len(batch))
+            if not success:
+                XxlJobMetrics.counter('callback_failures').inc()
+        if success:
+            if self.spool:
+                self.spool.ack([spool_id for spool_id, _ in batch])
+            self.logger.info(f'{params}调度任务结果回调完成')
+        return success
+
+    def _send_with_retry(self, batch: t.List[t.Tuple[int, CallbackParam]]):
+        """
+        回调失败以指数退避重试, 最长间隔为callback_retry_period.
+        调度中心不可用期间发送线程(max_in_flight为1时即回调线程)一直阻塞在重试中,
+        新的回调参数在回调队列(及本地日志)中积压, 调度中心恢复后按批次补发;
+        线程停止时立即结束等待, 未完成的回调参数保留在本地日志中.
+        """
+        retry_times = 0
+        while not self._send(batch):
+            if self.stop_event.is_set():
+                self.logger.error(f'回调线程已停止,{len(batch)}条回调参数未完成回调')
+                return
+            retry_times += 1
+            delay = min(2**(retry_times - 1), self.callback_retry_period)
+            self.logger.error(f'调度任务结果回调失败,{delay}s后重试')
+            self.stop_event.wait(delay)
+
+    def _send_async(self, batch: t.List[t.Tuple[int, CallbackParam]]):
+        try:
+            self._send_with_retry(batch)
+        finally:
+            self.in_flight.release()
+
+    def _trigger_callback(self, timeout: t.Optional[float] = None):
+        try:
+            if not (batch := self._collect_batch(timeout=timeout)):
+                return
+            if self.executor:
+                self.in_flight.acquire()
+                self.executor.submit(self._send_async, batch)
+            else:
+                self._send_with_retry(batch)
+        except Exception as e:
+            self.logger.error(e)
+
+    def flush(self):
+        """停止后在`flush_timeout`内回调队列中剩余的回调参数."""
+        deadline = time.monotonic() + self.flush_timeout
+        while (self.carry or
+               self.callback_queue.qsize()) and time.monotonic() < deadline:
+            self._trigger_callback(timeout=0)
+        if remaining := self.callback_queue.qsize() + bool(self.carry):
+            self.logger.error(f'回调线程已停止,{remaining}条回调参数未完成回调')
 
     def run(self) -> None:
-        while not self.stop_flag:
-            self._trigger_callback()
-        self._trigger_callback()
+        while not self.stop_event.is_set():
+            self._trigger_callback(timeout=self.poll_interval)
+        self.flush()
+        if self.executor:
+            self.executor.shutdown(wait=True)
+
 
+class ExecutorTimeout(BaseException):
+    """
+    调度执行超时时由定时线程抛入执行线程的异常.
+    继承BaseException, 避免被处理函数中的`except Exception`捕获.
+    """
 
-class JobThread(StoppableThread):
+
+class JobInterrupted(BaseException):
+    """
+    终止任务时抛入共享工作线程的异常.
+    继承BaseException, 避免被处理函数中的`except Exception`或EINTR重试逻辑捕获.
+    """
+
+
+def _deliver_pending():
+    """空函数, 调用时解释器检查并抛出已送达本线程的异步异常."""
+
+
+class _Deadline:
+    """
+    单次调度的超时计时状态.
+
+    Attributes:
+        thread_id: 执行处理函数的线程id
+        done: 处理函数是否已返回
+        expired: 定时线程是否已回调超时结果
+
+    """
+
+    def __init__(self, thread_id: int):
+        self.thread_id = thread_id
+        self.done = False
+        self.expired = False
+
+
+class BaseJob(abc.ABC):
+    """
+    job调度基类.
+    维护单个job的调度队列与执行流程, 由子类决定在哪个线程中执行.
+
+    Attributes:
+        job_id: 任务id
+        handle_func: 任务处理函数
+        running: 是否正在执行调度
+        log_id_set: 队列中等待执行的日志id
+        received_times: 日志id -> 调度进入队列的时间, 用于统计排队耗时
+        trigger_queue: 调度参数队列
+        idle_timer: 闲置清理定时器
+
+    """
     logger: logging.Logger = logging.getLogger('xxl-job-trigger')
+    # 闲置超过该时间(秒)的job被清理, 为0时不清理
+    idle_timeout: float = 90
 
     def __init__(self, job_id: int, handle_func: t.Callable):
         self.job_id = job_id
         self.handle_func = handle_func
         self.running = False
-        self.idle_times = 0
         self.log_id_set: t.Set[int] = set()
+        self.received_times: t.Dict[int, float] = {}
+        # 接收调度与工作线程并发修改received_times
+        self.received_lock = threading.Lock()
+        # 当前调度开始执行的时间
+        self.started_at = 0.0
         self.stop_flag = False
         self.stop_reason = ''
         self.trigger_queue: 'queue.Queue[TriggerParam]' = queue.Queue()
-        self.children: t.Set[InheritableThread] = set()
-        super().__init__(name='xxl-job-trigger')
+        self.idle_timer: t.Optional[Timer] = None
+        # 定时线程只对仍在执行的调度回调超时结果
+        self.deadline_lock = threading.Lock()
+
+    @abc.abstractmethod
+    def start(self):
+        """开始接收调度."""
+
+    @abc.abstractmethod
+    def terminate(self):
+        """中断正在执行的调度, 并清理余下调度队列."""
 
     def stop(self, reason: str = ''):
         self.stop_flag = True
@@ -114,137 +411,317 @@ class JobThread(StoppableThread):
 
     def push_trigger(self, trigger_param: TriggerParam) -> Response:
         if trigger_param.log_id in self.log_id_set:
+            XxlJobMetrics.counter('trigger_duplicates').inc()
             return Response(
                 code=ResponseCode.Failure,
                 msg=
                 f'jobId[{trigger_param.job_id}]:logId[{trigger_param.log_id}]重复调度'
             )
+        if rejected := TriggerAdmission.acquire(
+                queue_size=self.trigger_queue.qsize(),
+                oldest_wait=self.oldest_wait()):
+            reason, msg = rejected
+            XxlJobMetrics.counter('trigger_rejected', reason=reason).inc()
+            XxlJobGlobals.release_log_id(log_id=trigger_param.log_id)
+            return Response(
+                code=ResponseCode.Failure,
+                msg=f'jobId[{trigger_param.job_id}]:logId[{trigger_param.log_id}]'
+                f'拒绝调度, {msg}')
         else:
+            if timer := self.idle_timer:
+                timer.cancel()
+            with self.received_lock:
+                self.received_times[trigger_param.log_id] = time.monotonic()
             self.trigger_queue.put(trigger_param)
             self.log_id_set.add(trigger_param.log_id)
+            XxlJobMetrics.counter('trigger_total').inc()
+            if self.stop_flag:
+                # job在入队期间被清理, 回调失败结果而不是丢失调度
+                self.clear_queue()
             self.logger.debug(f'调度任务：[{trigger_param}] 已进入队列.')
             return Response()
 
+    def oldest_wait(self) -> float:
+        """队列中最早的调度已等待的时间(秒)."""
+        with self.received_lock:
+            received_at = next(iter(self.received_times.values()), None)
+        return 0.0 if received_at is None else time.monotonic() - received_at
+
+    def schedule_idle(self):
+        """调度执行完成后开始闲置计时, 期间收到新调度时取消."""
+        if not self.idle_timeout or self.stop_flag:
+            return
+        if timer := self.idle_timer:
+            timer.cancel()
+        self.idle_timer = XxlJobGlobals.get_timer_thread().schedule(
+            self.idle_timeout, self._on_idle)
+
+    def _on_idle(self):
+        """由定时线程调用, 停止线程可能阻塞, 交由定时线程池执行清理."""
+        XxlJobGlobals.get_timer_executor().submit(self.evict_idle)
+
+    def evict_idle(self):
+        if self.stop_flag or self.is_running_or_has_queue:
+            return
+        if XxlJobGlobals.get_job_thread(self.job_id) is self:
+            XxlJobGlobals.remove_job_thread(job_id=self.job_id,
+                                            reason='闲置线程自动清理')
+            XxlJobMetrics.counter('job_evicted').inc()
+
     @staticmethod
     def _extract_func_param(params) -> t.Tuple[tuple, dict]:
-        func_args, func_kwargs = (), {}
-        if params:
-            params = ast.literal_eval(params)
-            if isinstance(params, dict):
-                func_kwargs = params
-            elif isinstance(params, t.Sequence):
-                func_args = tuple(params)  # type: ignore
+        return TriggerParamDecoder.decode(params)
+
+    def prepare(self, tp: TriggerParam) -> t.Tuple[tuple, dict]:
+        """
+        调度执行前准备: 解析调度参数并设置xxl-job上下文.
+        Args:
+            tp: 调度参数
+
+        Returns:
+            处理函数的位置参数与命名参数
+
+        """
+        self.running = True
+        self.log_id_set.discard(tp.log_id)
+        self.started_at = time.monotonic()
+        with self.received_lock:
+            received_at = self.received_times.pop(tp.log_id, self.started_at)
+        XxlJobMetrics.histogram('trigger_wait_seconds').observe(
+            self.started_at - received_at)
+        args, kwargs = self._extract_func_param(tp.executor_params)
+        log_file = XxlJobLogger.get_log_file_path(log_time=tp.log_date_time,
+                                                  log_id=tp.log_id)
+        # 新建线程xxl-job上下文在回调以及日志中使用
+        xxl_job_context = XxlJobContext(job_id=tp.job_id,
+                                        job_args=args,
+                                        job_kwargs=kwargs,
+                                        job_file_path=log_file,
+                                        broadcast_index=tp.broadcast_index,
+                                        broadcast_total=tp.broadcast_total)
+        XxlJobContext.set(xxl_job_context)
+        XxlJobHelper.log(
+            f'<br>----------- xxl-job job execute start -----------<br>----------- Args:{args} Kwargs:{kwargs}'
+        )
+        return args, kwargs
+
+    def on_timeout(self, tp: TriggerParam):
+        XxlJobHelper.log('<br>----------- xxl-job job execute timeout')
+        XxlJobHelper.handle_timeout(f'job[{tp.job_id}]:log[{tp.log_id}]调度执行超时')
+
+    def on_finish(self):
+        XxlJobHelper.log(
+            f'<br>----------- xxl-job job execute end(finish) -----------'
+            f'<br>----------- Result: code={XxlJobContext.get().response_code}, msg={XxlJobContext.get().response_msg}'
+        )
+
+    def on_interrupt(self, tp: TriggerParam):
+        XxlJobHelper.handle_failure(f'job[{tp.job_id}]:log[{tp.log_id}]调度被终止')
+
+    def on_error(self, e: BaseException):
+        self.logger.exception(e)
+        XxlJobHelper.handle_failure('任务执行异常')
+        if self.stop_flag:
+            XxlJobHelper.log(
+                f'<br>----------- JobThread toStop, stop reason:{self.stop_reason}'
+            )
+            self.logger.info(
+                f'因为{self.stop_reason},job[{self.job_id}]线程停止工作...')
+        XxlJobHelper.log(
+            f'<br>----------- JobThread Exception: + {traceback.format_exc()} + '
+            f'<br>----------- xxl-job job execute end(error) -----------')
+
+    def push_result(self, tp: TriggerParam):
+        """推送调度结果给回调线程."""
+        self.running = False
+        TriggerAdmission.release()
+        code, msg = ResponseCode.Failure, '任务执行异常'
+        if context := XxlJobContext.get():
+            ParallelExecutor.release(context)
+            code, msg = context.response_code, context.response_msg
+        if self.started_at:
+            XxlJobMetrics.histogram('job_duration_seconds').observe(
+                time.monotonic() - self.started_at)
+            self.started_at = 0.0
+        XxlJobMetrics.counter('job_results', code=code.name).inc()
+        CallbackThread.push_callback(
+            CallbackParam(log_id=tp.log_id,
+                          log_date_time=tp.log_date_time,
+                          code=code,
+                          msg=msg))
+        self.schedule_idle()
+
+    def release_slot(self):
+        """
+        处理函数超时未返回时释放job的串行执行权, 余下调度不再等待该处理函数.
+        由子类决定由哪个线程继续执行, 默认不处理.
+        """
+
+    def _on_deadline(self, tp: TriggerParam, deadline: _Deadline):
+        """
+        超时时由定时线程在处理函数的上下文中调用, 只标记超时并中断处理函数.
+        回调超时结果等耗时操作交由定时线程池执行, 不阻塞其他定时任务.
+        """
+        with self.deadline_lock:
+            if deadline.done:
+                return
+            deadline.expired = True
+            StoppableThread._async_raise(deadline.thread_id, ExecutorTimeout)
+        XxlJobGlobals.get_timer_executor().submit(
+            contextvars.copy_context().run, self._report_timeout, tp)
+
+    def _report_timeout(self, tp: TriggerParam):
+        """回调超时结果并释放串行执行权, 不等待处理函数返回."""
+        self.logger.info(f'job[{tp.job_id}]:log[{tp.log_id}]调度执行超时')
+        try:
+            self.on_timeout(tp)
+            XxlJobLogger.flush()
+        finally:
+            self.push_result(tp)
+            self.release_slot()
+
+    def run_with_deadline(self, tp: TriggerParam, args: tuple, kwargs: dict):
+        """
+        在当前线程中执行处理函数, 由定时线程计时.
+        超时时定时线程向当前线程抛出`ExecutorTimeout`, 并由定时线程池立即回调超时结果、释放串行执行权.
+        处理函数阻塞在C层调用(如sleep)时超时异常在调用返回后才生效, 此后处理函数的结果被丢弃.
+        Raises:
+            ExecutorTimeout: 超时结果已由定时线程池回调
+
+        """
+        deadline = _Deadline(thread_id=threading.get_ident())
+        timer: t.Optional[Timer] = None
+        try:
+            context = contextvars.copy_context()
+            timer = XxlJobGlobals.get_timer_thread().schedule(
+                tp.executor_timeout, context.run, self._on_deadline, tp,
+                deadline)
+            self.handle_func(*args, **kwargs)
+        finally:
+            if timer:
+                timer.cancel()
+            with self.deadline_lock:
+                deadline.done = True
+            try:
+                # 定时线程已抛出的超时异常在此送达, 不会泄漏到回调等后续流程
+                _deliver_pending()
+            except ExecutorTimeout:
+                pass
+            if deadline.expired:
+                # 丢弃处理函数迟到的结果(包括异常)
+                raise ExecutorTimeout
+
+    def call_handler(self, tp: TriggerParam, args: tuple, kwargs: dict):
+        """
+        调用处理函数.
+            超时任务：由定时线程计时, 超时时中断处理函数.
+            普通任务：直接运行对应处理函数.
+        """
+        if tp.executor_timeout:
+            self.run_with_deadline(tp, args, kwargs)
+        else:
+            self.handle_func(*args, **kwargs)
+
+    def execute(self, tp: TriggerParam):
+        """
+        执行单次调度.
+        1. 处理调度参数, 调用处理函数, 详见`BaseJob.call_handler`.
+        2. 调度完成后推送回调参数给回调线程.
+
+        Args:
+            tp: 调度参数
+
+        """
+        # 工作线程可能被多个job复用, 先清理上一次调度的上下文
+        XxlJobContext.set(None)
+        expired = False
+        try:
+            args, kwargs = self.prepare(tp)
+            try:
+                self.call_handler(tp, args, kwargs)
+            except ExecutorTimeout:
+                # 超时结果已由定时线程池回调
+                expired = True
+                self.logger.info(
+                    f'job[{tp.job_id}]:log[{tp.log_id}]超时的处理函数已退出, 丢弃执行结果')
             else:
-                func_args = (params,)  # type: ignore
-        return func_args, func_kwargs
+                self.on_finish()
+        except (JobInterrupted, SystemExit):
+            # 终止任务时向执行线程抛出JobInterrupted或SystemExit
+            self.on_interrupt(tp)
+        except Exception as e:
+            self.on_error(e)
+        finally:
+            # 回调前确保任务日志已全部落盘
+            XxlJobLogger.flush()
+            if not expired:
+                self.push_result(tp)
+
+    def discard(self, tp: TriggerParam):
+        """丢弃未执行的调度, 并回调失败结果."""
+        self.log_id_set.discard(tp.log_id)
+        with self.received_lock:
+            self.received_times.pop(tp.log_id, None)
+        TriggerAdmission.release()
+        XxlJobMetrics.counter('trigger_discarded').inc()
+        CallbackThread.push_callback(
+            CallbackParam(log_id=tp.log_id,
+                          log_date_time=tp.log_date_time,
+                          code=ResponseCode.Failure,
+                          msg=f'job[{self.job_id}]线程已停止工作, 清理任务队列'))
+
+    def clear_queue(self):
+        """清理余下调度队列, 并回调失败结果."""
+        while self.trigger_queue.qsize():
+            try:
+                tp = self.trigger_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(tp)
+
+
+class JobThread(StoppableThread, BaseJob):
+    """独占线程执行的job, 每个job_id对应一个线程."""
+
+    def __init__(self, job_id: int, handle_func: t.Callable):
+        BaseJob.__init__(self, job_id=job_id, handle_func=handle_func)
+        StoppableThread.__init__(self, name='xxl-job-trigger')
+
+    def release_slot(self):
+        """由新的job线程接管调度队列, 当前线程在超时的处理函数返回后退出."""
+        if self.stop_flag:
+            return
+        successor = JobThread(job_id=self.job_id, handle_func=self.handle_func)
+        self.stop(reason='调度执行超时, 由新的job线程接管')
+        with self.received_lock:
+            successor.trigger_queue, self.trigger_queue = (self.trigger_queue,
+                                                           queue.Queue())
+            successor.log_id_set, self.log_id_set = self.log_id_set, set()
+            successor.received_times, self.received_times = (
+                self.received_times, {})
+        if not XxlJobGlobals.replace_job_thread(old=self, new=successor):
+            # 接管前job已被清理
+            successor.clear_queue()
 
     def run(self) -> None:
         """
             job线程入口.
             用于执行调度任务，包含以下操作:
             1. 不间断的从队列中获取调度参数.
-            2. 处理调度参数.
-                超时任务：另起子线程，超时终止线程.
-                普通任务：直接运行对应处理函数.
-            3. 调度完成后推送回调参数给回调线程.
-            4. 如果当前线程被终止，则清理队列中剩余任务.
+            2. 执行调度参数, 详见`BaseJob.execute`.
+            3. 如果当前线程被终止，则清理队列中剩余任务.
+            闲置清理由定时线程负责, 详见`BaseJob.schedule_idle`.
 
             """
-        while not self.stop_flag:
-            self.running = False
-            self.idle_times += 1
-            tp = None
-            error_msg = ''
-            try:
+        try:
+            while not self.stop_flag:
                 try:
                     tp = self.trigger_queue.get(timeout=3)
                 except queue.Empty:
                     continue
-                if tp:
-                    self.running = True
-                    self.idle_times = 0
-                    self.log_id_set.remove(tp.log_id)
-                    args, kwargs = self._extract_func_param(tp.executor_params)
-                    log_file = XxlJobLogger.get_log_file_path(
-                        log_time=tp.log_date_time, log_id=tp.log_id)
-                    # 新建线程xxl-job上下文在回调以及日志中使用
-                    xxl_job_context = XxlJobContext(
-                        job_id=tp.job_id,
-                        job_args=args,
-                        job_kwargs=kwargs,
-                        job_file_path=log_file,
-                        broadcast_index=tp.broadcast_index,
-                        broadcast_total=tp.broadcast_total)
-                    XxlJobContext.set(xxl_job_context)
-                    XxlJobHelper.log(
-                        f'<br>----------- xxl-job job execute start -----------<br>----------- Args:{args} Kwargs:{kwargs}'
-                    )
-                    if tp.executor_timeout:
-                        # 超时任务另起子线程做处理
-                        f: t.Optional[InheritableThread] = None
-                        try:
-                            f = InheritableThread(target=self.handle_func,
-                                                  args=args,
-                                                  kwargs=kwargs)
-                            self.children.add(f)
-                            f.start()
-                            f.join(timeout=tp.executor_timeout)
-                            if f.is_alive():
-                                raise TimeoutError
-                        except TimeoutError as e:
-                            XxlJobHelper.log(
-                                '<br>----------- xxl-job job execute timeout')
-                            self.logger.info(e)
-                            XxlJobHelper.handle_timeout(
-                                f'job[{tp.job_id}]:log[{tp.log_id}]调度执行超时')
-                        finally:
-                            f.terminate()
-                            self.children.remove(f)
-                    else:
-                        # 直接调用
-                        self.handle_func(*args, **kwargs)
-
-                    XxlJobHelper.log(
-                        f'<br>----------- xxl-job job execute end(finish) -----------'
-                        f'<br>----------- Result: code={XxlJobContext.get().response_code}, msg={XxlJobContext.get().response_msg}'
-                    )
-                elif self.idle_times > 30 and self.trigger_queue.empty():
-                    # 超过30次轮询没有调度，则删除job线程
-                    XxlJobGlobals.remove_job_thread(job_id=self.job_id,
-                                                    reason='闲置线程自动清理')
-            except InterruptedError:
-                if tp:
-                    XxlJobHelper.handle_failure(
-                        f'job[{tp.job_id}]:log[{tp.log_id}]调度被终止')
-            except Exception as e:
-                self.logger.exception(e)
-                if tp:
-                    XxlJobHelper.handle_failure('任务执行异常')
-                if self.stop_flag:
-                    XxlJobHelper.log(
-                        f'<br>----------- JobThread toStop, stop reason:{self.stop_reason}'
-                    )
-                    self.logger.info(
-                        f'因为{self.stop_reason},job[{self.job_id}]线程停止工作...')
-                XxlJobHelper.log(
-                    f'<br>----------- JobThread Exception: + {traceback.format_exc()} + '
-                    f'<br>----------- xxl-job job execute end(error) -----------'
-                )
-            finally:
-                if tp:
-                    CallbackThread.push_callback(
-                        CallbackParam(log_id=tp.log_id,
-                                      log_date_time=tp.log_date_time,
-                                      code=XxlJobContext.get().response_code,
-                                      msg=XxlJobContext.get().response_msg))
-
-        # 工作线程停止时，清理余下调度队列
-        while self.trigger_queue.qsize():
-            if tp := self.trigger_queue.get_nowait():
-                CallbackThread.push_callback(
-                    CallbackParam(log_id=tp.log_id,
-                                  log_date_time=tp.log_date_time,
-                                  code=ResponseCode.Failure,
-                                  msg=f'job[{self.job_id}]线程已停止工作, 清理任务队列'))
+                self.execute(tp)
+        finally:
+            # 工作线程停止(包括被终止)时，清理余下调度队列
+            self.clear_queue()
 
         self.logger.info(f'xxl-job job线程[{threading.current_thread()}]停止工作')
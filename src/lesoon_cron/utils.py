@@ -1,4 +1,6 @@
+import inspect
 import socket
+from functools import lru_cache
 from functools import wraps
 
 from flask.ctx import AppContext
@@ -10,10 +12,21 @@ def context_inject(context: AppContext):
     _context = context
 
     def wrapper(fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @wraps(fn)
+            async def async_decorator(*args, **kwargs):
+                # 同一事件循环中的协程并发运行, 同样使用独立的应用上下文
+                with _context.app.app_context():
+                    set_current_user(TokenUser.new())
+                    return await fn(*args, **kwargs)
+
+            return async_decorator
 
         @wraps(fn)
         def decorator(*args, **kwargs):
-            with _context:
+            # 处理函数可能被多个线程同时调用, 每次调用使用独立的应用上下文
+            with _context.app.app_context():
                 # 注入线程用户防止model写入报错
                 set_current_user(TokenUser.new())
                 ret = fn(*args, **kwargs)
@@ -25,7 +38,9 @@ def context_inject(context: AppContext):
     return wrapper
 
 
-def get_local_ip():
+@lru_cache(maxsize=None)
+def get_local_ip() -> str:
+    """探测本机IP, 结果在进程内缓存."""
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     try:
         # Use Google Public DNS server to determine own IP
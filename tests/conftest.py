@@ -1,9 +1,25 @@
 """Defines fixtures available to all tests."""
+import collections
 import logging
+import queue
+import threading
+import time
 
 import pytest
 from lesoon_common import LesoonFlask
 
+from lesoon_cron.scheduler.xxl_job.admission import TriggerAdmission
+from lesoon_cron.scheduler.xxl_job.code import XxlJobStrategyCode
+from lesoon_cron.scheduler.xxl_job.dataclass import CallbackParam
+from lesoon_cron.scheduler.xxl_job.dataclass import TriggerParam
+from lesoon_cron.scheduler.xxl_job.globals import XxlJobGlobals
+from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+from lesoon_cron.scheduler.xxl_job.parallel import ParallelExecutor
+from lesoon_cron.scheduler.xxl_job.param import TriggerParamDecoder
+from lesoon_cron.scheduler.xxl_job.thread.work import CallbackThread
+from lesoon_cron.scheduler.xxl_job.thread.work import LogMaintenanceThread
+from lesoon_cron.scheduler.xxl_job.thread.work import RegistryThread
+
 
 class Config:
     TESTING = True
@@ -40,3 +56,77 @@ def db(app):
 @pytest.fixture
 def test_client(app):
     return app.test_client()
+
+
+@pytest.fixture
+def xxl_job(tmp_path, monkeypatch):
+    """Isolate xxl-job executor globals and write job logs under tmp_path."""
+    monkeypatch.setattr(XxlJobLogger, 'log_dir_path', str(tmp_path / 'handler'))
+    monkeypatch.setattr(XxlJobLogger, '_log_file_dirs', set())
+    monkeypatch.setattr(XxlJobLogger, '_line_indexes',
+                        collections.OrderedDict())
+    monkeypatch.setattr(XxlJobGlobals, '_register_job_threads', {})
+    monkeypatch.setattr(XxlJobGlobals, '_register_handlers',
+                        dict(XxlJobGlobals._register_handlers))
+    monkeypatch.setattr(XxlJobGlobals, '_handler_methods',
+                        dict(XxlJobGlobals._handler_methods))
+    monkeypatch.setattr(XxlJobGlobals, '_handler_instances',
+                        dict(XxlJobGlobals._handler_instances))
+    monkeypatch.setattr(XxlJobGlobals, '_dispatch_table',
+                        dict(XxlJobGlobals._dispatch_table))
+    monkeypatch.setattr(XxlJobGlobals, '_app', None)
+    monkeypatch.setattr(XxlJobGlobals, '_job_scheduling', {})
+    for attr in ('_job_worker_pool', '_process_worker_pool',
+                 '_event_loop_thread', '_timer_thread', '_timer_executor',
+                 '_job_router', '_log_id_store'):
+        monkeypatch.setattr(XxlJobGlobals, attr, None)
+    monkeypatch.setattr(XxlJobGlobals, '_draining', False)
+    monkeypatch.setattr(CallbackThread, 'callback_queue', queue.Queue())
+    monkeypatch.setattr(CallbackThread, 'stop_event', threading.Event())
+    monkeypatch.setattr(RegistryThread, 'stop_event', threading.Event())
+    monkeypatch.setattr(LogMaintenanceThread, 'stop_event', threading.Event())
+    monkeypatch.setattr(TriggerAdmission, '_in_flight', 0)
+    monkeypatch.setattr(TriggerParamDecoder, '_cache',
+                        collections.OrderedDict())
+    monkeypatch.setattr(ParallelExecutor, '_executors', {})
+    monkeypatch.setattr(ParallelExecutor, '_shared', {})
+
+    yield XxlJobGlobals
+
+    jobs = XxlJobGlobals.remove_all_job_threads(reason='测试结束')
+    # 等待被终止的调度推送回调参数, 避免写入下一个测试的回调队列
+    XxlJobGlobals.wait_jobs_idle(timeout=1, jobs=jobs)
+    XxlJobGlobals.shutdown()
+
+
+@pytest.fixture
+def make_trigger():
+    """Build trigger params with serial block strategy and no timeout."""
+
+    def make(job_id: int, log_id: int, **kwargs) -> TriggerParam:
+        fields = dict(
+            job_id=job_id,
+            executor_handler='DemoHandler.run',
+            executor_params='',
+            executor_block_strategy=XxlJobStrategyCode.SerialExecution,
+            executor_timeout=0,
+            log_id=log_id,
+            log_date_time=int(time.time() * 1000),
+            glue_type='',
+            glue_source='',
+            broadcast_index=0,
+            broadcast_total=1)
+        fields.update(kwargs)
+        return TriggerParam(**fields)
+
+    return make
+
+
+@pytest.fixture
+def next_callback(xxl_job):
+    """Take the next job result pushed to the callback queue."""
+
+    def get(timeout: float = 5) -> CallbackParam:
+        return CallbackThread.callback_queue.get(timeout=timeout)[1]
+
+    return get
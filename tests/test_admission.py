@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.admission import TriggerAdmission
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+
+
+@pytest.fixture
+def blocked_job(xxl_job, make_trigger):
+    """首个调度阻塞至测试结束, 后续调度留在队列中."""
+    started, release = threading.Event(), threading.Event()
+
+    def handle():
+        started.set()
+        # 分段等待, 终止信号可以及时送达
+        while not release.wait(0.05):
+            pass
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=0))
+    assert started.wait(timeout=5)
+    yield jt
+    release.set()
+
+
+def test_queue_limit(blocked_job, make_trigger, monkeypatch):
+    monkeypatch.setattr(TriggerAdmission, 'queue_limit', 2)
+    results = [
+        blocked_job.push_trigger(make_trigger(job_id=1, log_id=log_id))
+        for log_id in (1, 2, 3)
+    ]
+
+    assert [res.code for res in results] == [
+        ResponseCode.Success, ResponseCode.Success, ResponseCode.Failure
+    ]
+    assert '任务队列已满' in results[-1].msg
+    assert TriggerAdmission.in_flight() == 3
+
+
+def test_max_in_flight(blocked_job, make_trigger, monkeypatch):
+    monkeypatch.setattr(TriggerAdmission, 'max_in_flight', 2)
+    second = blocked_job.push_trigger(make_trigger(job_id=1, log_id=1))
+    third = blocked_job.push_trigger(make_trigger(job_id=1, log_id=2))
+
+    assert second.code == ResponseCode.Success
+    assert third.code == ResponseCode.Failure
+    assert '调度数已达上限' in third.msg
+    assert TriggerAdmission.in_flight() == 2
+
+
+def test_shed_queue_wait(blocked_job, make_trigger, monkeypatch):
+    monkeypatch.setattr(TriggerAdmission, 'shed_queue_wait', 0.1)
+    blocked_job.push_trigger(make_trigger(job_id=1, log_id=1))
+    time.sleep(0.2)
+
+    res = blocked_job.push_trigger(make_trigger(job_id=1, log_id=2))
+    assert res.code == ResponseCode.Failure
+    assert '等待时间过长' in res.msg
+
+
+def test_in_flight_released_after_execution(xxl_job, make_trigger,
+                                            next_callback, monkeypatch):
+    monkeypatch.setattr(TriggerAdmission, 'max_in_flight', 1)
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=lambda: None)
+    for log_id in range(3):
+        res = jt.push_trigger(make_trigger(job_id=1, log_id=log_id))
+        assert res.code == ResponseCode.Success
+        assert next_callback().code == ResponseCode.Success
+    assert TriggerAdmission.in_flight() == 0
+
+
+def test_in_flight_released_when_queue_cleared(blocked_job, make_trigger,
+                                               next_callback, xxl_job):
+    for log_id in (1, 2):
+        blocked_job.push_trigger(make_trigger(job_id=1, log_id=log_id))
+    assert TriggerAdmission.in_flight() == 3
+
+    xxl_job.remove_job_thread(job_id=1, reason='测试清理')
+    for _ in range(3):
+        next_callback()
+    assert TriggerAdmission.in_flight() == 0
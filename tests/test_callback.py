@@ -0,0 +1,96 @@
+import threading
+import time
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.dataclass import CallbackParam
+from lesoon_cron.scheduler.xxl_job.thread.work import CallbackThread
+
+
+def push(log_id: int, msg: str = ''):
+    CallbackThread.callback_queue.put((0,
+                                       CallbackParam(log_id=log_id,
+                                                     log_date_time=0,
+                                                     code=ResponseCode.Success,
+                                                     msg=msg)))
+
+
+def log_ids(batch) -> list:
+    return [param.log_id for _, param in batch]
+
+
+def test_batch_limited_by_size(xxl_job, monkeypatch):
+    monkeypatch.setattr(CallbackThread, 'batch_size', 3)
+    for log_id in range(1, 6):
+        push(log_id)
+    thread = CallbackThread()
+
+    assert log_ids(thread._collect_batch(timeout=0)) == [1, 2, 3]
+    assert log_ids(thread._collect_batch(timeout=0)) == [4, 5]
+    assert thread._collect_batch(timeout=0.05) == []
+
+
+def test_batch_waits_for_linger(xxl_job, monkeypatch):
+    monkeypatch.setattr(CallbackThread, 'batch_linger', 0.3)
+    thread = CallbackThread()
+    push(1)
+    threading.Timer(0.1, push, args=(2,)).start()
+
+    # 首个回调参数之后在linger时间内到达的回调参数合入同一批次
+    start = time.monotonic()
+    assert log_ids(thread._collect_batch(timeout=0)) == [1, 2]
+    assert 0.25 < time.monotonic() - start < 1
+
+
+def test_batch_not_delayed_past_linger(xxl_job, monkeypatch):
+    monkeypatch.setattr(CallbackThread, 'batch_linger', 0.1)
+    thread = CallbackThread()
+    push(1)
+    late = threading.Timer(0.5, push, args=(2,))
+    late.start()
+
+    start = time.monotonic()
+    assert log_ids(thread._collect_batch(timeout=0)) == [1]
+    assert time.monotonic() - start < 0.4
+    late.join()
+    assert log_ids(thread._collect_batch(timeout=1)) == [2]
+
+
+def test_batch_limited_by_bytes(xxl_job, monkeypatch):
+    monkeypatch.setattr(CallbackThread, 'batch_linger', 0)
+    thread = CallbackThread()
+    msg = 'x' * 1000
+    size = thread._param_size(
+        CallbackParam(log_id=0,
+                      log_date_time=0,
+                      code=ResponseCode.Success,
+                      msg=msg))
+    monkeypatch.setattr(CallbackThread, 'batch_max_bytes', size * 2)
+    for log_id in range(1, 4):
+        push(log_id, msg=msg)
+
+    assert log_ids(thread._collect_batch(timeout=0)) == [1, 2]
+    # 超出容量的回调参数留给下一批次
+    assert log_ids([thread.carry]) == [3]
+    assert log_ids(thread._collect_batch(timeout=0)) == [3]
+    assert thread.carry is None
+
+
+def test_retry_backoff_ends_on_stop(xxl_job, monkeypatch):
+    thread = CallbackThread()
+    attempts = []
+
+    def fail(batch):
+        attempts.append(time.monotonic())
+        return False
+
+    monkeypatch.setattr(thread, '_send', fail)
+    push(1)
+    batch = thread._collect_batch(timeout=0)
+    threading.Timer(1.5, CallbackThread.stop).start()
+
+    start = time.monotonic()
+    thread._send_with_retry(batch)
+    # 以1s、2s...退避重试, 停止时立即结束等待
+    assert 1.4 < time.monotonic() - start < 2
+    assert len(attempts) == 3
+    assert 0.9 < attempts[1] - attempts[0] < 1.3
@@ -0,0 +1,160 @@
+import gzip
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.client import XxlJobClient
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.dataclass import CallbackParam
+
+
+class AdminServer(ThreadingHTTPServer):
+    """记录收到的请求并返回固定状态码的调度中心."""
+
+    def __init__(self, status: int = 200):
+        super().__init__(('127.0.0.1', 0), AdminRequestHandler)
+        self.status = status
+        self.requests = []
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class AdminRequestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        self.server.requests.append((self.path, json.loads(body)))
+        content = json.dumps({'code': self.server.status, 'msg': None})
+        self.send_response(self.server.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content.encode('utf-8'))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def admin_server():
+    servers = []
+
+    def start(status: int = 200) -> AdminServer:
+        server = AdminServer(status=status)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def closed_url():
+    """没有服务监听的地址, 连接被拒绝."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}'
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(*urls: str, **kwargs) -> XxlJobClient:
+        client = XxlJobClient(','.join(urls), **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.session.close()
+
+
+def callback_params():
+    return [CallbackParam(log_id=1, log_date_time=1650000000000)]
+
+
+def test_callback_fails_over_to_next_node(admin_server, closed_url,
+                                          make_client):
+    server = admin_server()
+    client = make_client(closed_url, server.url, max_retries=0)
+    dead = client.nodes[0]
+
+    res = client.callback(callback_params())
+    assert client.is_success(res)
+    assert [path for path, _ in server.requests] == ['/api/callback']
+    assert dead.failures == 1
+    assert client.node_status()[server.url]['available']
+
+
+def test_circuit_opens_after_failures(admin_server, closed_url, make_client):
+    server = admin_server()
+    client = make_client(closed_url,
+                         server.url,
+                         max_retries=0,
+                         failure_threshold=1)
+    dead = client.nodes[0]
+    client.callback(callback_params())
+    assert not client.node_status()[dead.url]['available']
+
+    # 熔断期间不再尝试失败节点
+    client.callback(callback_params())
+    assert dead.failures == 1
+    assert len(server.requests) == 2
+
+
+def test_server_error_fails_over(admin_server, make_client):
+    broken = admin_server(status=500)
+    server = admin_server()
+    client = make_client(broken.url, server.url)
+    # 优先选择耗时较短的故障节点
+    client.nodes[1].latency = 1.0
+
+    res = client.callback(callback_params())
+    assert client.is_success(res)
+    assert len(broken.requests) == len(server.requests) == 1
+
+
+def test_registry_sent_to_all_nodes(admin_server, closed_url, make_client):
+    first, second = admin_server(), admin_server()
+    client = make_client(first.url, closed_url, second.url)
+
+    res = client.registry(register_key='http://127.0.0.1:9999',
+                          register_value='demo')
+    assert client.is_success(res)
+    for server in (first, second):
+        assert server.requests == [('/api/registry', {
+            'registryGroup': 'EXECUTOR',
+            'registryKey': 'http://127.0.0.1:9999',
+            'registryValue': 'demo'
+        })]
+
+
+def test_callback_compressed(admin_server, make_client):
+    server = admin_server()
+    client = make_client(server.url, gzip_min_bytes=1)
+
+    assert client.is_success(client.callback(callback_params()))
+    assert server.requests[0][1][0]['logId'] == 1
+
+
+def test_no_admin_address(make_client):
+    client = make_client('')
+
+    res = client.callback(callback_params())
+    assert res.status_code == 503
+    assert not client.is_success(res)
+    assert res.json()['code'] == ResponseCode.Failure.value
+    assert not client.is_success(client.registry('http://127.0.0.1:9999', 'a'))
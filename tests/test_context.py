@@ -0,0 +1,53 @@
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
+from lesoon_cron.scheduler.xxl_job.helper import XxlJobHelper
+from lesoon_cron.scheduler.xxl_job.thread import InheritableThread
+
+
+def make_context(job_id: int) -> XxlJobContext:
+    return XxlJobContext(job_id=job_id,
+                         job_args=(),
+                         job_kwargs={},
+                         job_file_path='',
+                         broadcast_index=0,
+                         broadcast_total=1)
+
+
+def test_child_thread_inherits_context():
+    seen = []
+
+    def child():
+        seen.append(XxlJobContext.get().job_id)
+        # 子线程的修改不影响父线程
+        XxlJobContext.set(make_context(job_id=2))
+        seen.append(XxlJobContext.get().job_id)
+
+    XxlJobContext.set(make_context(job_id=1))
+    try:
+        thread = InheritableThread(target=child)
+        thread.start()
+        thread.join()
+        assert seen == [1, 2]
+        assert XxlJobContext.get().job_id == 1
+    finally:
+        XxlJobContext.set(None)
+
+
+def test_parallel_workers_inherit_job_context(xxl_job, make_trigger,
+                                              next_callback):
+    seen = []
+
+    def handle():
+        seen.extend(
+            XxlJobHelper.parallel_map(lambda _: XxlJobContext.get().job_id,
+                                      range(4),
+                                      max_workers=2))
+        seen.append(
+            XxlJobHelper.submit(XxlJobContext.get).result(
+                timeout=5) is XxlJobContext.get())
+
+    jt = xxl_job.register_job_thread(job_id=7, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=7, log_id=1))
+
+    assert next_callback().code == ResponseCode.Success
+    assert seen == [7, 7, 7, 7, True]
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
+from lesoon_cron.scheduler.xxl_job.thread.coroutine import AsyncJob
+
+
+def wait_consumed(jt: AsyncJob, timeout: float = 5):
+    """等待消费调度队列的协程任务结束."""
+    deadline = time.monotonic() + timeout
+    while jt.task and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert jt.task is None
+
+
+def test_timeout_by_wait_for(xxl_job, make_trigger, next_callback):
+
+    async def handle(delay):
+        await asyncio.sleep(delay)
+
+    slow = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    fast = xxl_job.register_job_thread(job_id=2, handle_func=handle)
+    assert isinstance(slow, AsyncJob)
+    start = time.monotonic()
+    slow.push_trigger(
+        make_trigger(job_id=1,
+                     log_id=1,
+                     executor_params='5',
+                     executor_timeout=1))
+    fast.push_trigger(make_trigger(job_id=2, log_id=2, executor_params='0.1'))
+
+    # 超时的协程不阻塞事件循环中的其他job
+    finished = next_callback()
+    assert (finished.log_id, finished.code) == (2, ResponseCode.Success)
+    timed_out = next_callback()
+    assert (timed_out.log_id, timed_out.code) == (1, ResponseCode.Timeout)
+    assert time.monotonic() - start < 2
+    wait_consumed(slow)
+
+
+def test_cancelled_on_kill(xxl_job, make_trigger, next_callback):
+    cancelled = []
+
+    async def handle():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+    jt.push_trigger(make_trigger(job_id=1, log_id=2))
+    time.sleep(0.2)
+
+    xxl_job.remove_job_thread(job_id=1, reason='人工终止')
+    results = {p.log_id: p for p in (next_callback(), next_callback())}
+    assert results[1].code == ResponseCode.Failure
+    assert results[1].msg == 'job[1]:log[1]调度被终止'
+    # 排队中的调度被丢弃
+    assert results[2].code == ResponseCode.Failure
+    assert results[2].msg == 'job[1]线程已停止工作, 清理任务队列'
+    assert cancelled == [True]
+    wait_consumed(jt)
+
+
+def test_serial_order_across_reschedule(xxl_job, make_trigger, next_callback):
+    events = []
+
+    async def handle(n):
+        events.append(('start', n))
+        await asyncio.sleep(0.02)
+        events.append(('end', n))
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    for n in range(1, 4):
+        jt.push_trigger(make_trigger(job_id=1, log_id=n,
+                                     executor_params=str(n)))
+    assert [next_callback().log_id for _ in range(3)] == [1, 2, 3]
+    wait_consumed(jt)
+
+    # 消费协程结束后收到的调度由新的消费协程执行, 仍依次执行
+    for n in range(4, 7):
+        jt.push_trigger(make_trigger(job_id=1, log_id=n,
+                                     executor_params=str(n)))
+    assert [next_callback().log_id for _ in range(3)] == [4, 5, 6]
+    assert events == [
+        (stage, n) for n in range(1, 7) for stage in ('start', 'end')
+    ]
+
+
+def test_context_isolated_between_jobs(xxl_job, make_trigger, next_callback):
+    seen = {}
+
+    async def handle(job_id):
+        await asyncio.sleep(0.1)
+        # 并发执行的其他job不会覆盖当前job的上下文
+        seen[job_id] = XxlJobContext.get().job_id
+
+    jobs = [
+        xxl_job.register_job_thread(job_id=job_id, handle_func=handle)
+        for job_id in (1, 2, 3)
+    ]
+    for job_id, jt in enumerate(jobs, start=1):
+        jt.push_trigger(
+            make_trigger(job_id=job_id,
+                         log_id=job_id,
+                         executor_params=str(job_id)))
+    assert {next_callback().code for _ in range(3)} == {ResponseCode.Success}
+    assert seen == {1: 1, 2: 2, 3: 3}
+    for jt in jobs:
+        wait_consumed(jt)
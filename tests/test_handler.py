@@ -0,0 +1,119 @@
+from lesoon_cron.scheduler.xxl_job.handler import XxlJobHandler
+
+
+class FakeAppContext:
+
+    def __init__(self, app: 'FakeApp'):
+        self.app = app
+
+    def __enter__(self):
+        self.app.entered += 1
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeApp:
+
+    def __init__(self):
+        self.entered = 0
+
+    def app_context(self) -> FakeAppContext:
+        return FakeAppContext(self)
+
+
+def test_dispatch_table_built_at_registration(xxl_job):
+    created = []
+
+    class DemoHandler(XxlJobHandler):
+
+        def __init__(self):
+            created.append(self)
+
+        def run(self):
+            return self
+
+    assert 'DemoHandler.run' in xxl_job._dispatch_table
+    assert len(created) == 1
+    # 同一处理器的调度复用处理器单例
+    handle_func = xxl_job.get_handle_func('DemoHandler.run')
+    assert handle_func is xxl_job.get_handle_func('DemoHandler.run')
+    assert handle_func() is created[0]
+    assert len(created) == 1
+
+
+def test_only_own_public_functions_registered(xxl_job):
+
+    class BaseDemoHandler(XxlJobHandler):
+
+        def helper(self):
+            pass
+
+    class DemoHandler(BaseDemoHandler):
+        limit = 10
+
+        class Options:
+            pass
+
+        def run(self):
+            pass
+
+        def _private(self):
+            pass
+
+    assert [
+        name for name in xxl_job._dispatch_table
+        if name.startswith('DemoHandler.')
+    ] == ['DemoHandler.run']
+    assert xxl_job.get_handle_func('DemoHandler.helper') is None
+    assert xxl_job.get_handle_func('Missing.run') is None
+
+
+def test_redefined_handler_replaces_methods(xxl_job):
+
+    class DemoHandler(XxlJobHandler):
+
+        def old(self):
+            pass
+
+    class DemoHandler(XxlJobHandler):  # noqa: F811
+
+        def new(self):
+            pass
+
+    assert xxl_job.get_handle_func('DemoHandler.old') is None
+    assert xxl_job.get_handle_func('DemoHandler.new')
+
+
+def test_handler_constructor_can_use_shared_threads(xxl_job):
+
+    class DemoHandler(XxlJobHandler):
+
+        def __init__(self):
+            # 构造函数不在分发表锁内执行, 获取共享线程不会死锁
+            self.timer = xxl_job.get_timer_thread()
+
+        def run(self):
+            pass
+
+    assert xxl_job.get_handle_func('DemoHandler.run')
+
+
+def test_bind_app_injects_app_context(xxl_job):
+
+    class DemoHandler(XxlJobHandler):
+
+        def run(self, value):
+            return value
+
+    app = FakeApp()
+    xxl_job.bind_app(app)
+
+    class OtherHandler(XxlJobHandler):
+
+        def run(self):
+            return 'other'
+
+    assert xxl_job.get_handle_func('DemoHandler.run')(1) == 1
+    assert xxl_job.get_handle_func('OtherHandler.run')() == 'other'
+    assert app.entered == 2
@@ -0,0 +1,72 @@
+import threading
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.code import XxlJobStrategyCode
+from lesoon_cron.scheduler.xxl_job.idempotency import LogIdStore
+from lesoon_cron.scheduler.xxl_job.resource import XxlJobResource
+
+
+def test_log_id_store_rejects_duplicates(tmp_path):
+    store = LogIdStore(path=str(tmp_path / 'trigger.db'))
+    assert store.add(log_id=1, job_id=10)
+    assert not store.add(log_id=1, job_id=10)
+    assert store.add(log_id=2, job_id=10)
+
+    store.remove(log_id=1)
+    assert store.add(log_id=1, job_id=10)
+    store.close()
+
+
+def test_log_id_store_survives_restart(tmp_path):
+    path = str(tmp_path / 'trigger.db')
+    store = LogIdStore(path=path)
+    store.add(log_id=1, job_id=10)
+    store.close()
+
+    store = LogIdStore(path=path)
+    assert not store.add(log_id=1, job_id=10)
+    store.close()
+
+
+def test_log_id_store_expires_records(tmp_path):
+    store = LogIdStore(path=str(tmp_path / 'trigger.db'), ttl=0)
+    assert store.add(log_id=1, job_id=10)
+    # 过期记录视为首次接收
+    assert store.add(log_id=1, job_id=10)
+    store.close()
+
+
+def test_duplicate_trigger_not_executed_twice(xxl_job, make_trigger,
+                                              next_callback, tmp_path):
+    xxl_job.init_log_id_store(path=str(tmp_path / 'trigger.db'), ttl=3600)
+    calls = []
+    jt = xxl_job.register_job_thread(job_id=1,
+                                     handle_func=lambda: calls.append(1))
+    xxl_job._dispatch_table['DemoHandler.run'] = jt.handle_func
+
+    tp = make_trigger(job_id=1, log_id=1)
+    assert XxlJobResource.run_trigger(tp)['code'] == 200
+    assert next_callback().code == ResponseCode.Success
+    res = XxlJobResource.run_trigger(tp)
+    assert res['code'] == ResponseCode.Failure.value
+    assert '重复调度' in res['msg']
+    assert calls == [1]
+
+
+def test_rejected_trigger_releases_log_id(xxl_job, make_trigger, next_callback,
+                                          tmp_path):
+    xxl_job.init_log_id_store(path=str(tmp_path / 'trigger.db'), ttl=3600)
+    release = threading.Event()
+    xxl_job._dispatch_table['DemoHandler.run'] = lambda: release.wait(5)
+    strategy = XxlJobStrategyCode.DiscardLater
+
+    first = make_trigger(job_id=1, log_id=1, executor_block_strategy=strategy)
+    second = make_trigger(job_id=1, log_id=2, executor_block_strategy=strategy)
+    assert XxlJobResource.run_trigger(first)['code'] == 200
+    assert XxlJobResource.run_trigger(second)['code'] == 500
+    release.set()
+    assert next_callback().log_id == 1
+
+    # 调度中心重试被拒绝的调度时不再视为重复
+    assert XxlJobResource.run_trigger(second)['code'] == 200
+    assert next_callback().log_id == 2
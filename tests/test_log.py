@@ -0,0 +1,146 @@
+import os
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+
+TODAY = date(2022, 4, 20)
+
+
+def log_path(day: date, log_id: int) -> str:
+    log_time = int(datetime(day.year, day.month, day.day, 12).timestamp())
+    return XxlJobLogger.get_log_file_path(log_time=log_time * 1000,
+                                          log_id=log_id)
+
+
+def write_lines(path: str, start: int, stop: int):
+    for line_num in range(start, stop):
+        XxlJobLogger.write(path, f'第{line_num}行')
+
+
+def lines_of(content: str):
+    return content.splitlines()
+
+
+@pytest.fixture
+def line_index_step(xxl_job, monkeypatch):
+    monkeypatch.setattr(XxlJobLogger, 'line_index_step', 10)
+    return 10
+
+
+def test_read_from_line(line_index_step):
+    path = log_path(TODAY, log_id=1)
+    write_lines(path, 1, 101)
+
+    result = XxlJobLogger.read(path, from_line_num=1)
+    assert (result.from_line_num, result.to_line_num) == (1, 100)
+    assert len(lines_of(result.log_content)) == 100
+    index = XxlJobLogger._line_indexes[path]
+    assert index.line_count == 100
+    assert len(index.offsets) == 11
+
+    result = XxlJobLogger.read(path, from_line_num=55)
+    assert result.to_line_num == 100
+    assert lines_of(result.log_content)[0] == '第55行'
+    assert len(lines_of(result.log_content)) == 46
+
+
+def test_read_appended_lines(line_index_step):
+    path = log_path(TODAY, log_id=1)
+    write_lines(path, 1, 26)
+    assert XxlJobLogger.read(path, from_line_num=1).to_line_num == 25
+
+    write_lines(path, 26, 31)
+    result = XxlJobLogger.read(path, from_line_num=26)
+    assert (result.to_line_num, result.is_end) == (30, False)
+    assert lines_of(result.log_content) == [f'第{i}行' for i in range(26, 31)]
+
+
+def test_read_rebuilds_index_for_replaced_file(line_index_step):
+    path = log_path(TODAY, log_id=1)
+    write_lines(path, 1, 51)
+    XxlJobLogger.read(path, from_line_num=1)
+
+    os.remove(path)
+    XxlJobLogger.write(path, '新日志')
+    result = XxlJobLogger.read(path, from_line_num=1)
+    assert (result.to_line_num, result.log_content) == (1, '新日志\n')
+
+
+def test_read_missing_file(xxl_job):
+    result = XxlJobLogger.read(log_path(TODAY, log_id=1), from_line_num=1)
+    assert result.is_end
+    assert '日志文件不存在' in result.log_content
+
+
+def test_read_falls_back_to_archive(line_index_step):
+    path = log_path(TODAY, log_id=1)
+    write_lines(path, 1, 21)
+    XxlJobLogger.read(path, from_line_num=1)
+
+    archive_path = XxlJobLogger.archive(os.path.dirname(path))
+    assert archive_path == os.path.dirname(path) + '.zip'
+    assert not os.path.exists(os.path.dirname(path))
+    assert path not in XxlJobLogger._line_indexes
+
+    result = XxlJobLogger.read(path, from_line_num=15)
+    assert (result.to_line_num, result.is_end) == (20, True)
+    assert lines_of(result.log_content) == [f'第{i}行' for i in range(15, 21)]
+
+
+def test_archive_merges_existing_archive(xxl_job):
+    path = log_path(TODAY, log_id=1)
+    write_lines(path, 1, 3)
+    XxlJobLogger.archive(os.path.dirname(path))
+
+    # 归档后仍有日志写入
+    path = log_path(TODAY, log_id=1)
+    write_lines(path, 3, 5)
+    other_path = log_path(TODAY, log_id=2)
+    write_lines(other_path, 1, 2)
+    XxlJobLogger.archive(os.path.dirname(path))
+
+    assert lines_of(XxlJobLogger.read(
+        path, 1).log_content) == [f'第{i}行' for i in range(1, 5)]
+    assert lines_of(XxlJobLogger.read(other_path, 1).log_content) == ['第1行']
+
+
+def test_maintain(xxl_job):
+    recent = log_path(TODAY - timedelta(days=1), log_id=1)
+    stale = log_path(TODAY - timedelta(days=5), log_id=2)
+    expired = log_path(TODAY - timedelta(days=10), log_id=3)
+    for path in (recent, stale, expired):
+        write_lines(path, 1, 2)
+    expired_archive = XxlJobLogger.archive(
+        os.path.dirname(log_path(TODAY - timedelta(days=9), log_id=4)))
+
+    XxlJobLogger.maintain(retention_days=7, compress_after_days=3, today=TODAY)
+
+    assert os.path.exists(recent)
+    assert not os.path.exists(os.path.dirname(stale))
+    assert os.path.exists(os.path.dirname(stale) + '.zip')
+    assert XxlJobLogger.read(stale, 1).log_content == '第1行\n'
+    assert not os.path.exists(os.path.dirname(expired))
+    assert not os.path.exists(expired_archive)
+
+
+def test_async_writer(xxl_job):
+    XxlJobLogger.start_writer(max_open_files=1)
+    try:
+        path = log_path(TODAY, log_id=1)
+        other_path = log_path(TODAY, log_id=2)
+        for line_num in range(1, 4):
+            XxlJobLogger.write(path, f'第{line_num}行')
+            XxlJobLogger.write(other_path, f'第{line_num}行')
+        assert XxlJobLogger.flush()
+        assert XxlJobLogger.read(path, 1).to_line_num == 3
+        assert XxlJobLogger.read(other_path, 1).to_line_num == 3
+
+        # 归档前关闭写入线程持有的文件句柄
+        XxlJobLogger.archive(os.path.dirname(path))
+        assert XxlJobLogger.read(path, 1).to_line_num == 3
+    finally:
+        XxlJobLogger.stop_writer()
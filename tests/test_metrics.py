@@ -0,0 +1,104 @@
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.metrics import Histogram
+from lesoon_cron.scheduler.xxl_job.metrics import XxlJobMetrics
+from lesoon_cron.scheduler.xxl_job.resource import XxlJobResource
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    for attr in ('_counters', '_histograms', '_gauges', '_startup'):
+        monkeypatch.setattr(XxlJobMetrics, attr, {})
+    yield XxlJobMetrics
+
+
+def test_counter_key_sorts_labels(metrics):
+    metrics.counter('requests', path='/run', code=200).inc()
+    metrics.counter('requests', code=200, path='/run').inc(2)
+    metrics.counter('requests').inc()
+
+    assert metrics.snapshot()['counters'] == {
+        'requests': 1,
+        'requests{code=200,path=/run}': 3
+    }
+
+
+def test_histogram_bucket_boundaries():
+    histogram = Histogram(buckets=(1, 5, 10))
+    for value in (0.5, 1, 5, 7, 100):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    # 等于上界的观测值计入该分桶, 分桶数量为累计值
+    assert snapshot['buckets'] == {'1': 2, '5': 3, '10': 4, '+Inf': 5}
+    assert snapshot['count'] == 5
+    assert snapshot['sum'] == 113.5
+    assert snapshot['avg'] == pytest.approx(22.7)
+    assert snapshot['max'] == 100
+
+
+def test_empty_histogram_snapshot():
+    assert Histogram(buckets=(1,)).snapshot() == {
+        'count': 0,
+        'sum': 0,
+        'avg': 0,
+        'max': 0,
+        'buckets': {
+            '1': 0,
+            '+Inf': 0
+        }
+    }
+
+
+def test_histogram_created_once_per_key(metrics):
+    histogram = metrics.histogram('batch_size', buckets=(1, 10), lane='a')
+    assert metrics.histogram('batch_size', lane='a') is histogram
+    assert metrics.histogram('batch_size', lane='b') is not histogram
+    assert histogram.buckets == (1, 10)
+
+
+def test_gauge_evaluated_at_snapshot(metrics):
+    depth = [1]
+    metrics.gauge('queue_depth', lambda: depth[0])
+
+    def broken():
+        raise RuntimeError('不可用')
+
+    metrics.gauge('broken', broken)
+    depth[0] = 3
+
+    # 取值异常的仪表不影响其余指标
+    assert metrics.snapshot()['gauges'] == {'queue_depth': 3, 'broken': '不可用'}
+
+
+def test_metrics_endpoint(metrics):
+    metrics.counter('trigger_total').inc()
+    metrics.mark('initialized')
+
+    response = XxlJobResource().metrics()
+    assert response['code'] == ResponseCode.Success.value
+    content = response['content']
+    assert set(content) == {'counters', 'histograms', 'gauges', 'startup'}
+    assert content['counters'] == {'trigger_total': 1}
+    assert set(content['startup']) == {'initialized'}
+
+
+def test_job_run_recorded(xxl_job, make_trigger, next_callback, metrics):
+
+    def handle(fail):
+        if fail:
+            raise ValueError('bad')
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1, executor_params='0'))
+    jt.push_trigger(make_trigger(job_id=1, log_id=2, executor_params='1'))
+    next_callback()
+    next_callback()
+
+    snapshot = metrics.snapshot()
+    assert snapshot['counters']['trigger_total'] == 2
+    assert snapshot['counters']['job_results{code=Success}'] == 1
+    assert snapshot['counters']['job_results{code=Failure}'] == 1
+    assert snapshot['histograms']['job_duration_seconds']['count'] == 2
+    assert snapshot['histograms']['trigger_wait_seconds']['count'] == 2
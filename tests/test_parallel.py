@@ -0,0 +1,170 @@
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.helper import XxlJobHelper
+from lesoon_cron.scheduler.xxl_job.parallel import ParallelExecutor
+
+
+def wait_event(event: threading.Event, timeout: float = 5) -> bool:
+    # 分段等待, 使线程可被终止
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if event.wait(0.05):
+            return True
+    return False
+
+
+def test_submit_cancelled_when_job_ends(xxl_job, make_trigger, next_callback,
+                                        monkeypatch):
+    monkeypatch.setattr(ParallelExecutor, 'default_max_workers', 1)
+    started, release, finished = (threading.Event(), threading.Event(),
+                                  threading.Event())
+    futures = []
+
+    def blocking():
+        started.set()
+        wait_event(release)
+        finished.set()
+
+    def handle():
+        futures.append(XxlJobHelper.submit(blocking))
+        futures.append(XxlJobHelper.submit(finished.set))
+        assert started.wait(timeout=5)
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+
+    assert next_callback().code == ResponseCode.Success
+    running, queued = futures
+    assert queued.cancelled()
+    # 执行中的子任务被终止
+    with pytest.raises(SystemExit):
+        running.result(timeout=5)
+    release.set()
+    assert not finished.wait(timeout=0.3)
+
+
+def test_submit_failure_fails_job(xxl_job, make_trigger, next_callback):
+
+    def boom():
+        raise ValueError('bad')
+
+    def handle():
+        future = XxlJobHelper.submit(boom)
+        with pytest.raises(ValueError):
+            future.result(timeout=5)
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+
+    result = next_callback()
+    assert result.code == ResponseCode.Failure
+    assert result.msg.startswith('并行子任务失败1/1')
+
+
+def test_submit_outside_job_reuses_executor(xxl_job):
+    first = XxlJobHelper.submit(lambda: 1)
+    second = XxlJobHelper.submit(lambda: 2)
+    assert (first.result(timeout=5), second.result(timeout=5)) == (1, 2)
+
+    executor = ParallelExecutor.shared()
+    assert ParallelExecutor.shared() is executor
+    assert len(executor.workers) <= executor.max_workers
+    assert '' not in ParallelExecutor._executors
+
+
+def test_parallel_map_keeps_order(xxl_job, make_trigger, next_callback):
+    results = []
+
+    def handle():
+        results.extend(
+            XxlJobHelper.parallel_map(lambda x: x * 2,
+                                      range(10),
+                                      max_workers=3,
+                                      chunk_size=3))
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+
+    assert next_callback().code == ResponseCode.Success
+    assert results == [x * 2 for x in range(10)]
+
+
+def test_parallel_map_timeout(xxl_job, make_trigger, next_callback):
+    release, finished = threading.Event(), threading.Event()
+    errors = []
+
+    def blocking(_):
+        wait_event(release)
+        finished.set()
+
+    def handle():
+        start = time.monotonic()
+        try:
+            XxlJobHelper.parallel_map(blocking, range(2), timeout=0.3)
+        except TimeoutError as e:
+            errors.append((e, time.monotonic() - start))
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+
+    next_callback()
+    (error, elapsed), = errors
+    assert elapsed < 2
+    # 超时后子任务被终止
+    release.set()
+    assert not finished.wait(timeout=0.3)
+
+
+def test_parallel_map_fail_fast(xxl_job, make_trigger, next_callback):
+    results = []
+    called = []
+
+    def fn(item):
+        called.append(item)
+        if item == 0:
+            raise ValueError(item)
+        return item
+
+    def handle():
+        results.extend(
+            XxlJobHelper.parallel_map(fn,
+                                      range(5),
+                                      max_workers=1,
+                                      fail_fast=True))
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+
+    result = next_callback()
+    assert result.code == ResponseCode.Failure
+    assert result.msg.startswith('并行子任务失败1/5')
+    assert called == [0]
+    assert isinstance(results[0], ValueError)
+    assert all(
+        isinstance(r, concurrent.futures.CancelledError) for r in results[1:])
+
+
+def test_parallel_map_failure_fails_job(xxl_job, make_trigger, next_callback):
+    results = []
+
+    def fn(item):
+        if item % 2:
+            raise ValueError(item)
+        return item
+
+    def handle():
+        results.extend(XxlJobHelper.parallel_map(fn, range(4)))
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+
+    result = next_callback()
+    assert result.code == ResponseCode.Failure
+    assert result.msg.startswith('并行子任务失败2/4')
+    assert results[0::2] == [0, 2]
+    assert all(isinstance(r, ValueError) for r in results[1::2])
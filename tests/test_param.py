@@ -0,0 +1,65 @@
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.param import TriggerParamDecoder
+
+
+@pytest.mark.parametrize('params, expected', [
+    ('', ((), {})),
+    ('1', ((1,), {})),
+    ('[1, "a"]', ((1, 'a'), {})),
+    ('{"a": 1}', ((), {
+        'a': 1
+    })),
+    ("{'a': (1, 2)}", ((), {
+        'a': (1, 2)
+    })),
+    ('true', ((True,), {})),
+    ('[false, null]', ((False, None), {})),
+])
+def test_decode(xxl_job, params, expected):
+    assert TriggerParamDecoder.decode(params) == expected
+
+
+@pytest.mark.parametrize('params', ['NaN', '-Infinity', '[1, Infinity]'])
+def test_decode_rejects_json_constants(xxl_job, params):
+    with pytest.raises(ValueError):
+        TriggerParamDecoder.decode(params)
+
+
+def test_decode_caches_parsed_params(xxl_job, monkeypatch):
+    calls = []
+    parse = TriggerParamDecoder._parse.__func__
+
+    def counting_parse(cls, params):
+        calls.append(params)
+        return parse(cls, params)
+
+    monkeypatch.setattr(TriggerParamDecoder, '_parse',
+                        classmethod(counting_parse))
+    TriggerParamDecoder.decode('[1, 2]')
+    TriggerParamDecoder.decode('[1, 2]')
+    assert calls == ['[1, 2]']
+
+
+def test_decode_returns_copy_of_mutable_values(xxl_job):
+    args, kwargs = TriggerParamDecoder.decode('{"ids": [1, 2]}')
+    kwargs['ids'].append(3)
+    kwargs['extra'] = 1
+
+    assert TriggerParamDecoder.decode('{"ids": [1, 2]}') == ((), {
+        'ids': [1, 2]
+    })
+
+
+def test_decode_skips_cache_for_long_params(xxl_job, monkeypatch):
+    monkeypatch.setattr(TriggerParamDecoder, 'max_cached_length', 10)
+    TriggerParamDecoder.decode('[1]')
+    TriggerParamDecoder.decode('[1, 2, 3, 4, 5]')
+    assert list(TriggerParamDecoder._cache) == ['[1]']
+
+
+def test_decode_evicts_least_recently_used(xxl_job, monkeypatch):
+    monkeypatch.setattr(TriggerParamDecoder, 'cache_size', 2)
+    for params in ('1', '2', '1', '3'):
+        TriggerParamDecoder.decode(params)
+    assert list(TriggerParamDecoder._cache) == ['1', '3']
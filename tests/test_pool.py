@@ -0,0 +1,203 @@
+import collections
+import threading
+import time
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.code import XxlJobStrategyCode
+from lesoon_cron.scheduler.xxl_job.handler import XxlJobHandler
+from lesoon_cron.scheduler.xxl_job.resource import XxlJobResource
+from lesoon_cron.scheduler.xxl_job.thread.pool import PooledJob
+from lesoon_cron.scheduler.xxl_job.thread.pool import ReadyQueue
+
+release_event = threading.Event()
+started_event = threading.Event()
+
+
+class BlockingHandler(XxlJobHandler):
+
+    def run(self):
+        started_event.set()
+        release_event.wait(timeout=5)
+
+
+@pytest.fixture
+def blocking_handler(xxl_job):
+    release_event.clear()
+    started_event.clear()
+    yield 'BlockingHandler.run'
+    release_event.set()
+
+
+def wait_until(predicate, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_pool_runs_each_job_serially(xxl_job, make_trigger, next_callback):
+    xxl_job.init_job_worker_pool(size=4)
+    lock = threading.Lock()
+    running: collections.Counter = collections.Counter()
+    peak: collections.Counter = collections.Counter()
+
+    def handle(job_id):
+        with lock:
+            running[job_id] += 1
+            peak[job_id] = max(peak[job_id], running[job_id])
+        time.sleep(0.02)
+        with lock:
+            running[job_id] -= 1
+
+    for job_id in (1, 2):
+        jt = xxl_job.register_job_thread(job_id=job_id, handle_func=handle)
+        for log_id in range(5):
+            tp = make_trigger(job_id=job_id,
+                              log_id=job_id * 100 + log_id,
+                              executor_params=str(job_id))
+            assert jt.push_trigger(tp).code == ResponseCode.Success
+
+    results = [next_callback() for _ in range(10)]
+    assert all(param.code == ResponseCode.Success for param in results)
+    assert peak == {1: 1, 2: 1}
+
+
+def test_ready_queue_takes_higher_priority_first():
+    ready_queue = ReadyQueue()
+    low = PooledJob(job_id=1, handle_func=print, pool=None, priority=0)
+    high = PooledJob(job_id=2, handle_func=print, pool=None, priority=1)
+    ready_queue.put(low)
+    ready_queue.put(high)
+
+    assert ready_queue.lane_depths() == {0: 1, 1: 1}
+    assert ready_queue.get() is high
+    assert ready_queue.get() is low
+    ready_queue.put(None)
+    assert ready_queue.get() is None
+
+
+def test_ready_queue_shares_lane_by_weight():
+    ready_queue = ReadyQueue()
+    heavy = PooledJob(job_id=1, handle_func=print, pool=None, weight=3)
+    light = PooledJob(job_id=2, handle_func=print, pool=None, weight=1)
+    ready_queue.put(heavy)
+    ready_queue.put(light)
+
+    counts: collections.Counter = collections.Counter()
+    for _ in range(40):
+        job = ready_queue.get()
+        counts[job.job_id] += 1
+        # 始终有待执行调度, 执行后重新进入就绪队列
+        ready_queue.put(job)
+    assert abs(counts[1] - 30) <= 1
+    assert abs(counts[2] - 10) <= 1
+
+
+def test_pooled_job_rejects_non_positive_weight():
+    with pytest.raises(ValueError):
+        PooledJob(job_id=1, handle_func=print, pool=None, weight=0)
+
+
+@pytest.mark.parametrize('pool_size', [0, 2])
+def test_kill_interrupts_handler_swallowing_exceptions(xxl_job, make_trigger,
+                                                       next_callback,
+                                                       pool_size):
+    if pool_size:
+        xxl_job.init_job_worker_pool(size=pool_size)
+    started = threading.Event()
+
+    def handle():
+        started.set()
+        while True:
+            try:
+                time.sleep(0.01)
+            except Exception:
+                pass
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+    jt.push_trigger(make_trigger(job_id=1, log_id=2))
+    assert started.wait(timeout=5)
+
+    XxlJobResource.kill_job(job_id=1)
+    results = {
+        param.log_id: param for param in (next_callback(), next_callback())
+    }
+    assert results[1].code == ResponseCode.Failure
+    assert '调度被终止' in results[1].msg
+    assert results[2].code == ResponseCode.Failure
+    assert xxl_job.get_job_thread(job_id=1) is None
+    if pool_size:
+        wait_until(lambda: not jt.scheduled)
+        # 工作线程在终止后继续执行其他job
+        jt2 = xxl_job.register_job_thread(job_id=2, handle_func=lambda: None)
+        jt2.push_trigger(make_trigger(job_id=2, log_id=3))
+        assert next_callback().code == ResponseCode.Success
+
+
+def test_serial_execution_queues_trigger(blocking_handler, make_trigger,
+                                         next_callback):
+    first = make_trigger(job_id=1, log_id=1, executor_handler=blocking_handler)
+    second = make_trigger(job_id=1, log_id=2, executor_handler=blocking_handler)
+    assert XxlJobResource.run_trigger(first)['code'] == 200
+    assert started_event.wait(timeout=5)
+    assert XxlJobResource.run_trigger(second)['code'] == 200
+
+    release_event.set()
+    assert [next_callback().log_id, next_callback().log_id] == [1, 2]
+
+
+def test_discard_later_rejects_trigger(blocking_handler, make_trigger,
+                                       next_callback):
+    strategy = XxlJobStrategyCode.DiscardLater
+    first = make_trigger(job_id=1,
+                         log_id=1,
+                         executor_handler=blocking_handler,
+                         executor_block_strategy=strategy)
+    second = make_trigger(job_id=1,
+                          log_id=2,
+                          executor_handler=blocking_handler,
+                          executor_block_strategy=strategy)
+    assert XxlJobResource.run_trigger(first)['code'] == 200
+    assert started_event.wait(timeout=5)
+
+    res = XxlJobResource.run_trigger(second)
+    assert res['code'] == ResponseCode.Failure.value
+    assert '任务已存在调度进行中' in res['msg']
+    release_event.set()
+    assert next_callback().log_id == 1
+
+
+def test_cover_early_replaces_running_trigger(blocking_handler, make_trigger,
+                                              next_callback, xxl_job):
+    strategy = XxlJobStrategyCode.CoverEarly
+    first = make_trigger(job_id=1,
+                         log_id=1,
+                         executor_handler=blocking_handler,
+                         executor_block_strategy=strategy)
+    second = make_trigger(job_id=1,
+                          log_id=2,
+                          executor_handler=blocking_handler,
+                          executor_block_strategy=strategy)
+    assert XxlJobResource.run_trigger(first)['code'] == 200
+    assert started_event.wait(timeout=5)
+    old = xxl_job.get_job_thread(job_id=1)
+
+    assert XxlJobResource.run_trigger(second)['code'] == 200
+    assert xxl_job.get_job_thread(job_id=1) is not old
+    # 处理函数阻塞在等待中时, 终止信号在等待返回后才生效
+    release_event.set()
+    results = {
+        param.log_id: param for param in (next_callback(), next_callback())
+    }
+    assert '调度被终止' in results[1].msg
+    assert results[2].code == ResponseCode.Success
+
+
+def test_unknown_handler_is_rejected(xxl_job, make_trigger):
+    tp = make_trigger(job_id=1, log_id=1, executor_handler='Missing.run')
+    res = XxlJobResource.run_trigger(tp)
+    assert res['code'] == ResponseCode.Error.value
+    assert xxl_job.get_job_thread(job_id=1) is None
@@ -0,0 +1,168 @@
+import os
+import time
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job import run_in_process
+from lesoon_cron.scheduler.xxl_job import XxlJobHandler
+from lesoon_cron.scheduler.xxl_job import XxlJobHelper
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.context import XxlJobContext
+from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+
+
+class ProcessHandler(XxlJobHandler):
+
+    @run_in_process
+    def context(self, value, key=''):
+        context = XxlJobContext.get()
+        XxlJobHelper.handle_success(
+            f'{os.getpid()}|{context.job_id}|{context.broadcast_index}/'
+            f'{context.broadcast_total}|{value}|{key}')
+
+    @run_in_process
+    def logs(self, lines):
+        for i in range(lines):
+            XxlJobHelper.log(f'子进程日志{i}')
+
+    @run_in_process
+    def sleep(self, seconds, pid_file=''):
+        if pid_file:
+            with open(pid_file, 'w') as f:
+                f.write(str(os.getpid()))
+        time.sleep(seconds)
+
+
+@pytest.fixture
+def process_pool(xxl_job):
+    return xxl_job.init_process_worker_pool(size=1)
+
+
+def pid_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_context_marshalled_to_worker(xxl_job, process_pool, make_trigger,
+                                      next_callback):
+    jt = xxl_job.register_job_thread(job_id=1,
+                                     handle_func=ProcessHandler().context)
+    jt.push_trigger(
+        make_trigger(job_id=1,
+                     log_id=1,
+                     executor_handler='ProcessHandler.context',
+                     executor_params='{"value": [1, 2], "key": "k"}',
+                     broadcast_index=1,
+                     broadcast_total=3))
+
+    result = next_callback()
+    assert result.code == ResponseCode.Success
+    pid, job_id, shard, value, key = result.msg.split('|')
+    assert int(pid) != os.getpid()
+    assert (job_id, shard, value, key) == ('1', '1/3', '[1, 2]', 'k')
+
+
+def test_worker_logs_streamed_to_job_log(xxl_job, process_pool, make_trigger,
+                                         next_callback):
+    tp = make_trigger(job_id=1,
+                      log_id=1,
+                      executor_handler='ProcessHandler.logs',
+                      executor_params='3')
+    jt = xxl_job.register_job_thread(job_id=1,
+                                     handle_func=ProcessHandler().logs)
+    jt.push_trigger(tp)
+
+    assert next_callback().code == ResponseCode.Success
+    content = XxlJobLogger.read(XxlJobLogger.get_log_file_path(
+        tp.log_date_time, tp.log_id),
+                                from_line_num=1).log_content
+    assert [f'子进程日志{i}' in content for i in range(3)] == [True] * 3
+    assert content.index('子进程日志0') < content.index('子进程日志2')
+
+
+def test_worker_killed_at_timeout(xxl_job, process_pool, make_trigger,
+                                  next_callback, tmp_path):
+    pid_file = tmp_path / 'pid'
+    jt = xxl_job.register_job_thread(job_id=1,
+                                     handle_func=ProcessHandler().sleep)
+    start = time.monotonic()
+    jt.push_trigger(
+        make_trigger(job_id=1,
+                     log_id=1,
+                     executor_handler='ProcessHandler.sleep',
+                     executor_params=f'[10, "{pid_file}"]',
+                     executor_timeout=1))
+
+    result = next_callback()
+    assert result.code == ResponseCode.Timeout
+    assert time.monotonic() - start < 3
+    assert not pid_exists(int(pid_file.read_text()))
+    # 超时的工作进程被替换
+    assert process_pool.idle_workers.qsize() == 1
+
+
+def test_worker_killed_on_terminate(xxl_job, process_pool, make_trigger,
+                                    next_callback, tmp_path):
+    pid_file = tmp_path / 'pid'
+    jt = xxl_job.register_job_thread(job_id=1,
+                                     handle_func=ProcessHandler().sleep)
+    jt.push_trigger(
+        make_trigger(job_id=1,
+                     log_id=1,
+                     executor_handler='ProcessHandler.sleep',
+                     executor_params=f'[10, "{pid_file}"]'))
+    deadline = time.monotonic() + 5
+    while not pid_file.exists() or not pid_file.read_text():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+    xxl_job.remove_job_thread(job_id=1, reason='人工终止')
+    result = next_callback()
+    assert result.code == ResponseCode.Failure
+    assert result.msg == 'job[1]:log[1]调度被终止'
+    assert not pid_exists(int(pid_file.read_text()))
+
+
+def test_worker_killed_before_send(xxl_job, process_pool, make_trigger,
+                                   next_callback, monkeypatch):
+    acquire = process_pool.acquire
+
+    def acquire_killed():
+        # 模拟获取工作进程后、发送调度前收到终止请求
+        worker = acquire()
+        worker.kill()
+        return worker
+
+    monkeypatch.setattr(process_pool, 'acquire', acquire_killed)
+    jt = xxl_job.register_job_thread(job_id=1,
+                                     handle_func=ProcessHandler().logs)
+    jt.push_trigger(
+        make_trigger(job_id=1,
+                     log_id=1,
+                     executor_handler='ProcessHandler.logs',
+                     executor_params='1'))
+
+    result = next_callback()
+    assert result.code == ResponseCode.Failure
+    assert result.msg == 'job[1]:log[1]调度被终止'
+
+
+def test_worker_kill_closes_conn_once(xxl_job, process_pool, monkeypatch):
+    worker = process_pool.acquire()
+    closed = []
+    close = worker.conn.close
+
+    def counting_close():
+        closed.append(1)
+        close()
+
+    monkeypatch.setattr(worker.conn, 'close', counting_close)
+    # 终止调度与调度线程归还进程都会杀死进程
+    worker.kill()
+    process_pool.release(worker)
+
+    assert closed == [1]
+    assert not worker.is_alive()
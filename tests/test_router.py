@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.router import JobRouter
+
+mp_context = multiprocessing.get_context('fork')
+
+
+def dispatch(path: str, payload: dict) -> dict:
+    return {'code': 200, 'msg': f'{os.getpid()}:{path}:{payload["jobId"]}'}
+
+
+@pytest.fixture
+def make_router(tmp_path):
+    # Unix socket路径长度有限, 使用较短的目录
+    socket_dir = str(tmp_path / 'r')
+    routers = []
+
+    def make() -> JobRouter:
+        router = JobRouter(socket_dir=socket_dir, dispatch=dispatch, timeout=2)
+        routers.append(router)
+        return router
+
+    yield make
+    for router in routers:
+        router.stop()
+
+
+def dead_pid() -> int:
+    process = mp_context.Process(target=os._exit, args=(0,))
+    process.start()
+    process.join()
+    return process.pid
+
+
+def run_owner(socket_dir: str, claimed, done):
+    """在子进程中认领任务1, 直到父进程通知退出."""
+    router = JobRouter(socket_dir=socket_dir, dispatch=dispatch, timeout=2)
+    router.get_owner(job_id=1, claim=True)
+    claimed.set()
+    done.wait(timeout=10)
+    router.stop()
+
+
+def test_claim_owner(make_router):
+    router = make_router()
+    assert router.get_owner(job_id=1) is None
+    assert router.get_owner(job_id=1, claim=True) == os.getpid()
+    with open(os.path.join(router.socket_dir, 'job-1.owner')) as f:
+        assert int(f.read()) == os.getpid()
+    # 当前进程处理自己认领的任务
+    assert router.forward(job_id=1, path='run', payload={'jobId': 1}) is None
+
+
+def test_stale_owner_taken_over(make_router):
+    router = make_router()
+    os.makedirs(router.socket_dir, exist_ok=True)
+    with open(os.path.join(router.socket_dir, 'job-1.owner'), 'w') as f:
+        f.write(str(dead_pid()))
+
+    assert router.get_owner(job_id=1) is None
+    assert router.get_owner(job_id=1, claim=True) == os.getpid()
+
+
+def test_forward_to_owner_process(make_router):
+    router = make_router()
+    claimed, done = mp_context.Event(), mp_context.Event()
+    owner = mp_context.Process(target=run_owner,
+                               args=(router.socket_dir, claimed, done))
+    owner.start()
+    try:
+        assert claimed.wait(timeout=5)
+        response = router.forward(job_id=1,
+                                  path='run',
+                                  payload={'jobId': 1},
+                                  claim=True)
+        assert response == {'code': 200, 'msg': f'{owner.pid}:run:1'}
+        assert router.get_owner(job_id=1) == owner.pid
+    finally:
+        done.set()
+        owner.join(timeout=5)
+
+    # 属主进程退出后由当前进程接管
+    assert router.forward(
+        job_id=1, path='run', payload={'jobId': 1}, claim=True) is None
+    assert router.get_owner(job_id=1) == os.getpid()
+
+
+def test_forward_to_unreachable_owner(make_router, monkeypatch):
+    router = make_router()
+    router.get_owner(job_id=1, claim=True)
+    router.owners[1] = dead_pid()
+
+    def time_out(pid, path, payload):
+        raise TimeoutError('timed out')
+
+    monkeypatch.setattr(router, '_request', time_out)
+    response = router.forward(job_id=1, path='kill', payload={'jobId': 1})
+    assert response['code'] == ResponseCode.Error.value
+    assert '转发请求至工作进程' in response['msg']
+
+
+def forked_child(router: JobRouter, results):
+    """fork出的子进程不沿用父进程的监听与认领关系."""
+    results.put((router.server is None, dict(router.owners)))
+    owner = router.get_owner(job_id=1)
+    results.put(
+        (owner, router.pid, os.path.exists(router.socket_path(router.pid))))
+    results.put(router.forward(job_id=1, path='run', payload={'jobId': 1}))
+
+
+def test_forked_child_listens_on_own_socket(make_router):
+    router = make_router()
+    router.get_owner(job_id=1, claim=True)
+    results = mp_context.Queue()
+    child = mp_context.Process(target=forked_child, args=(router, results))
+    child.start()
+    try:
+        assert results.get(timeout=5) == (True, {})
+        owner, child_pid, listening = results.get(timeout=5)
+        assert (owner, listening) == (os.getpid(), True)
+        assert child_pid == child.pid
+        # 子进程的请求转发回父进程执行
+        assert results.get(timeout=5) == {
+            'code': 200,
+            'msg': f'{os.getpid()}:run:1'
+        }
+    finally:
+        child.join(timeout=5)
+    assert router.server is not None
@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.shard import ShardPartition
+
+
+@pytest.mark.parametrize('lower, upper, total', [
+    (0, 100, 3),
+    (-7, 13, 4),
+    (5, 7, 4),
+    (0, 0, 2),
+])
+def test_range_bounds_cover_without_overlap(lower, upper, total):
+    bounds = [
+        ShardPartition(index=index, total=total).range_bounds(lower, upper)
+        for index in range(total)
+    ]
+    assert bounds[0][0] == lower
+    assert bounds[-1][1] == upper
+    # 各分片区间首尾相接
+    assert all(end == start for (_, end), (start, _) in zip(bounds, bounds[1:]))
+    covered = [
+        key for index in range(total)
+        for key in ShardPartition(index=index, total=total).iter_range(
+            lower, upper)
+    ]
+    assert covered == list(range(lower, upper))
+
+
+def test_hash_shard_stable_across_processes():
+    keys = ['order-1', 'order-2', b'raw', 42, '订单']
+    shards = [ShardPartition(total=7).hash_shard(key) for key in keys]
+    script = (
+        'from lesoon_cron.scheduler.xxl_job.shard import ShardPartition;'
+        f'print([ShardPartition(total=7).hash_shard(k) for k in {keys!r}])')
+    for seed in ('1', '2'):
+        # 内置hash()随PYTHONHASHSEED变化, 分片结果不应随之变化
+        output = subprocess.run([sys.executable, '-c', script],
+                                env=dict(os.environ, PYTHONHASHSEED=seed),
+                                check=True,
+                                capture_output=True,
+                                text=True).stdout
+        assert output.strip() == str(shards)
+
+
+def test_jump_hash_moves_few_keys():
+    keys = [f'key-{i}' for i in range(20000)]
+    before = [ShardPartition(total=10).hash_shard(key) for key in keys]
+    after = [ShardPartition(total=11).hash_shard(key) for key in keys]
+    moved = [(old, new) for old, new in zip(before, after) if old != new]
+
+    # 分片数由n变为n+1时约1/(n+1)的key迁移, 且都迁移到新增的分片
+    assert 0.07 < len(moved) / len(keys) < 0.11
+    assert {new for _, new in moved} == {10}
+
+
+def test_filter_partitions_items():
+    items = list(range(50))
+    for method in ('modulo', 'hash'):
+        parts = [
+            list(
+                ShardPartition(index=index, total=3).filter(items,
+                                                            method=method))
+            for index in range(3)
+        ]
+        assert sorted(sum(parts, [])) == items
+    assert list(ShardPartition().filter(items, method='hash')) == items
+
+
+def test_filter_validates_method_eagerly():
+    with pytest.raises(ValueError):
+        ShardPartition(index=0, total=2).filter([1, 2], method='range')
@@ -0,0 +1,103 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.base import XxlJob
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.resource import XxlJobResource
+from lesoon_cron.scheduler.xxl_job.thread.work import CallbackThread
+from lesoon_cron.scheduler.xxl_job.thread.work import LogMaintenanceThread
+
+
+@pytest.fixture
+def executor(xxl_job):
+    executor = XxlJob()
+    executor.drain_timeout = 5
+    yield executor
+    executor.shutdown()
+
+
+def drain_callbacks():
+    results = []
+    while not CallbackThread.callback_queue.empty():
+        results.append(CallbackThread.callback_queue.get_nowait()[1])
+    return results
+
+
+def test_shutdown_waits_for_queued_triggers(executor, xxl_job, make_trigger):
+    jt = xxl_job.register_job_thread(job_id=1,
+                                     handle_func=lambda: time.sleep(0.2))
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+    jt.push_trigger(make_trigger(job_id=1, log_id=2))
+
+    executor.shutdown()
+    results = drain_callbacks()
+    assert [param.log_id for param in results] == [1, 2]
+    assert all(param.code == ResponseCode.Success for param in results)
+
+
+def test_shutdown_terminates_jobs_after_drain_timeout(executor, xxl_job,
+                                                      make_trigger):
+    executor.drain_timeout = 0.2
+
+    def handle():
+        while True:
+            time.sleep(0.01)
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+    jt.push_trigger(make_trigger(job_id=1, log_id=2))
+
+    start = time.monotonic()
+    executor.shutdown()
+    assert time.monotonic() - start < 2
+    results = {param.log_id: param for param in drain_callbacks()}
+    assert '调度被终止' in results[1].msg
+    assert results[2].code == ResponseCode.Failure
+    assert xxl_job.get_job_thread(job_id=1) is None
+
+
+def test_draining_executor_rejects_triggers(executor, xxl_job, make_trigger):
+    executor.shutdown()
+    assert xxl_job.is_draining()
+
+    res = XxlJobResource.run_trigger(make_trigger(job_id=1, log_id=1))
+    assert res['code'] == ResponseCode.Failure.value
+    assert '执行器下线中' in res['msg']
+    assert xxl_job.get_job_thread(job_id=1) is None
+
+
+def test_sigterm_drains_before_previous_handler(executor, xxl_job, make_trigger,
+                                                next_callback):
+    received = threading.Event()
+    original = signal.signal(signal.SIGTERM,
+                             lambda signum, frame: received.set())
+    try:
+        executor.install_signal_handler()
+        jt = xxl_job.register_job_thread(job_id=1,
+                                         handle_func=lambda: time.sleep(0.2))
+        jt.push_trigger(make_trigger(job_id=1, log_id=1))
+
+        os.kill(os.getpid(), signal.SIGTERM)
+        # 下线完成后才交由原有的信号处理函数处理
+        assert received.wait(timeout=5)
+        assert executor.is_shutdown
+        assert next_callback(timeout=0).code == ResponseCode.Success
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+
+def test_shutdown_stops_log_maintenance_promptly(executor, xxl_job,
+                                                 monkeypatch):
+    monkeypatch.setattr(LogMaintenanceThread, 'period', 3600)
+    thread = LogMaintenanceThread()
+    thread.start()
+
+    start = time.monotonic()
+    executor.shutdown()
+    thread.join(timeout=2)
+    assert not thread.is_alive()
+    assert time.monotonic() - start < 2
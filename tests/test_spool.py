@@ -0,0 +1,98 @@
+import os
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.dataclass import CallbackParam
+from lesoon_cron.scheduler.xxl_job.spool import CallbackSpool
+
+
+def make_param(log_id: int) -> CallbackParam:
+    return CallbackParam(log_id=log_id,
+                         log_date_time=1650000000000,
+                         code=ResponseCode.Failure,
+                         msg=f'日志{log_id}')
+
+
+def crash(spool: CallbackSpool):
+    """模拟进程异常退出: 不确认剩余记录, 只释放文件锁."""
+    spool.sync()
+    spool.file.close()
+    spool.file_lock.release()
+
+
+def test_append_and_ack(tmp_path):
+    spool = CallbackSpool(spool_dir=str(tmp_path))
+    ids = [spool.append(make_param(log_id)) for log_id in (1, 2, 3)]
+    assert ids == [1, 2, 3]
+    spool.ack([1, 0, 3])
+    spool.sync()
+
+    assert list(spool.pending) == [2]
+    assert [p.log_id for p in CallbackSpool._load_journal(spool.path)] == [2]
+    spool.close()
+
+
+def test_compact_keeps_pending_records(tmp_path):
+    spool = CallbackSpool(spool_dir=str(tmp_path), compact_threshold=2)
+    for log_id in (1, 2, 3):
+        spool.append(make_param(log_id))
+    spool.ack([1, 3])
+
+    with open(spool.path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+    assert [p.log_id for p in CallbackSpool._load_journal(spool.path)] == [2]
+    spool.close()
+
+
+def test_recover_orphan_journal(tmp_path):
+    old = CallbackSpool(spool_dir=str(tmp_path))
+    old.append(make_param(1))
+    old.append(make_param(2))
+    old.ack([1])
+    crash(old)
+
+    spool = CallbackSpool(spool_dir=str(tmp_path))
+    recovered = spool.recover()
+    assert [(i, p.log_id, p.msg) for i, p in recovered] == [(1, 2, '日志2')]
+    assert not os.path.exists(old.path)
+    assert spool.append(make_param(3)) == 2
+    spool.close()
+
+
+def test_recover_after_restart_with_same_pid(tmp_path):
+    # 容器重启后进程号相同, 新旧日志文件不能冲突
+    old = CallbackSpool(spool_dir=str(tmp_path))
+    old.append(make_param(101))
+    crash(old)
+
+    spool = CallbackSpool(spool_dir=str(tmp_path))
+    assert spool.path != old.path
+    assert [p.log_id for _, p in spool.recover()] == [101]
+    assert spool.append(make_param(102)) == 2
+    spool.sync()
+    assert [p.log_id for p in CallbackSpool._load_journal(spool.path)
+           ] == [101, 102]
+    spool.close()
+
+
+def test_recover_skips_journal_held_by_live_process(tmp_path):
+    other = CallbackSpool(spool_dir=str(tmp_path))
+    other.append(make_param(1))
+    other.sync()
+
+    spool = CallbackSpool(spool_dir=str(tmp_path))
+    assert spool.recover() == []
+    assert os.path.exists(other.path)
+    spool.close()
+    other.close()
+
+
+def test_recover_ignores_truncated_last_line(tmp_path):
+    old = CallbackSpool(spool_dir=str(tmp_path))
+    old.append(make_param(1))
+    old.sync()
+    old.file.write('{"op": "add", "id": 2, "par')
+    crash(old)
+
+    spool = CallbackSpool(spool_dir=str(tmp_path))
+    assert [p.log_id for _, p in spool.recover()] == [1]
+    spool.close()
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.base import XxlJob
+from lesoon_cron.scheduler.xxl_job.helper import XxlJobHelper
+from lesoon_cron.scheduler.xxl_job.metrics import XxlJobMetrics
+from lesoon_cron.scheduler.xxl_job.resource import XxlJobResource
+from lesoon_cron.scheduler.xxl_job.thread import work
+from lesoon_cron.scheduler.xxl_job.thread.work import RegistryThread
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.registered = threading.Event()
+        self.calls = []
+
+    def registry(self, register_key: str, register_value: str):
+        self.calls.append(('registry', register_key, register_value))
+        self.registered.set()
+        return 'ok'
+
+    def remove_registry(self, register_key: str, register_value: str):
+        self.calls.append(('remove_registry', register_key, register_value))
+
+    def is_success(self, res) -> bool:
+        return res == 'ok'
+
+
+@pytest.fixture
+def client(xxl_job, tmp_path, monkeypatch):
+    monkeypatch.setattr(XxlJobMetrics, '_startup', {})
+    monkeypatch.setattr(RegistryThread, 'lock_path',
+                        str(tmp_path / 'register.lock'))
+    fake = FakeClient()
+    monkeypatch.setattr(XxlJobHelper, 'client', fake)
+    yield fake
+
+
+@pytest.fixture
+def local_ip_calls(monkeypatch):
+    calls = []
+
+    def get_local_ip():
+        calls.append(1)
+        return '10.0.0.1'
+
+    monkeypatch.setattr(work, 'get_local_ip', get_local_ip)
+    yield calls
+
+
+def test_mark_keeps_first_stage_time(monkeypatch):
+    monkeypatch.setattr(XxlJobMetrics, '_startup', {})
+    XxlJobMetrics.mark('initialized')
+    first = XxlJobMetrics._startup['initialized']
+    time.sleep(0.01)
+    XxlJobMetrics.mark('initialized')
+
+    assert XxlJobMetrics.snapshot()['startup'] == {'initialized': first}
+    assert first > 0
+
+
+def test_beat_check_marks_first_beat(client):
+    XxlJobResource().beat_check()
+    assert set(XxlJobMetrics._startup) == {'first_beat'}
+
+
+def test_default_config_does_not_detect_ip(local_ip_calls):
+    assert XxlJob._default_config()['EXECUTOR']['IP'] == ''
+    assert not local_ip_calls
+
+
+def test_registry_start_does_not_block(client, local_ip_calls, monkeypatch):
+    monkeypatch.setattr(RegistryThread, 'first_beat_jitter', 60)
+    rt = RegistryThread(app_name='demo', ip='', port=5000, path='xxl-job')
+    start = time.monotonic()
+    rt.start()
+    assert time.monotonic() - start < 0.5
+
+    # 首次心跳延迟期间停止时立即退出, 不探测IP也不注册
+    RegistryThread.stop()
+    rt.join(timeout=1)
+    assert not rt.is_alive()
+    assert not local_ip_calls
+    assert client.calls == []
+
+
+def test_registry_marks_first_registry(client, local_ip_calls, monkeypatch):
+    monkeypatch.setattr(RegistryThread, 'first_beat_jitter', 0)
+    rt = RegistryThread(app_name='demo', ip='', port=5000, path='xxl-job')
+    rt.start()
+    assert client.registered.wait(timeout=2)
+
+    RegistryThread.stop()
+    rt.join(timeout=1)
+    assert local_ip_calls == [1]
+    assert client.calls == [
+        ('registry', 'demo', 'http://10.0.0.1:5000/xxl-job'),
+        ('remove_registry', 'demo', 'http://10.0.0.1:5000/xxl-job'),
+    ]
+    assert set(XxlJobMetrics._startup) == {'first_registry'}
+
+
+def test_registry_uses_configured_ip(client, local_ip_calls, monkeypatch):
+    monkeypatch.setattr(RegistryThread, 'first_beat_jitter', 0)
+    rt = RegistryThread(app_name='demo',
+                        ip='http://192.168.0.2',
+                        port=5000,
+                        path='xxl-job')
+    rt.start()
+    assert client.registered.wait(timeout=2)
+
+    RegistryThread.stop()
+    rt.join(timeout=1)
+    assert not local_ip_calls
+    assert client.calls[0] == ('registry', 'demo',
+                               'http://192.168.0.2:5000/xxl-job')
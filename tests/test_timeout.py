@@ -0,0 +1,109 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from lesoon_cron.scheduler.xxl_job.code import ResponseCode
+from lesoon_cron.scheduler.xxl_job.log import XxlJobLogger
+from lesoon_cron.scheduler.xxl_job.thread.work import BaseJob
+from lesoon_cron.scheduler.xxl_job.thread.work import CallbackThread
+
+
+@pytest.mark.parametrize('pool_size', [0, 2])
+def test_timeout_reported_at_deadline(xxl_job, make_trigger, next_callback,
+                                      pool_size):
+    if pool_size:
+        xxl_job.init_job_worker_pool(size=pool_size)
+    returned = threading.Event()
+
+    def handle(delay):
+        try:
+            time.sleep(delay)
+        finally:
+            # 超时异常在sleep返回后才送达处理函数
+            if delay:
+                returned.set()
+
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=handle)
+    start = time.monotonic()
+    jt.push_trigger(
+        make_trigger(job_id=1,
+                     log_id=1,
+                     executor_params='2',
+                     executor_timeout=1))
+    jt.push_trigger(
+        make_trigger(job_id=1,
+                     log_id=2,
+                     executor_params='0',
+                     executor_timeout=1))
+
+    timed_out = next_callback()
+    assert timed_out.log_id == 1
+    assert timed_out.code == ResponseCode.Timeout
+    assert time.monotonic() - start < 1.8
+    # 超时后余下调度不再等待超时的处理函数
+    following = next_callback()
+    assert following.log_id == 2
+    assert following.code == ResponseCode.Success
+    assert not returned.is_set()
+
+    # 超时的处理函数返回后不再回调结果
+    assert returned.wait(timeout=5)
+    with pytest.raises(queue.Empty):
+        CallbackThread.callback_queue.get(timeout=0.3)
+
+
+def test_handler_within_timeout_succeeds(xxl_job, make_trigger, next_callback):
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=lambda: None)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1, executor_timeout=1))
+
+    assert next_callback().code == ResponseCode.Success
+    with pytest.raises(queue.Empty):
+        CallbackThread.callback_queue.get(timeout=1.2)
+
+
+def test_timeout_report_does_not_block_timer(xxl_job, make_trigger,
+                                             next_callback, monkeypatch):
+    flushed = threading.Event()
+
+    def slow_flush():
+        time.sleep(1.5)
+        flushed.set()
+
+    monkeypatch.setattr(XxlJobLogger, 'flush', staticmethod(slow_flush))
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=time.sleep)
+    jt.push_trigger(
+        make_trigger(job_id=1,
+                     log_id=1,
+                     executor_params='3',
+                     executor_timeout=1))
+
+    # 超时回调耗时较长时, 定时线程上的其他定时任务仍按时触发
+    time.sleep(1.2)
+    fired = threading.Event()
+    xxl_job.get_timer_thread().schedule(0.1, fired.set)
+    assert fired.wait(timeout=0.5)
+    assert not flushed.is_set()
+    assert next_callback().code == ResponseCode.Timeout
+
+
+def test_idle_job_thread_evicted(xxl_job, make_trigger, next_callback,
+                                 monkeypatch):
+    monkeypatch.setattr(BaseJob, 'idle_timeout', 0.5)
+    jt = xxl_job.register_job_thread(job_id=1, handle_func=lambda: None)
+    jt.push_trigger(make_trigger(job_id=1, log_id=1))
+    assert next_callback().code == ResponseCode.Success
+
+    # 闲置期间收到新调度时重新计时
+    time.sleep(0.3)
+    jt.push_trigger(make_trigger(job_id=1, log_id=2))
+    assert next_callback().code == ResponseCode.Success
+    time.sleep(0.3)
+    assert xxl_job.get_job_thread(1) is jt
+
+    deadline = time.monotonic() + 3
+    while 1 in xxl_job._register_job_threads and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert 1 not in xxl_job._register_job_threads
+    assert jt.stop_flag